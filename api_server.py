@@ -0,0 +1,833 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API Server Module
+HTTP/JSON API поверх backend на asyncio (только стандартная библиотека)
+
+Соединения обслуживаются в цикле событий, вызовы backend выполняются в пуле
+потоков, а подключения к базе берутся из общего пула PostgreSQLDriver.
+Одновременно выполняется не больше --workers запросов, еще не больше
+--max-pending ждут очереди, остальные сразу получают 503.
+
+Запуск:
+    python api_server.py serve --port 8080 --workers 8
+    python api_server.py bench http://127.0.0.1:8080/tables --requests 2000 --concurrency 50
+
+Эндпоинты:
+    GET    /health                         проверка работы и подключения к БД
+    GET    /metrics                        задержки по маршрутам, пул, кэши, повторы запросов (N+1)
+    GET    /metrics/backend                метрики операций backend (metrics.py), JSON
+    GET    /metrics/prometheus             то же в текстовом формате Prometheus
+    GET    /users, /users/{id}             пользователи (?is_active=true)
+    POST   /users                          создание пользователя
+    PATCH  /users/{id}, DELETE /users/{id}  (DELETE - мягкое удаление, остальное - main.py)
+    POST   /users/{id}/restore             отмена мягкого удаления (до purge_deleted)
+    GET    /tables, /tables/{id}           столы (?is_active=true)
+    POST   /tables                         создание стола
+    PATCH  /tables/{id}, DELETE /tables/{id}  (DELETE - мягкое удаление)
+    POST   /tables/{id}/restore            отмена мягкого удаления
+    GET    /bookings, /bookings/{id}       бронирования (?user_id&date&from&to&location&sort&limit,
+                                           status и table_id - через запятую)
+    POST   /bookings                       бронирование через reserve_table (409 - занято,
+                                           422 - пользователь или стол удален, стол неактивен)
+    PATCH  /bookings/{id}, DELETE /bookings/{id}  (PATCH - через reschedule_booking, 409 - занято)
+    GET    /bookings/{id}/history          журнал изменений бронирования
+    GET    /availability/{table_id}?date=YYYY-MM-DD
+    GET    /availability/{table_id}/check?date=...&time=HH:MM&duration=120
+    GET    /search/slots?guests=4&datetime=YYYY-MM-DDTHH:MM&duration=120&window_days=1&limit=5
+    GET    /search/users?q=иванов&limit=20 поиск пользователей по логину, email, имени, телефону
+
+Списки (GET /users, /tables, /bookings, /availability) отдаются с ETag и
+отвечают 304 на If-None-Match; ответы от 1 КБ сжимаются gzip, если клиент
+передал Accept-Encoding: gzip. Изменения бронирований попадают в журнал
+(audit.py) от имени 'api:<X-Actor>' или 'api', если заголовок не передан.
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import re
+import signal
+import sys
+import time as time_module
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from http import HTTPStatus
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import audit
+import backend
+import metrics
+from models.booking import Booking
+from postgresql_driver import PostgreSQLDriver, repeated_queries
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+# Ответы меньше этого размера не сжимаются
+GZIP_MIN_SIZE = 1024
+
+# Ограничения на размер запроса и время простоя keep-alive соединения
+MAX_HEADER_SIZE = 16 * 1024
+MAX_BODY_SIZE = 1024 * 1024
+KEEP_ALIVE_TIMEOUT = 15.0
+
+# Сколько последних задержек хранится по каждому маршруту для процентилей
+LATENCY_WINDOW = 2048
+
+# Ограничение размера списка бронирований в одном ответе
+MAX_LIST_LIMIT = 5000
+
+# Поля пользователя, которые не отдаются наружу
+_HIDDEN_USER_FIELDS = ('password_hash',)
+
+
+class ApiError(Exception):
+    """Ошибка запроса с HTTP-статусом"""
+
+    def __init__(self, status: int, message: str, details: Any = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.details = details
+
+
+class Request:
+    """Разобранный HTTP-запрос"""
+
+    __slots__ = ('method', 'path', 'query', 'headers', 'body', 'version')
+
+    def __init__(self, method: str, target: str, version: str,
+                 headers: Dict[str, str], body: bytes = b''):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path.rstrip('/') or '/'
+        self.query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+        self.version = version
+
+    @property
+    def keep_alive(self) -> bool:
+        """Оставить соединение открытым после ответа"""
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    def json(self) -> Dict[str, Any]:
+        """Тело запроса как JSON-объект"""
+        try:
+            data = json.loads(self.body or b'{}')
+        except ValueError as e:
+            raise ApiError(400, f"Некорректный JSON: {e}")
+        if not isinstance(data, dict):
+            raise ApiError(400, "Ожидается JSON-объект")
+        return data
+
+    def arg(self, name: str, parser: Callable[[str], Any] = str,
+            default: Any = None, required: bool = False) -> Any:
+        """Параметр строки запроса с приведением типа"""
+        value = self.query.get(name)
+        if value is None or value == '':
+            if required:
+                raise ApiError(400, f"Не указан параметр {name}")
+            return default
+        return _parse(name, value, parser)
+
+
+class Response:
+    """HTTP-ответ"""
+
+    __slots__ = ('status', 'body', 'headers')
+
+    def __init__(self, status: int = 200, body: bytes = b'',
+                 headers: Optional[Dict[str, str]] = None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    def encode(self, keep_alive: bool) -> bytes:
+        """Сериализация ответа HTTP/1.1"""
+        reason = HTTPStatus(self.status).phrase
+        headers = dict(self.headers)
+        headers['Content-Length'] = str(len(self.body))
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        head = f"HTTP/1.1 {self.status} {reason}\r\n"
+        head += ''.join(f"{name}: {value}\r\n" for name, value in headers.items())
+        return (head + "\r\n").encode('latin-1') + self.body
+
+
+# ==================== ПРЕОБРАЗОВАНИЕ ДАННЫХ ====================
+
+def _parse_bool(value: str) -> bool:
+    """Логическое значение из строки запроса"""
+    lowered = value.lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValueError(value)
+
+
+def _parse_list(parser: Callable[[str], Any]) -> Callable[[str], List[Any]]:
+    """Разбор списка значений через запятую"""
+    return lambda value: [parser(item) for item in value.split(',') if item]
+
+
+def _parse(name: str, value: Any, parser: Callable[[Any], Any]) -> Any:
+    """Приведение значения с ошибкой 400 при неверном формате"""
+    if value is None:
+        return None
+    try:
+        return parser(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Некорректное значение {name}: {value!r}")
+
+
+# Разбор полей тела запроса по именам колонок
+_FIELD_PARSERS = {
+    'booking_date': date.fromisoformat,
+    'booking_time': time.fromisoformat,
+    'user_id': int,
+    'table_id': int,
+    'guests_count': int,
+    'duration': int,
+    'number': int,
+    'capacity': int,
+}
+
+
+def _fields(data: Dict[str, Any], allowed: Tuple[str, ...],
+            required: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """Отбор и приведение полей тела запроса"""
+    missing = [field for field in required if data.get(field) in (None, '')]
+    if missing:
+        raise ApiError(400, f"Не указаны поля: {', '.join(missing)}")
+    unknown = sorted(set(data) - set(allowed))
+    if unknown:
+        raise ApiError(400, f"Неизвестные поля: {', '.join(unknown)}")
+    return {field: _parse(field, value, _FIELD_PARSERS.get(field, lambda v: v))
+            for field, value in data.items()}
+
+
+def _json_default(value: Any) -> Any:
+    """Сериализация типов, которые возвращает psycopg2"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def _public_user(user: Dict[str, Any]) -> Dict[str, Any]:
+    """Пользователь без скрытых полей"""
+    return {key: value for key, value in user.items() if key not in _HIDDEN_USER_FIELDS}
+
+
+def _found(record: Optional[Dict[str, Any]], what: str) -> Dict[str, Any]:
+    """Запись или 404"""
+    if record is None:
+        raise ApiError(404, f"{what} не найден(о)")
+    return record
+
+
+# ==================== МЕТРИКИ ЗАДЕРЖЕК ====================
+
+class LatencyMetrics:
+    """
+    Метрики запросов по маршрутам
+
+    Счетчики накапливаются за все время работы, процентили считаются по
+    последним LATENCY_WINDOW запросам маршрута. Обновляется только из
+    цикла событий, поэтому блокировки не нужны.
+    """
+
+    def __init__(self):
+        self.started_at = time_module.time()
+        self.routes: Dict[str, Dict[str, Any]] = {}
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def record(self, route: str, status: int, seconds: float):
+        """Учет выполненного запроса"""
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = {
+                'count': 0, 'errors': 0, 'not_modified': 0,
+                'total_seconds': 0.0, 'max_seconds': 0.0,
+                'latencies': deque(maxlen=LATENCY_WINDOW)
+            }
+        stats['count'] += 1
+        stats['total_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        stats['latencies'].append(seconds)
+        if status >= 500:
+            stats['errors'] += 1
+        elif status == 304:
+            stats['not_modified'] += 1
+
+    @staticmethod
+    def _percentile(ordered: List[float], percent: float) -> float:
+        """Процентиль по методу ближайшего ранга"""
+        if not ordered:
+            return 0.0
+        rank = max(0, min(len(ordered) - 1, int(round(percent / 100 * len(ordered))) - 1))
+        return ordered[rank]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущие метрики в виде словаря (миллисекунды)"""
+        routes = {}
+        for route, stats in sorted(self.routes.items()):
+            ordered = sorted(stats['latencies'])
+            routes[route] = {
+                'count': stats['count'],
+                'errors': stats['errors'],
+                'not_modified': stats['not_modified'],
+                'avg_ms': round(stats['total_seconds'] / stats['count'] * 1000, 3),
+                'p50_ms': round(self._percentile(ordered, 50) * 1000, 3),
+                'p95_ms': round(self._percentile(ordered, 95) * 1000, 3),
+                'p99_ms': round(self._percentile(ordered, 99) * 1000, 3),
+                'max_ms': round(stats['max_seconds'] * 1000, 3),
+            }
+        return {
+            'uptime_seconds': round(time_module.time() - self.started_at, 1),
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'rejected': self.rejected,
+            'routes': routes,
+        }
+
+
+# ==================== СЕРВЕР ====================
+
+class ApiServer:
+    """
+    HTTP/JSON сервер над backend
+
+    Маршрут - (метод, шаблон пути, обработчик, кэшируемый). Обработчик
+    получает Request и группы из шаблона, возвращает данные для JSON
+    или кортеж (статус, данные) и выполняется в пуле потоков.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 workers: int = 8, max_pending: int = 256):
+        """
+        Args:
+            host: Адрес прослушивания
+            port: Порт
+            workers: Количество одновременно выполняемых запросов (и потоков)
+            max_pending: Сколько запросов может ждать свободного потока
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_pending = max_pending
+        self.metrics = LatencyMetrics()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.routes = [
+            (method, re.compile(f"^{pattern}$"), handler, cacheable)
+            for method, pattern, handler, cacheable in self._route_table()
+        ]
+
+    def _route_table(self) -> List[Tuple[str, str, Callable, bool]]:
+        """Таблица маршрутов"""
+        return [
+            ('GET', r'/health', self.health, False),
+            ('GET', r'/metrics', self.get_metrics, False),
+            ('GET', r'/metrics/backend', self.get_backend_metrics, False),
+            ('GET', r'/metrics/prometheus', self.get_prometheus_metrics, False),
+            ('GET', r'/users', self.list_users, True),
+            ('POST', r'/users', self.create_user, False),
+            ('GET', r'/users/(\d+)', self.get_user, True),
+            ('PATCH', r'/users/(\d+)', self.update_user, False),
+            ('DELETE', r'/users/(\d+)', self.delete_user, False),
+            ('POST', r'/users/(\d+)/restore', self.restore_user, False),
+            ('GET', r'/tables', self.list_tables, True),
+            ('POST', r'/tables', self.create_table, False),
+            ('GET', r'/tables/(\d+)', self.get_table, True),
+            ('PATCH', r'/tables/(\d+)', self.update_table, False),
+            ('DELETE', r'/tables/(\d+)', self.delete_table, False),
+            ('POST', r'/tables/(\d+)/restore', self.restore_table, False),
+            ('GET', r'/bookings', self.list_bookings, True),
+            ('POST', r'/bookings', self.create_booking, False),
+            ('GET', r'/bookings/(\d+)', self.get_booking, True),
+            ('PATCH', r'/bookings/(\d+)', self.update_booking, False),
+            ('DELETE', r'/bookings/(\d+)', self.delete_booking, False),
+            ('GET', r'/bookings/(\d+)/history', self.booking_history, False),
+            ('GET', r'/availability/(\d+)', self.table_availability, True),
+            ('GET', r'/availability/(\d+)/check', self.check_availability, False),
+            ('GET', r'/search/slots', self.search_slots, False),
+            ('GET', r'/search/users', self.search_users, False),
+        ]
+
+    # ---------- обработчики ----------
+
+    def health(self, request: Request) -> Dict[str, Any]:
+        with PostgreSQLDriver() as db:
+            db.execute_query("SELECT 1")
+        return {'status': 'ok'}
+
+    def get_metrics(self, request: Request) -> Dict[str, Any]:
+        snapshot = self.metrics.snapshot()
+        snapshot['pool'] = PostgreSQLDriver.get_pool_stats()
+        snapshot['caches'] = backend.get_cache_stats()
+        snapshot['audit'] = audit.get_audit_stats()
+        snapshot['repeated_queries'] = repeated_queries.stats()
+        return snapshot
+
+    def get_backend_metrics(self, request: Request) -> Dict[str, Any]:
+        return metrics.registry.snapshot()
+
+    def get_prometheus_metrics(self, request: Request) -> Response:
+        return Response(200, metrics.registry.to_prometheus().encode('utf-8'),
+                        {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    def list_users(self, request: Request) -> List[Dict[str, Any]]:
+        users = backend.get_all_users(is_active=request.arg('is_active', _parse_bool))
+        return [_public_user(user) for user in users]
+
+    def get_user(self, request: Request, user_id: str) -> Dict[str, Any]:
+        return _public_user(_found(backend.get_user_by_id(int(user_id)), "Пользователь"))
+
+    def create_user(self, request: Request) -> Tuple[int, Dict[str, Any]]:
+        data = _fields(request.json(),
+                       ('username', 'email', 'password_hash', 'first_name',
+                        'last_name', 'phone', 'role'),
+                       required=('username', 'email', 'password_hash'))
+        user_id = backend.create_user(**data)
+        if user_id is None:
+            raise ApiError(400, "Не удалось создать пользователя")
+        return 201, {'id': user_id}
+
+    def update_user(self, request: Request, user_id: str) -> Dict[str, Any]:
+        data = _fields(request.json(),
+                       ('username', 'email', 'password_hash', 'first_name',
+                        'last_name', 'phone', 'role', 'is_active'))
+        if not data or not backend.update_user(int(user_id), **data):
+            raise ApiError(404, "Пользователь не найден или не изменен")
+        return {'id': int(user_id)}
+
+    def delete_user(self, request: Request, user_id: str) -> Dict[str, Any]:
+        if not backend.delete_user(int(user_id), soft=True):
+            raise ApiError(404, "Пользователь не найден")
+        return {'id': int(user_id)}
+
+    def restore_user(self, request: Request, user_id: str) -> Dict[str, Any]:
+        if not backend.restore_user(int(user_id)):
+            raise ApiError(404, "Удаленный пользователь не найден")
+        return {'id': int(user_id)}
+
+    def list_tables(self, request: Request) -> List[Dict[str, Any]]:
+        return backend.get_all_tables(is_active=request.arg('is_active', _parse_bool))
+
+    def get_table(self, request: Request, table_id: str) -> Dict[str, Any]:
+        return _found(backend.get_table_by_id(int(table_id)), "Стол")
+
+    def create_table(self, request: Request) -> Tuple[int, Dict[str, Any]]:
+        data = _fields(request.json(),
+                       ('number', 'capacity', 'location', 'table_type', 'is_active', 'description'),
+                       required=('number', 'capacity'))
+        table_id = backend.create_table_record(**data)
+        if table_id is None:
+            raise ApiError(400, "Не удалось создать стол")
+        return 201, {'id': table_id}
+
+    def update_table(self, request: Request, table_id: str) -> Dict[str, Any]:
+        data = _fields(request.json(),
+                       ('number', 'capacity', 'location', 'table_type', 'is_active', 'description'))
+        if not data or not backend.update_table(int(table_id), **data):
+            raise ApiError(404, "Стол не найден или не изменен")
+        return {'id': int(table_id)}
+
+    def delete_table(self, request: Request, table_id: str) -> Dict[str, Any]:
+        if not backend.delete_table(int(table_id), soft=True):
+            raise ApiError(404, "Стол не найден")
+        return {'id': int(table_id)}
+
+    def restore_table(self, request: Request, table_id: str) -> Dict[str, Any]:
+        if not backend.restore_table(int(table_id)):
+            raise ApiError(404, "Удаленный стол не найден")
+        return {'id': int(table_id)}
+
+    def list_bookings(self, request: Request) -> List[Dict[str, Any]]:
+        statuses = request.arg('status', _parse_list(str))
+        unknown = set(statuses or ()) - set(Booking.VALID_STATUSES)
+        if unknown:
+            raise ApiError(400, f"Неизвестный статус: {', '.join(sorted(unknown))}")
+        sort = request.arg('sort', str, 'date_desc')
+        if sort not in backend.BOOKING_SORT_ORDERS:
+            raise ApiError(400, f"Неизвестная сортировка: {sort}")
+        return backend.get_all_bookings(user_id=request.arg('user_id', int),
+                                        booking_date=request.arg('date', date.fromisoformat),
+                                        date_from=request.arg('from', date.fromisoformat),
+                                        date_to=request.arg('to', date.fromisoformat),
+                                        statuses=statuses,
+                                        table_ids=request.arg('table_id', _parse_list(int)),
+                                        location=request.arg('location'),
+                                        sort=sort,
+                                        limit=min(request.arg('limit', int, MAX_LIST_LIMIT),
+                                                  MAX_LIST_LIMIT))
+
+    def get_booking(self, request: Request, booking_id: str) -> Dict[str, Any]:
+        return _found(backend.get_booking_by_id(int(booking_id)), "Бронирование")
+
+    def create_booking(self, request: Request) -> Tuple[int, Dict[str, Any]]:
+        data = _fields(request.json(),
+                       ('user_id', 'table_id', 'booking_date', 'booking_time', 'guests_count',
+                        'status', 'contact_phone', 'contact_name', 'special_requests', 'duration'),
+                       required=('user_id', 'table_id', 'booking_date', 'booking_time',
+                                 'guests_count'))
+        if data.get('status', 'pending') not in Booking.VALID_STATUSES:
+            raise ApiError(400, f"Неизвестный статус: {data['status']}")
+        result = backend.reserve_table(**data)
+        if result['status'] == backend.RESERVE_CONFLICT:
+            raise ApiError(409, "Стол занят в это время", result['conflicts'])
+        if result['status'] == backend.RESERVE_UNAVAILABLE:
+            raise ApiError(422, result['error'])
+        if result['status'] != backend.RESERVE_OK:
+            raise ApiError(500, result['error'] or "Не удалось создать бронирование")
+        return 201, {'id': result['booking_id']}
+
+    def update_booking(self, request: Request, booking_id: str) -> Dict[str, Any]:
+        data = _fields(request.json(),
+                       ('table_id', 'booking_date', 'booking_time', 'guests_count', 'status',
+                        'contact_phone', 'contact_name', 'special_requests', 'duration'))
+        if not data:
+            raise ApiError(400, "Нет полей для изменения")
+        if data.get('status', 'pending') not in Booking.VALID_STATUSES:
+            raise ApiError(400, f"Неизвестный статус: {data['status']}")
+        # Проверка пересечений и UPDATE - в одной транзакции под блокировкой стола
+        result = backend.reschedule_booking(int(booking_id), **data)
+        if result['status'] == backend.RESERVE_NOT_FOUND:
+            raise ApiError(404, "Бронирование не найдено")
+        if result['status'] == backend.RESERVE_CONFLICT:
+            raise ApiError(409, "Стол занят в это время", result['conflicts'])
+        if result['status'] == backend.RESERVE_UNAVAILABLE:
+            raise ApiError(422, result['error'])
+        if result['status'] != backend.RESERVE_OK:
+            raise ApiError(500, result['error'] or "Не удалось изменить бронирование")
+        return {'id': int(booking_id)}
+
+    def delete_booking(self, request: Request, booking_id: str) -> Dict[str, Any]:
+        if not backend.delete_booking(int(booking_id)):
+            raise ApiError(404, "Бронирование не найдено")
+        return {'id': int(booking_id)}
+
+    def booking_history(self, request: Request, booking_id: str) -> List[Dict[str, Any]]:
+        return audit.get_booking_history(int(booking_id))
+
+    def table_availability(self, request: Request, table_id: str) -> List[Dict[str, Any]]:
+        return backend.get_table_availability(
+            int(table_id), request.arg('date', date.fromisoformat, required=True)
+        )
+
+    def check_availability(self, request: Request, table_id: str) -> Dict[str, Any]:
+        available = backend.is_table_available(
+            int(table_id),
+            request.arg('date', date.fromisoformat, required=True),
+            request.arg('time', time.fromisoformat, required=True),
+            request.arg('duration', int, 120)
+        )
+        return {'table_id': int(table_id), 'available': available}
+
+    def search_slots(self, request: Request) -> List[Dict[str, Any]]:
+        return backend.suggest_slots(
+            request.arg('guests', int, required=True),
+            request.arg('datetime', datetime.fromisoformat, required=True),
+            duration=request.arg('duration', int, 120),
+            window_days=request.arg('window_days', int, 1),
+            limit=min(request.arg('limit', int, 5), 100)
+        )
+
+    def search_users(self, request: Request) -> List[Dict[str, Any]]:
+        return backend.search_users(request.arg('q', required=True),
+                                    limit=min(request.arg('limit', int, 20), 100))
+
+    # ---------- обработка запроса ----------
+
+    def _match(self, request: Request) -> Tuple[Optional[tuple], bool]:
+        """Поиск маршрута: (маршрут, группы) и признак существования пути"""
+        path_exists = False
+        for route in self.routes:
+            method, pattern, _, _ = route
+            match = pattern.match(request.path)
+            if match:
+                path_exists = True
+                if method == request.method:
+                    return (route, match.groups()), True
+        return None, path_exists
+
+    def _execute(self, route: tuple, groups: tuple, request: Request) -> Response:
+        """Выполнение обработчика и сборка ответа (в потоке пула)"""
+        method, _, handler, cacheable = route
+        actor = request.headers.get('x-actor')
+        try:
+            with audit.acting_as(f"api:{actor}" if actor else 'api'), \
+                    repeated_queries.scope(f"{method} {request.path}"):
+                result = handler(request, *groups)
+            if isinstance(result, Response):
+                return result
+            status = 200
+            if isinstance(result, tuple):
+                status, result = result
+            payload = result
+        except ApiError as e:
+            status = e.status
+            payload = {'error': e.message}
+            if e.details is not None:
+                payload['details'] = e.details
+        except Exception as e:
+            print(f"Ошибка обработки {request.method} {request.path}: {e}")
+            status = 500
+            payload = {'error': "Внутренняя ошибка сервера"}
+
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+        headers = {'Content-Type': 'application/json; charset=utf-8'}
+
+        if cacheable and status == 200:
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            headers['ETag'] = etag
+            headers['Cache-Control'] = 'no-cache'
+            if etag in request.headers.get('if-none-match', ''):
+                return Response(304, b'', {'ETag': etag, 'Cache-Control': 'no-cache'})
+
+        if len(body) >= GZIP_MIN_SIZE and 'gzip' in request.headers.get('accept-encoding', ''):
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+            headers['Vary'] = 'Accept-Encoding'
+        return Response(status, body, headers)
+
+    async def dispatch(self, request: Request) -> Response:
+        """Выбор маршрута, ограничение параллельности и замер задержки"""
+        started = time_module.perf_counter()
+        matched, path_exists = self._match(request)
+        if matched is None:
+            status = 405 if path_exists else 404
+            message = "Метод не поддерживается" if path_exists else "Не найдено"
+            body = json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+            return Response(status, body, {'Content-Type': 'application/json; charset=utf-8'})
+
+        route, groups = matched
+        route_name = f"{route[0]} {route[1].pattern[1:-1]}"
+        if self.metrics.waiting >= self.max_pending:
+            self.metrics.rejected += 1
+            body = json.dumps({'error': "Сервер перегружен"}, ensure_ascii=False).encode('utf-8')
+            response = Response(503, body, {'Content-Type': 'application/json; charset=utf-8',
+                                            'Retry-After': '1'})
+            self.metrics.record(route_name, 503, time_module.perf_counter() - started)
+            return response
+
+        self.metrics.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.metrics.waiting -= 1
+        self.metrics.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(self.executor, self._execute,
+                                                  route, groups, request)
+        finally:
+            self.metrics.in_flight -= 1
+            self._semaphore.release()
+
+        self.metrics.record(route_name, response.status, time_module.perf_counter() - started)
+        return response
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        """Чтение одного запроса; None - соединение закрыто клиентом"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise ApiError(431, "Слишком большие заголовки")
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ', 2)
+        except ValueError:
+            raise ApiError(400, "Некорректная строка запроса")
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise ApiError(400, "Некорректный Content-Length")
+        if length < 0:
+            raise ApiError(400, "Некорректный Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise ApiError(413, "Слишком большое тело запроса")
+        body = await reader.readexactly(length) if length else b''
+        return Request(method.upper(), target, version, headers, body)
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter):
+        """Обслуживание соединения (keep-alive: несколько запросов подряд)"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ApiError as e:
+                    body = json.dumps({'error': e.message}, ensure_ascii=False).encode('utf-8')
+                    writer.write(Response(e.status, body).encode(keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                response = await self.dispatch(request)
+                keep_alive = request.keep_alive
+                writer.write(response.encode(keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Запуск сервера до остановки (Ctrl+C / SIGTERM)"""
+        self._semaphore = asyncio.Semaphore(self.workers)
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port,
+                                            limit=MAX_HEADER_SIZE, backlog=1024)
+        print(f"API сервер: http://{self.host}:{self.port} (потоков {self.workers})")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        async with server:
+            await stop.wait()
+        self.executor.shutdown(wait=True)
+        print("API сервер остановлен")
+
+
+# ==================== НАГРУЗОЧНЫЙ ТЕСТ ====================
+
+async def _bench_client(host: str, port: int, path: str, headers: str,
+                        counter: List[int], latencies: List[float], statuses: Dict[int, int]):
+    """Клиент нагрузочного теста: запросы по одному keep-alive соединению"""
+    reader, writer = await asyncio.open_connection(host, port)
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{headers}\r\n".encode('latin-1')
+    try:
+        while counter[0] > 0:
+            counter[0] -= 1
+            started = time_module.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b'\r\n\r\n')
+            status = int(head.split(b' ', 2)[1])
+            length = re.search(rb'content-length:\s*(\d+)', head, re.IGNORECASE)
+            await reader.readexactly(int(length.group(1)) if length else 0)
+            latencies.append(time_module.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def bench(url: str, requests: int = 1000, concurrency: int = 20,
+                gzip_enabled: bool = False, etag: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Нагрузочный тест GET-эндпоинта
+
+    Args:
+        url: Адрес, например http://127.0.0.1:8080/tables
+        requests: Общее количество запросов
+        concurrency: Количество одновременных соединений
+        gzip_enabled: Передавать Accept-Encoding: gzip
+        etag: Передавать If-None-Match (проверка ответов 304)
+    """
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else '')
+    headers = ''
+    if gzip_enabled:
+        headers += "Accept-Encoding: gzip\r\n"
+    if etag:
+        headers += f"If-None-Match: {etag}\r\n"
+
+    counter = [requests]
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    started = time_module.perf_counter()
+    await asyncio.gather(*(
+        _bench_client(parts.hostname, parts.port or 80, path or '/', headers,
+                      counter, latencies, statuses)
+        for _ in range(concurrency)
+    ))
+    elapsed = time_module.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(LatencyMetrics._percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(LatencyMetrics._percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(LatencyMetrics._percentile(ordered, 99) * 1000, 3),
+        'statuses': statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/JSON API системы бронирования")
+    commands = parser.add_subparsers(dest='command')
+
+    serve_parser = commands.add_parser('serve', help="запуск сервера (по умолчанию)")
+    serve_parser.add_argument('--host', default=DEFAULT_HOST)
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--workers', type=int, default=8,
+                              help="одновременно выполняемых запросов")
+    serve_parser.add_argument('--max-pending', type=int, default=256,
+                              help="запросов в очереди, сверх - ответ 503")
+    serve_parser.add_argument('--pool-size', type=int, default=0,
+                              help="подключений к БД (по умолчанию workers + 2)")
+
+    bench_parser = commands.add_parser('bench', help="нагрузочный тест GET-эндпоинта")
+    bench_parser.add_argument('url')
+    bench_parser.add_argument('--requests', type=int, default=1000)
+    bench_parser.add_argument('--concurrency', type=int, default=20)
+    bench_parser.add_argument('--gzip', action='store_true', help="Accept-Encoding: gzip")
+    bench_parser.add_argument('--etag', help="If-None-Match")
+
+    args = parser.parse_args()
+    if args.command == 'bench':
+        result = asyncio.run(bench(args.url, args.requests, args.concurrency,
+                                   args.gzip, args.etag))
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    if args.command is None:
+        args = serve_parser.parse_args([])
+    pool_size = args.pool_size or args.workers + 2
+    try:
+        PostgreSQLDriver.enable_pool(minconn=1, maxconn=pool_size)
+    except Exception as e:
+        print(f"Ошибка подключения к базе данных: {e}")
+        sys.exit(1)
+    try:
+        asyncio.run(ApiServer(args.host, args.port, args.workers, args.max_pending).serve())
+    finally:
+        PostgreSQLDriver.disable_pool()
+
+
+if __name__ == "__main__":
+    main()
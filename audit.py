@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Audit Module
+Асинхронный (write-behind) журнал изменений бронирований
+
+Функции записи backend после фиксации транзакции кладут записи об изменениях
+(старые и новые значения) в ограниченную очередь в памяти и сразу
+возвращаются. Фоновый поток выбирает записи пачками и пишет их в
+booking_audit одной командой COPY, поэтому журнал не добавляет обращений
+к базе в путь записи бронирования.
+
+Очередь ограничена: если писатель не успевает (база недоступна, всплеск
+изменений), запись ждет место не дольше block_timeout, затем запись журнала
+отбрасывается и учитывается в метрике dropped - бронирование важнее журнала.
+При завершении процесса очередь дописывается (atexit).
+
+Настройка через переменные окружения:
+    BOOKING_AUDIT=0                  отключить журнал
+    BOOKING_AUDIT_QUEUE_SIZE=10000   размер очереди
+    BOOKING_AUDIT_BATCH_SIZE=500     максимум записей в одной команде COPY
+    BOOKING_AUDIT_FLUSH_INTERVAL=1   сколько ждать пополнения неполной пачки, секунд
+    BOOKING_ACTOR=...                кто вносит изменения (по умолчанию - пользователь ОС)
+
+Запуск:
+    python audit.py 42               # история бронирования 42
+    python audit.py --recent 20      # последние изменения
+"""
+
+import argparse
+import atexit
+import getpass
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from models.booking_audit import BookingAudit
+from postgresql_driver import PostgreSQLDriver
+
+
+# Колонки, которые пишет COPY (id и порядок - из модели)
+AUDIT_COLUMNS = ['booking_id', 'action', 'actor', 'changed_at', 'old_values', 'new_values']
+
+# Маркер остановки писателя
+_STOP = object()
+
+# Исполнитель изменений текущего потока (acting_as)
+_local = threading.local()
+_default_actor: Optional[str] = None
+
+
+def _env_flag(name: str, default: bool = True) -> bool:
+    """Логическое значение переменной окружения"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ('0', 'false', 'no', 'off', '')
+
+
+def current_actor() -> str:
+    """Кто вносит изменения в текущем потоке"""
+    global _default_actor
+    actor = getattr(_local, 'actor', None)
+    if actor:
+        return actor
+    if _default_actor is None:
+        try:
+            _default_actor = os.getenv('BOOKING_ACTOR') or getpass.getuser()
+        except Exception:
+            _default_actor = 'system'
+    return _default_actor
+
+
+@contextmanager
+def acting_as(actor: str):
+    """
+    Контекстный менеджер: изменения в текущем потоке записываются от имени actor
+
+    Пример:
+        with audit.acting_as('api:admin'):
+            backend.update_booking(42, status='confirmed')
+    """
+    previous = getattr(_local, 'actor', None)
+    _local.actor = actor
+    try:
+        yield
+    finally:
+        _local.actor = previous
+
+
+def _to_json(values: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Значения записи в JSON (даты и время - строками ISO)"""
+    if values is None:
+        return None
+    return json.dumps(values, ensure_ascii=False, default=_json_default)
+
+
+def _json_default(value: Any) -> Any:
+    """Сериализация типов, которые json не знает"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class AuditLog:
+    """
+    Ограниченная очередь записей журнала с фоновым писателем
+
+    Запись в журнал (record) не обращается к базе: она кладет кортеж в очередь.
+    Писатель набирает пачку до batch_size записей, ожидая пополнения не дольше
+    flush_interval секунд после первой записи, и пишет ее через COPY в
+    отдельном коротком подключении. Неудачная пачка повторяется retries раз,
+    затем отбрасывается.
+    """
+
+    def __init__(self, queue_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, block_timeout: float = 0.05,
+                 retries: int = 2, config: Optional[Dict[str, Any]] = None):
+        """
+        Инициализация журнала
+
+        Args:
+            queue_size: Максимум записей, ожидающих записи в базу
+            batch_size: Максимум записей в одной команде COPY
+            flush_interval: Сколько ждать пополнения неполной пачки, секунды
+            block_timeout: Сколько record ждет места в полной очереди, секунды
+            retries: Повторы записи пачки при ошибке
+            config: Параметры подключения (по умолчанию - из переменных окружения)
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.retries = retries
+        self.config = config
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._closed = False
+        self._failing = False
+
+        # Метрики
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.blocked_seconds = 0.0
+        self.max_depth = 0
+        self.batches = 0
+        self.write_seconds = 0.0
+        self.max_write_seconds = 0.0
+        self.write_errors = 0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        """Запуск фонового писателя (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name='booking-audit-writer',
+                                            daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, action: str, booking_id: int,
+               old_values: Optional[Dict[str, Any]] = None,
+               new_values: Optional[Dict[str, Any]] = None,
+               actor: Optional[str] = None) -> bool:
+        """
+        Постановка записи об изменении бронирования в очередь
+
+        Args:
+            action: 'create', 'update' или 'delete'
+            booking_id: ID бронирования
+            old_values: Значения до изменения
+            new_values: Значения после изменения
+            actor: Кто изменил (по умолчанию - current_actor())
+
+        Returns:
+            bool: True, если запись поставлена в очередь (False - отброшена)
+        """
+        if self._closed:
+            return False
+        entry = (booking_id, action, actor or current_actor(), datetime.now(),
+                 old_values, new_values)
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            started = time.perf_counter()
+            try:
+                self._queue.put(entry, timeout=self.block_timeout)
+            except queue.Full:
+                with self._lock:
+                    self.blocked += 1
+                    self.blocked_seconds += time.perf_counter() - started
+                    self.dropped += 1
+                return False
+            with self._lock:
+                self.blocked += 1
+                self.blocked_seconds += time.perf_counter() - started
+
+        with self._lock:
+            self.enqueued += 1
+            depth = self._queue.qsize()
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Ожидание записи в базу всего, что поставлено в очередь до вызова
+
+        Returns:
+            bool: True, если очередь дописана за timeout секунд
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Дописывание очереди и остановка писателя (вызывается при выходе)"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            print(f"Журнал изменений: очередь не дописана, потеряно записей: {self._queue.qsize()}")
+            return
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики очереди и писателя (включая признаки обратного давления)"""
+        with self._lock:
+            return {
+                'depth': self._queue.qsize(),
+                'max_depth': self.max_depth,
+                'capacity': self._queue.maxsize,
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'dropped': self.dropped,
+                'blocked': self.blocked,
+                'blocked_ms': round(self.blocked_seconds * 1000, 2),
+                'batches': self.batches,
+                'avg_batch': round(self.written / self.batches, 1) if self.batches else 0.0,
+                'avg_write_ms': round(self.write_seconds * 1000 / self.batches, 2) if self.batches else 0.0,
+                'max_write_ms': round(self.max_write_seconds * 1000, 2),
+                'write_errors': self.write_errors,
+                'last_error': self.last_error,
+                'running': self._thread is not None and self._thread.is_alive()
+            }
+
+    def _run(self):
+        """Цикл писателя: пачка до batch_size записей или flush_interval секунд"""
+        while True:
+            item = self._queue.get()
+            batch: List[tuple] = []
+            waiters: List[threading.Event] = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                # Все, что успели положить до маркера остановки, уже записано
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        return
+                    if isinstance(item, threading.Event):
+                        item.set()
+
+    def _write(self, batch: List[tuple]):
+        """Запись пачки одной командой COPY с повторами"""
+        rows = [(booking_id, action, actor, changed_at, _to_json(old_values), _to_json(new_values))
+                for booking_id, action, actor, changed_at, old_values, new_values in batch]
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                with PostgreSQLDriver(self.config) as db:
+                    db.copy_from(BookingAudit.TABLE_NAME, AUDIT_COLUMNS, rows)
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.written += len(rows)
+                    self.batches += 1
+                    self.write_seconds += elapsed
+                    self.max_write_seconds = max(self.max_write_seconds, elapsed)
+                self._failing = False
+                return
+            except Exception as e:
+                with self._lock:
+                    self.write_errors += 1
+                    self.last_error = str(e)
+                if attempt < self.retries:
+                    time.sleep(0.5 * (attempt + 1))
+
+        # Во время недоступности базы сообщается только о первой потерянной пачке
+        if not self._failing:
+            print(f"Журнал изменений: записи не записаны и отбрасываются: {self.last_error}")
+            self._failing = True
+        with self._lock:
+            self.dropped += len(rows)
+
+
+# ==================== ОБЩИЙ ЖУРНАЛ ПРОЦЕССА ====================
+
+_audit_log: Optional[AuditLog] = None
+_audit_lock = threading.Lock()
+
+
+def get_audit_log() -> Optional[AuditLog]:
+    """
+    Общий журнал процесса (создается и запускается при первом обращении)
+
+    В дочернем процессе (fork) создается свой журнал: поток писателя
+    родителя в нем не работает.
+
+    Returns:
+        Optional[AuditLog]: Журнал или None, если он отключен (BOOKING_AUDIT=0)
+    """
+    global _audit_log
+    log = _audit_log
+    if log is not None and log._pid == os.getpid():
+        return log
+    if not _env_flag('BOOKING_AUDIT'):
+        return None
+
+    with _audit_lock:
+        if _audit_log is None or _audit_log._pid != os.getpid():
+            _audit_log = AuditLog(
+                queue_size=int(os.getenv('BOOKING_AUDIT_QUEUE_SIZE', '10000')),
+                batch_size=int(os.getenv('BOOKING_AUDIT_BATCH_SIZE', '500')),
+                flush_interval=float(os.getenv('BOOKING_AUDIT_FLUSH_INTERVAL', '1'))
+            )
+            _audit_log.start()
+        return _audit_log
+
+
+def record_change(action: str, booking_id: int,
+                  old_values: Optional[Dict[str, Any]] = None,
+                  new_values: Optional[Dict[str, Any]] = None) -> bool:
+    """Запись изменения бронирования в общий журнал (без обращения к базе)"""
+    log = get_audit_log()
+    if log is None:
+        return False
+    return log.record(action, booking_id, old_values, new_values)
+
+
+def record_changes(changes: Iterable[Tuple[str, int, Optional[Dict[str, Any]],
+                                           Optional[Dict[str, Any]]]]) -> int:
+    """
+    Запись нескольких изменений (action, booking_id, old_values, new_values)
+
+    Returns:
+        int: Количество поставленных в очередь записей
+    """
+    log = get_audit_log()
+    if log is None:
+        return 0
+    actor = current_actor()
+    return sum(log.record(action, booking_id, old_values, new_values, actor)
+               for action, booking_id, old_values, new_values in changes)
+
+
+def flush(timeout: float = 5.0) -> bool:
+    """Ожидание записи в базу всех поставленных в очередь изменений"""
+    log = _audit_log
+    if log is None or log._pid != os.getpid():
+        return True
+    return log.flush(timeout)
+
+
+def get_audit_stats() -> Dict[str, Any]:
+    """Метрики общего журнала ({'enabled': False}, если он не запускался)"""
+    log = _audit_log
+    if log is None or log._pid != os.getpid():
+        return {'enabled': _env_flag('BOOKING_AUDIT'), 'running': False}
+    return dict(log.stats(), enabled=True)
+
+
+def get_booking_history(booking_id: int) -> List[Dict[str, Any]]:
+    """
+    История изменений бронирования (очередь предварительно дописывается)
+
+    Returns:
+        List[Dict[str, Any]]: Записи журнала в порядке изменений
+    """
+    flush()
+    try:
+        with PostgreSQLDriver() as db:
+            return db.select(BookingAudit.TABLE_NAME, where={'booking_id': booking_id},
+                             order_by='changed_at, id')
+    except Exception as e:
+        print(f"Ошибка получения истории бронирования: {e}")
+        return []
+
+
+def get_recent_changes(limit: int = 50) -> List[Dict[str, Any]]:
+    """Последние изменения бронирований (новые первыми)"""
+    flush()
+    try:
+        with PostgreSQLDriver() as db:
+            return db.execute_query(
+                f"SELECT * FROM {BookingAudit.TABLE_NAME} ORDER BY changed_at DESC, id DESC LIMIT %s",
+                (limit,)
+            )
+    except Exception as e:
+        print(f"Ошибка получения журнала изменений: {e}")
+        return []
+
+
+def main():
+    """Вывод истории бронирования или последних изменений"""
+    parser = argparse.ArgumentParser(description="Журнал изменений бронирований")
+    parser.add_argument('booking_id', type=int, nargs='?', help="ID бронирования")
+    parser.add_argument('--recent', type=int, default=20,
+                        help="Сколько последних изменений показать (без booking_id)")
+    args = parser.parse_args()
+
+    rows = (get_booking_history(args.booking_id) if args.booking_id is not None
+            else get_recent_changes(args.recent))
+    if not rows:
+        print("Изменений не найдено")
+        return
+    for row in rows:
+        print(f"{row['changed_at']:%Y-%m-%d %H:%M:%S}  #{row['booking_id']:<8} "
+              f"{row['action']:<7} {row['actor'] or '-':<20} "
+              f"{json.dumps(row['old_values'], ensure_ascii=False) if row['old_values'] else ''}"
+              f"{' -> ' if row['old_values'] and row['new_values'] else ''}"
+              f"{json.dumps(row['new_values'], ensure_ascii=False) if row['new_values'] else ''}")
+
+
+if __name__ == '__main__':
+    main()
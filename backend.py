@@ -1,27 +1,138 @@
 from models.booking import Booking
+from models.booking_series import BookingSeries
+from models.booking_summary import BookingDailySummary
+from models.booking_audit import BookingAudit
 from models.tables import Table
 from models.user import User
-from postgresql_driver import PostgreSQLDriver
-from typing import Optional, List, Dict, Any
-from datetime import datetime, date, time
+from postgresql_driver import PostgreSQLDriver, repeated_queries
+from cache import TTLCache
+import audit
+import metrics
+import profiling
+from typing import Optional, List, Dict, Any, Callable, Iterable, Iterator, Tuple, Union
+from datetime import datetime, date, time, timedelta
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import bisect
+import os
+import time as time_module
+
+
+# ==================== КЭШ ПОЛЬЗОВАТЕЛЕЙ И СТОЛОВ ====================
+
+# Пользователи и столы меняются редко, а запрашиваются по ID постоянно
+# (детали бронирования, строки списка бронирований, выпадающие списки).
+# Кэш сбрасывается при изменении/удалении записи и ограничен по времени жизни
+# на случай изменений из других процессов.
+_user_cache = TTLCache(maxsize=10000, ttl=300)
+_table_cache = TTLCache(maxsize=1000, ttl=300)
+_active_tables_cache = TTLCache(maxsize=1, ttl=60)
+# Наличие расширения pg_trgm (нечеткий поиск пользователей)
+_trigram_cache = TTLCache(maxsize=1, ttl=300)
+
+
+def _get_by_ids(cache: TTLCache, table_name: str, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """Пакетное получение записей по ID через кэш одним запросом = ANY"""
+    ids = set(ids)
+    found = {record_id: dict(row) for record_id, row in cache.get_many(ids).items()}
+    missing = [record_id for record_id in ids if record_id not in found]
+    
+    if missing:
+        with PostgreSQLDriver() as db:
+            rows = db.execute_query(
+                f"SELECT * FROM {table_name} WHERE id = ANY(%s)", (missing,)
+            )
+        for row in rows:
+            cache.set(row['id'], dict(row))
+            found[row['id']] = dict(row)
+    
+    return found
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Статистика кэшей (попадания, промахи, доля попаданий)"""
+    return {
+        'users': _user_cache.stats(),
+        'tables': _table_cache.stats(),
+        'active_tables': _active_tables_cache.stats()
+    }
+
+
+def clear_caches():
+    """Сброс всех кэшей backend"""
+    _user_cache.clear()
+    _table_cache.clear()
+    _active_tables_cache.clear()
+
+
+def _select_models(db: PostgreSQLDriver, model, where: Optional[Dict[str, Any]] = None,
+                   order_by: Optional[str] = None) -> list:
+    """Выборка строк кортежами в порядке model.FIELDS и создание объектов модели"""
+    rows = db.select(model.TABLE_NAME, columns=list(model.FIELDS), where=where,
+                     order_by=order_by, as_tuples=True)
+    return model.from_rows(rows)
+
+
+def _invalidate_table(table_id: Optional[int] = None):
+    """Сброс кэша стола и списка активных столов"""
+    if table_id is not None:
+        _table_cache.invalidate(table_id)
+    _active_tables_cache.clear()
 
 
 # ==================== ФУНКЦИЯ СОЗДАНИЯ ТАБЛИЦ ====================
 
-def create_tables():
-    """Создание всех таблиц в базе данных"""
+def create_tables(concurrent_indexes: bool = False, partition_bookings: bool = False):
+    """
+    Создание всех таблиц и индексов в базе данных
+    
+    Args:
+        concurrent_indexes: Достраивать недостающие индексы через
+                            CREATE INDEX CONCURRENTLY (для рабочей базы с данными)
+        partition_bookings: Создать bookings секционированной по месяцам booking_date
+                            (действует только при создании новой таблицы)
+    """
     try:
         with PostgreSQLDriver() as db:
             print("Создание таблицы users...")
-            db.create_table(User)
+            db.create_table(User, concurrent_indexes=concurrent_indexes)
+            _install_user_search(db, concurrent_indexes)
             
             print("Создание таблицы tables...")
-            db.create_table(Table)
+            db.create_table(Table, concurrent_indexes=concurrent_indexes)
+            
+            print("Создание таблицы booking_series...")
+            db.create_table(BookingSeries, concurrent_indexes=concurrent_indexes)
             
             print("Создание таблицы bookings...")
-            db.create_table(Booking)
+            if partition_bookings:
+                db.create_table(Booking.TABLE_NAME, Booking.PARTITIONED_COLUMNS,
+                                Booking.PARTITIONED_CONSTRAINTS, indexes=Booking.INDEXES,
+                                concurrent_indexes=concurrent_indexes,
+                                partition_by=Booking.PARTITION_BY)
+                if db.is_partitioned(Booking.TABLE_NAME):
+                    db.create_partition(Booking.TABLE_NAME, BOOKINGS_DEFAULT_PARTITION, default=True)
+                else:
+                    print("Внимание: таблица bookings уже существует и не секционирована")
+            else:
+                db.create_table(Booking, concurrent_indexes=concurrent_indexes)
+            
+            print("Создание архива bookings_archive...")
+            db.create_table(Booking.ARCHIVE_TABLE_NAME, Booking.ARCHIVE_COLUMNS,
+                            indexes=Booking.ARCHIVE_INDEXES,
+                            concurrent_indexes=concurrent_indexes)
+            
+            print("Создание сводки booking_daily_summary...")
+            db.create_table(BookingDailySummary)
+            _install_daily_summary_triggers(db)
+            
+            print("Создание журнала изменений booking_audit...")
+            db.create_table(BookingAudit, concurrent_indexes=concurrent_indexes)
 
             print("\n✓ Все таблицы успешно созданы!")
+        
+        if partition_bookings:
+            maintain_booking_partitions()
         return True
         
     except Exception as e:
@@ -55,23 +166,61 @@ def create_user(username: str, email: str, password_hash: str,
         return None
 
 
-def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
-    """Получение пользователя по ID"""
+def get_user_by_id(user_id: int, as_model: bool = False) -> Optional[Union[Dict[str, Any], User]]:
+    """Получение пользователя по ID (через кэш)"""
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        return User.from_dict(cached) if as_model else dict(cached)
+    
     try:
         with PostgreSQLDriver() as db:
-            return db.select_by_id(User.TABLE_NAME, user_id)
+            user = db.select_by_id(User.TABLE_NAME, user_id)
+        if user:
+            _user_cache.set(user_id, dict(user))
+            if as_model:
+                return User.from_dict(user)
+        return user
     except Exception as e:
         print(f"Ошибка получения пользователя: {e}")
         return None
 
 
-def get_all_users(is_active: Optional[bool] = None) -> List[Dict[str, Any]]:
-    """Получение всех пользователей"""
+def get_users_by_ids(user_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Пакетное получение пользователей по списку ID
+    
+    Отсутствующие в кэше пользователи загружаются одним запросом.
+    
+    Returns:
+        Словарь {id: пользователь}; несуществующие ID в нем отсутствуют
+    """
+    try:
+        return _get_by_ids(_user_cache, User.TABLE_NAME, user_ids)
+    except Exception as e:
+        print(f"Ошибка получения пользователей: {e}")
+        return {}
+
+
+def get_all_users(is_active: Optional[bool] = None,
+                  as_model: bool = False,
+                  include_deleted: bool = False) -> List[Union[Dict[str, Any], User]]:
+    """
+    Получение всех пользователей
+    
+    Args:
+        is_active: Фильтр по активности
+        as_model: Вернуть объекты User вместо словарей (меньше памяти на больших выборках)
+        include_deleted: Включить мягко удаленных пользователей
+    """
     try:
         with PostgreSQLDriver() as db:
-            if is_active is not None:
-                return db.select(User.TABLE_NAME, where={'is_active': is_active})
-            return db.select(User.TABLE_NAME)
+            where = {'is_active': is_active} if is_active is not None else {}
+            if not include_deleted:
+                where['deleted_at'] = None
+            where = where or None
+            if as_model:
+                return _select_models(db, User, where=where)
+            return db.select(User.TABLE_NAME, where=where)
     except Exception as e:
         print(f"Ошибка получения пользователей: {e}")
         return []
@@ -82,21 +231,144 @@ def update_user(user_id: int, **kwargs) -> bool:
     try:
         with PostgreSQLDriver() as db:
             affected = db.update_by_id(User.TABLE_NAME, user_id, kwargs)
-            return affected > 0
+        _user_cache.invalidate(user_id)
+        return affected > 0
     except Exception as e:
         print(f"Ошибка обновления пользователя: {e}")
         return False
 
 
-def delete_user(user_id: int) -> bool:
-    """Удаление пользователя"""
+def delete_user(user_id: int, soft: bool = False, batch_size: int = 5000,
+                progress: Optional[Callable[[int, int], None]] = None) -> bool:
+    """
+    Удаление пользователя
+    
+    Пользователь сразу мягко удаляется (скрывается из списков и поиска),
+    затем, если не soft, его бронирования удаляются пакетами короткими
+    транзакциями и удаляется сама запись (см. _purge_record).
+    
+    Args:
+        user_id: ID пользователя
+        soft: Только мягкое удаление (окончательно удалит задание purge_deleted)
+        batch_size: Размер пакета удаления бронирований
+        progress: Функция progress(удалено, всего) для отображения хода удаления
+    """
+    return _delete_record(User, user_id, soft, batch_size, progress)
+
+
+# ==================== ПОИСК ПОЛЬЗОВАТЕЛЕЙ ====================
+
+def _install_user_search(db: PostgreSQLDriver, concurrent_indexes: bool = False) -> bool:
+    """
+    Подключение pg_trgm и триграммных индексов поиска пользователей
+    
+    Returns:
+        False, если расширение недоступно (поиск работает только по префиксу)
+    """
     try:
-        with PostgreSQLDriver() as db:
-            affected = db.delete_by_id(User.TABLE_NAME, user_id)
-            return affected > 0
+        db.execute_command("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        db.connection.commit()
     except Exception as e:
-        print(f"Ошибка удаления пользователя: {e}")
+        db.connection.rollback()
+        print(f"Внимание: расширение pg_trgm недоступно, поиск пользователей "
+              f"только по префиксу ({e})")
         return False
+    finally:
+        _trigram_cache.clear()
+    
+    db.create_indexes(User.TABLE_NAME, User.TRGM_INDEXES, concurrently=concurrent_indexes)
+    return True
+
+
+def _trigram_enabled(db: PostgreSQLDriver) -> bool:
+    """Подключено ли расширение pg_trgm"""
+    cached = _trigram_cache.get('pg_trgm')
+    if cached is None:
+        cached = bool(db.execute_query(
+            "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+        ))
+        _trigram_cache.set('pg_trgm', cached)
+    return cached
+
+
+def _like_escape(text: str) -> str:
+    """Экранирование спецсимволов LIKE"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_users(query: str, limit: int = 20,
+                 include_inactive: bool = False) -> List[Dict[str, Any]]:
+    """
+    Поиск пользователей по логину, email, имени/фамилии и телефону
+    
+    Совпадения по началу (логин, email, имя, фамилия, цифры телефона)
+    идут первыми, затем - нечеткие по триграммам (pg_trgm), по убыванию
+    сходства. Каждое условие поддержано индексом по выражению из модели
+    User, поэтому поиск не читает таблицу целиком. Без pg_trgm работает
+    только поиск по началу.
+    
+    Args:
+        query: Строка поиска
+        limit: Максимальное количество результатов
+        include_inactive: Искать и среди неактивных пользователей
+    
+    Returns:
+        Список пользователей (без password_hash) с оценкой score
+    """
+    text = ' '.join(query.lower().split())
+    if not text:
+        return []
+    digits = ''.join(char for char in text if char.isdigit())
+    params = {
+        'text': text,
+        'prefix': _like_escape(text) + '%',
+        'contains': '%' + _like_escape(text) + '%',
+        'digits_prefix': digits + '%',
+        'digits_contains': '%' + digits + '%',
+        'limit': limit
+    }
+    # Поиск по телефону - только если в запросе достаточно цифр
+    by_phone = len(digits) >= 3
+    
+    prefix_conditions = [
+        "lower(username) LIKE %(prefix)s",
+        "lower(email) LIKE %(prefix)s",
+        "lower(first_name) LIKE %(prefix)s",
+        "lower(last_name) LIKE %(prefix)s",
+    ]
+    if by_phone:
+        prefix_conditions.append(f"{User.PHONE_SEARCH_EXPR} LIKE %(digits_prefix)s")
+    prefix_match = ' OR '.join(prefix_conditions)
+    columns = ', '.join(field for field in User.FIELDS if field != 'password_hash')
+    
+    try:
+        with PostgreSQLDriver() as db:
+            conditions = list(prefix_conditions)
+            score = '0.0'
+            if _trigram_enabled(db):
+                conditions += [
+                    "lower(username) %% %(text)s",
+                    "lower(email) %% %(text)s",
+                    f"{User.NAME_SEARCH_EXPR} %% %(text)s",
+                    f"{User.NAME_SEARCH_EXPR} LIKE %(contains)s",
+                ]
+                if by_phone:
+                    conditions.append(f"{User.PHONE_SEARCH_EXPR} LIKE %(digits_contains)s")
+                score = (f"GREATEST(similarity(lower(username), %(text)s), "
+                         f"similarity(lower(email), %(text)s), "
+                         f"similarity({User.NAME_SEARCH_EXPR}, %(text)s))")
+            
+            active = 'AND deleted_at IS NULL' if include_inactive else 'AND is_active AND deleted_at IS NULL'
+            return db.execute_query(f"""
+            SELECT {columns}, round(({score})::numeric, 3)::float AS score
+            FROM {User.TABLE_NAME}
+            WHERE ({' OR '.join(conditions)}) {active}
+            ORDER BY ({prefix_match}) DESC, score DESC, username
+            LIMIT %(limit)s
+            """, params)
+    except Exception as e:
+        print(f"Ошибка поиска пользователей: {e}")
+        return []
 
 
 # ==================== CRUD ДЛЯ СТОЛОВ (TABLES) ====================
@@ -119,29 +391,78 @@ def create_table_record(number: int, capacity: int,
             }
             
             table_id = db.insert(Table.TABLE_NAME, table_data, return_id=True)
-            return table_id
+        _invalidate_table()
+        return table_id
     except Exception as e:
         print(f"Ошибка создания стола: {e}")
         return None
 
 
-def get_table_by_id(table_id: int) -> Optional[Dict[str, Any]]:
-    """Получение стола по ID"""
+def get_table_by_id(table_id: int, as_model: bool = False) -> Optional[Union[Dict[str, Any], Table]]:
+    """Получение стола по ID (через кэш)"""
+    cached = _table_cache.get(table_id)
+    if cached is not None:
+        return Table.from_dict(cached) if as_model else dict(cached)
+    
     try:
         with PostgreSQLDriver() as db:
-            return db.select_by_id(Table.TABLE_NAME, table_id)
+            table = db.select_by_id(Table.TABLE_NAME, table_id)
+        if table:
+            _table_cache.set(table_id, dict(table))
+            if as_model:
+                return Table.from_dict(table)
+        return table
     except Exception as e:
         print(f"Ошибка получения стола: {e}")
         return None
 
 
-def get_all_tables(is_active: Optional[bool] = None) -> List[Dict[str, Any]]:
-    """Получение всех столов"""
+def get_tables_by_ids(table_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Пакетное получение столов по списку ID
+    
+    Returns:
+        Словарь {id: стол}; несуществующие ID в нем отсутствуют
+    """
+    try:
+        return _get_by_ids(_table_cache, Table.TABLE_NAME, table_ids)
+    except Exception as e:
+        print(f"Ошибка получения столов: {e}")
+        return {}
+
+
+def get_all_tables(is_active: Optional[bool] = None,
+                   as_model: bool = False,
+                   include_deleted: bool = False) -> List[Union[Dict[str, Any], Table]]:
+    """
+    Получение всех столов (список активных столов кэшируется)
+    
+    Args:
+        is_active: Фильтр по активности
+        as_model: Вернуть объекты Table вместо словарей
+        include_deleted: Включить мягко удаленные столы
+    """
+    if is_active is True and not include_deleted:
+        cached = _active_tables_cache.get(True)
+        if cached is not None:
+            if as_model:
+                return [Table.from_dict(table) for table in cached]
+            return [dict(table) for table in cached]
+    
     try:
         with PostgreSQLDriver() as db:
-            if is_active is not None:
-                return db.select(Table.TABLE_NAME, where={'is_active': is_active})
-            return db.select(Table.TABLE_NAME)
+            where = {'is_active': is_active} if is_active is not None else {}
+            if not include_deleted:
+                where['deleted_at'] = None
+            tables = db.select(Table.TABLE_NAME, where=where or None)
+        
+        for table in tables:
+            _table_cache.set(table['id'], dict(table))
+        if is_active is True and not include_deleted:
+            _active_tables_cache.set(True, [dict(table) for table in tables])
+        if as_model:
+            return [Table.from_dict(table) for table in tables]
+        return tables
     except Exception as e:
         print(f"Ошибка получения столов: {e}")
         return []
@@ -152,21 +473,29 @@ def update_table(table_id: int, **kwargs) -> bool:
     try:
         with PostgreSQLDriver() as db:
             affected = db.update_by_id(Table.TABLE_NAME, table_id, kwargs)
-            return affected > 0
+        _invalidate_table(table_id)
+        return affected > 0
     except Exception as e:
         print(f"Ошибка обновления стола: {e}")
         return False
 
 
-def delete_table(table_id: int) -> bool:
-    """Удаление стола"""
-    try:
-        with PostgreSQLDriver() as db:
-            affected = db.delete_by_id(Table.TABLE_NAME, table_id)
-            return affected > 0
-    except Exception as e:
-        print(f"Ошибка удаления стола: {e}")
-        return False
+def delete_table(table_id: int, soft: bool = False, batch_size: int = 5000,
+                 progress: Optional[Callable[[int, int], None]] = None) -> bool:
+    """
+    Удаление стола
+    
+    Стол сразу мягко удаляется (становится неактивным и пропадает из списков),
+    затем, если не soft, его бронирования удаляются пакетами короткими
+    транзакциями и удаляется сама запись (см. _purge_record).
+    
+    Args:
+        table_id: ID стола
+        soft: Только мягкое удаление (окончательно удалит задание purge_deleted)
+        batch_size: Размер пакета удаления бронирований
+        progress: Функция progress(удалено, всего) для отображения хода удаления
+    """
+    return _delete_record(Table, table_id, soft, batch_size, progress)
 
 
 # ==================== CRUD ДЛЯ БРОНИРОВАНИЙ (BOOKINGS) ====================
@@ -178,7 +507,12 @@ def create_booking(user_id: int, table_id: int, booking_date: date,
                   contact_name: Optional[str] = None,
                   special_requests: Optional[str] = None,
                   duration: int = 120) -> Optional[int]:
-    """Создание нового бронирования"""
+    """
+    Создание нового бронирования
+    
+    Пересечения с другими бронированиями не проверяются; для бронирования
+    с гарантией свободного стола используйте reserve_table().
+    """
     try:
         with PostgreSQLDriver() as db:
             booking_data = {
@@ -195,63 +529,253 @@ def create_booking(user_id: int, table_id: int, booking_date: date,
             }
             
             booking_id = db.insert(Booking.TABLE_NAME, booking_data, return_id=True)
-            return booking_id
+        audit.record_change('create', booking_id, None, booking_data)
+        return booking_id
     except Exception as e:
         print(f"Ошибка создания бронирования: {e}")
         return None
 
 
-def get_booking_by_id(booking_id: int) -> Optional[Dict[str, Any]]:
-    """Получение бронирования по ID"""
+def get_booking_by_id(booking_id: int, as_model: bool = False) -> Optional[Union[Dict[str, Any], Booking]]:
+    """Получение бронирования по ID (если нет в bookings - ищется в архиве)"""
     try:
         with PostgreSQLDriver() as db:
-            return db.select_by_id(Booking.TABLE_NAME, booking_id)
+            booking = db.select_by_id(Booking.TABLE_NAME, booking_id)
+            if booking is None and _archive_watermark(db) is not None:
+                booking = db.select_by_id(Booking.ARCHIVE_TABLE_NAME, booking_id)
+            if booking and as_model:
+                return Booking.from_dict(booking)
+            return booking
     except Exception as e:
         print(f"Ошибка получения бронирования: {e}")
         return None
 
 
+# Варианты сортировки списка бронирований
+BOOKING_SORT_ORDERS = {
+    'date_desc': 'booking_date DESC, booking_time DESC',
+    'date_asc': 'booking_date ASC, booking_time ASC',
+    'created_desc': 'created_at DESC',
+    'created_asc': 'created_at ASC',
+    'guests_desc': 'guests_count DESC, booking_date ASC, booking_time ASC',
+}
+
+
+def _bookings_list_query(db: PostgreSQLDriver,
+                         user_id: Optional[int] = None,
+                         table_id: Optional[int] = None,
+                         status: Optional[str] = None,
+                         booking_date: Optional[date] = None,
+                         date_from: Optional[date] = None,
+                         date_to: Optional[date] = None,
+                         statuses: Optional[Iterable[str]] = None,
+                         table_ids: Optional[Iterable[int]] = None,
+                         location: Optional[str] = None,
+                         sort: str = 'date_desc',
+                         limit: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Запрос списка бронирований с фильтрами (колонки в порядке Booking.FIELDS)
+    
+    Все условия - в одном запросе: диапазон дат и списки значений
+    (= ANY) используют индексы (table_id, booking_date) и (booking_date,
+    booking_time), расположение проверяется подзапросом по tables.
+    Архив подключается, только если начало периода попадает в него.
+    """
+    if sort not in BOOKING_SORT_ORDERS:
+        raise ValueError(f"Неизвестная сортировка: {sort}")
+    
+    conditions = []
+    params: Dict[str, Any] = {}
+    for column, value in (('user_id', user_id), ('table_id', table_id),
+                          ('status', status), ('booking_date', booking_date)):
+        if value is not None:
+            conditions.append(f"{column} = %({column})s")
+            params[column] = value
+    if date_from is not None:
+        conditions.append("booking_date >= %(date_from)s")
+        params['date_from'] = date_from
+    if date_to is not None:
+        conditions.append("booking_date <= %(date_to)s")
+        params['date_to'] = date_to
+    if statuses is not None:
+        conditions.append("status = ANY(%(statuses)s)")
+        params['statuses'] = list(statuses)
+    if table_ids is not None:
+        conditions.append("table_id = ANY(%(table_ids)s)")
+        params['table_ids'] = list(table_ids)
+    if location is not None:
+        conditions.append(f"table_id IN (SELECT id FROM {Table.TABLE_NAME} "
+                          f"WHERE location = %(location)s)")
+        params['location'] = location
+    
+    earliest = booking_date if booking_date is not None else date_from
+    source = Booking.TABLE_NAME
+    if earliest is not None and _archive_covers(db, earliest):
+        source = _bookings_source(db, earliest)
+    
+    query = f"""
+    SELECT {', '.join(Booking.FIELDS)}
+    FROM {source} AS b
+    WHERE {' AND '.join(conditions) or 'TRUE'}
+    ORDER BY {BOOKING_SORT_ORDERS[sort]}
+    """
+    if limit is not None:
+        query += " LIMIT %(limit)s"
+        params['limit'] = limit
+    return query, params
+
+
 def get_all_bookings(user_id: Optional[int] = None, 
                     table_id: Optional[int] = None,
                     status: Optional[str] = None,
-                    booking_date: Optional[date] = None) -> List[Dict[str, Any]]:
-    """Получение всех бронирований с фильтрацией"""
-    try:
-        with PostgreSQLDriver() as db:
-            where_clause = {}
-            if user_id is not None:
-                where_clause['user_id'] = user_id
-            if table_id is not None:
-                where_clause['table_id'] = table_id
-            if status is not None:
-                where_clause['status'] = status
-            if booking_date is not None:
-                where_clause['booking_date'] = booking_date
-            
-            return db.select(Booking.TABLE_NAME, where=where_clause if where_clause else None,
-                            order_by='booking_date DESC, booking_time DESC')
+                    booking_date: Optional[date] = None,
+                    as_model: bool = False,
+                    date_from: Optional[date] = None,
+                    date_to: Optional[date] = None,
+                    statuses: Optional[Iterable[str]] = None,
+                    table_ids: Optional[Iterable[int]] = None,
+                    location: Optional[str] = None,
+                    sort: str = 'date_desc',
+                    limit: Optional[int] = None) -> List[Union[Dict[str, Any], Booking]]:
+    """
+    Получение всех бронирований с фильтрацией
+    
+    Если запрошена дата (или начало периода), попадающая в архив (не позже
+    последней архивной даты), архив читается вместе с bookings через UNION ALL.
+    Без фильтра по дате читаются только оперативные бронирования.
+    Для больших выборок используйте iter_bookings().
+    
+    Args:
+        as_model: Вернуть объекты Booking вместо словарей
+                  (строки читаются кортежами и создаются без поиска по ключам)
+        date_from: Начало периода (включительно)
+        date_to: Конец периода (включительно)
+        statuses: Любой из статусов
+        table_ids: Любой из столов
+        location: Расположение стола
+        sort: Сортировка - ключ BOOKING_SORT_ORDERS
+        limit: Максимальное количество бронирований
+    """
+    try:
+        with PostgreSQLDriver() as db:
+            query, params = _bookings_list_query(
+                db, user_id, table_id, status, booking_date, date_from, date_to,
+                statuses, table_ids, location, sort, limit
+            )
+            if as_model:
+                return Booking.from_rows(db.execute_query(query, params, as_tuples=True))
+            return db.execute_query(query, params)
     except Exception as e:
         print(f"Ошибка получения бронирований: {e}")
         return []
 
 
+def iter_bookings(batch_size: int = 5000, as_model: bool = False,
+                  **filters) -> Iterator[Union[Dict[str, Any], Booking]]:
+    """
+    Потоковое получение бронирований с теми же фильтрами, что get_all_bookings
+    
+    Строки читаются с сервера пачками по batch_size через серверный курсор,
+    поэтому память не зависит от размера выборки. Подключение занято, пока
+    итерация не завершена.
+    
+    Args:
+        batch_size: Количество строк в одной пачке с сервера
+        as_model: Выдавать объекты Booking вместо словарей
+        **filters: Параметры фильтрации get_all_bookings
+    """
+    try:
+        with PostgreSQLDriver() as db:
+            query, params = _bookings_list_query(db, **filters)
+            for row in db.iter_query(query, params, batch_size):
+                yield Booking.from_row(row) if as_model else dict(zip(Booking.FIELDS, row))
+    except Exception as e:
+        print(f"Ошибка получения бронирований: {e}")
+
+
+def _update_bookings(db: PostgreSQLDriver, changes: Dict[str, Any], condition: str,
+                     params: Dict[str, Any]) -> Tuple[int, List[tuple]]:
+    """
+    UPDATE бронирований с получением старых и новых значений измененных полей
+    
+    Старые значения читаются в том же операторе (CTE с FOR UPDATE), поэтому
+    журнал изменений не добавляет отдельного чтения перед записью.
+    updated_at выставляется в текущее время, если не передан явно.
+    
+    Args:
+        changes: Новые значения полей {поле: значение}
+        condition: Условие WHERE (параметры - в стиле %(name)s)
+        params: Параметры условия
+    
+    Returns:
+        (количество измененных строк,
+         записи для журнала ('update', booking_id, old_values, new_values)
+         без строк, в которых значения не изменились)
+    """
+    if not changes:
+        raise ValueError("Нет полей для изменения")
+    
+    fields = list(changes)
+    assignments = ', '.join(f"{field} = %(set_{field})s" for field in fields)
+    if 'updated_at' not in changes:
+        assignments += ", updated_at = CURRENT_TIMESTAMP"
+    old_values = ', '.join(f"'{field}', old.{field}" for field in fields)
+    new_values = ', '.join(f"'{field}', b.{field}" for field in fields)
+    
+    rows = db.execute_query(f"""
+    WITH old AS (
+        SELECT id, {', '.join(fields)} FROM {Booking.TABLE_NAME}
+        WHERE {condition}
+        FOR UPDATE
+    )
+    UPDATE {Booking.TABLE_NAME} AS b
+    SET {assignments}
+    FROM old
+    WHERE b.id = old.id
+    RETURNING b.id, jsonb_build_object({old_values}) AS old_values,
+              jsonb_build_object({new_values}) AS new_values
+    """, dict(params, **{f"set_{field}": value for field, value in changes.items()}))
+    
+    return len(rows), [('update', row['id'], row['old_values'], row['new_values'])
+                       for row in rows if row['old_values'] != row['new_values']]
+
+
 def update_booking(booking_id: int, **kwargs) -> bool:
-    """Обновление бронирования"""
+    """
+    Обновление бронирования (старые и новые значения пишутся в журнал изменений)
+    
+    Изменение стола, даты, времени, длительности или статуса выполняется
+    через reschedule_booking() - с проверкой пересечений под блокировкой
+    стола; при пересечении бронирование не изменяется.
+    """
+    if set(kwargs) & set(BOOKING_SLOT_FIELDS):
+        result = reschedule_booking(booking_id, **kwargs)
+        if result['status'] == RESERVE_CONFLICT:
+            print(f"Бронирование {booking_id} не изменено: стол занят в это время")
+        elif result['status'] == RESERVE_UNAVAILABLE:
+            print(f"Бронирование {booking_id} не изменено: {result['error']}")
+        return result['status'] == RESERVE_OK
     try:
         with PostgreSQLDriver() as db:
-            affected = db.update_by_id(Booking.TABLE_NAME, booking_id, kwargs)
-            return affected > 0
+            affected, changes = _update_bookings(db, kwargs, "id = %(booking_id)s",
+                                                 {'booking_id': booking_id})
+        audit.record_changes(changes)
+        return affected > 0
     except Exception as e:
         print(f"Ошибка обновления бронирования: {e}")
         return False
 
 
 def delete_booking(booking_id: int) -> bool:
-    """Удаление бронирования"""
+    """Удаление бронирования (удаленная запись пишется в журнал изменений)"""
     try:
         with PostgreSQLDriver() as db:
-            affected = db.delete_by_id(Booking.TABLE_NAME, booking_id)
-            return affected > 0
+            rows = db.execute_query(
+                f"DELETE FROM {Booking.TABLE_NAME} WHERE id = %s RETURNING *", (booking_id,)
+            )
+        if rows:
+            audit.record_change('delete', booking_id, dict(rows[0]), None)
+        return bool(rows)
     except Exception as e:
         print(f"Ошибка удаления бронирования: {e}")
         return False
@@ -324,25 +848,30 @@ def is_table_available(table_id: int, booking_date: date, booking_time: time,
         return False
 
 
-def get_table_availability(table_id: int, booking_date: date) -> List[Dict[str, Any]]:
+def get_table_availability(table_id: int, booking_date: date,
+                           as_model: bool = False) -> List[Union[Dict[str, Any], Booking]]:
     """
     Получение всех бронирований стола на указанную дату
     
     Args:
         table_id: ID стола
         booking_date: Дата для проверки
+        as_model: Вернуть объекты Booking вместо словарей
     
     Returns:
         Список бронирований на эту дату
     """
     try:
         with PostgreSQLDriver() as db:
+            where = {
+                'table_id': table_id,
+                'booking_date': booking_date
+            }
+            if as_model:
+                return _select_models(db, Booking, where=where, order_by='booking_time ASC')
             bookings = db.select(
                 Booking.TABLE_NAME,
-                where={
-                    'table_id': table_id,
-                    'booking_date': booking_date
-                },
+                where=where,
                 order_by='booking_time ASC'
             )
             return bookings
@@ -351,6 +880,2125 @@ def get_table_availability(table_id: int, booking_date: date) -> List[Dict[str,
         return []
 
 
+# ==================== БРОНИРОВАНИЕ БЕЗ ПЕРЕСЕЧЕНИЙ ====================
+
+# Класс advisory-блокировок бронирования столов: pg_advisory_xact_lock(класс, table_id)
+RESERVE_LOCK_CLASS = 4201
+
+# Результаты reserve_table и reschedule_booking
+RESERVE_OK = 'reserved'
+RESERVE_CONFLICT = 'conflict'
+RESERVE_NOT_FOUND = 'not_found'
+RESERVE_UNAVAILABLE = 'unavailable'
+RESERVE_ERROR = 'error'
+
+# Поля бронирования, изменение которых может создать пересечение
+BOOKING_SLOT_FIELDS = ('table_id', 'booking_date', 'booking_time', 'duration', 'status')
+
+
+def _overlapping_bookings(db: PostgreSQLDriver, table_id: int, booking_date: date,
+                          booking_time: time, duration: int,
+                          exclude_booking_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Активные бронирования стола, пересекающиеся с интервалом
+
+    Интервалы сравниваются как timestamp, поэтому учитываются и брони,
+    переходящие через полночь (соседние даты).
+    """
+    active = ', '.join(f"'{status}'" for status in Booking.ACTIVE_STATUSES)
+    start = datetime.combine(booking_date, booking_time)
+    query = f"""
+    SELECT id, booking_date, booking_time, duration, status
+    FROM {Booking.TABLE_NAME}
+    WHERE table_id = %(table_id)s
+      AND booking_date BETWEEN %(date_from)s AND %(date_to)s
+      AND status IN ({active})
+      AND id IS DISTINCT FROM %(exclude)s
+      AND booking_date + booking_time < %(end)s
+      AND {_BOOKING_END_SQL} > %(start)s
+    ORDER BY booking_date, booking_time
+    """
+    return db.execute_query(query, {
+        'table_id': table_id,
+        'date_from': booking_date - timedelta(days=1),
+        'date_to': booking_date + timedelta(days=1),
+        'exclude': exclude_booking_id,
+        'start': start,
+        'end': start + timedelta(minutes=duration),
+    })
+
+
+def _unavailable_reason(db: PostgreSQLDriver, user_id: Optional[int],
+                        table_id: int) -> Optional[str]:
+    """
+    Проверка, что на пользователя и стол можно бронировать
+    
+    Мягко удаленные пользователь и стол, а также неактивный стол недоступны.
+    Строки блокируются FOR SHARE до конца транзакции: параллельное мягкое
+    удаление дождется ее завершения.
+    
+    Returns:
+        Текст причины или None, если бронировать можно
+    """
+    if user_id is not None and not db.execute_query(
+        f"SELECT 1 FROM {User.TABLE_NAME} WHERE id = %s AND deleted_at IS NULL FOR SHARE",
+        (user_id,)
+    ):
+        return f"Пользователь {user_id} не найден или удален"
+    if not db.execute_query(
+        f"SELECT 1 FROM {Table.TABLE_NAME} "
+        f"WHERE id = %s AND deleted_at IS NULL AND is_active FOR SHARE",
+        (table_id,)
+    ):
+        return f"Стол {table_id} не найден, удален или неактивен"
+    return None
+
+
+def reserve_table(user_id: int, table_id: int, booking_date: date,
+                  booking_time: time, guests_count: int,
+                  status: str = 'pending',
+                  contact_phone: Optional[str] = None,
+                  contact_name: Optional[str] = None,
+                  special_requests: Optional[str] = None,
+                  duration: int = 120) -> Dict[str, Any]:
+    """
+    Бронирование стола с гарантией отсутствия пересечений
+
+    Проверка и вставка выполняются в одной транзакции под advisory-блокировкой
+    стола (pg_advisory_xact_lock), поэтому параллельные бронирования одного
+    стола выполняются по очереди, а разных столов - полностью параллельно.
+    Блокировка снимается при завершении транзакции.
+
+    Удаленные пользователь или стол и неактивный стол дают 'unavailable'.
+
+    Returns:
+        Dict[str, Any]: {'status': 'reserved' | 'conflict' | 'unavailable' | 'error',
+                         'booking_id': ID созданного бронирования или None,
+                         'conflicts': пересекающиеся бронирования (для 'conflict'),
+                         'error': текст ошибки или причина (для 'error', 'unavailable')}
+    """
+    result = {'status': RESERVE_ERROR, 'booking_id': None, 'conflicts': [], 'error': None}
+    booking_data = {
+        'user_id': user_id,
+        'table_id': table_id,
+        'booking_date': booking_date,
+        'booking_time': booking_time,
+        'guests_count': guests_count,
+        'status': status,
+        'contact_phone': contact_phone,
+        'contact_name': contact_name,
+        'special_requests': special_requests,
+        'duration': duration
+    }
+
+    try:
+        with PostgreSQLDriver() as db:
+            with db.transaction():
+                # Неактивная бронь стол не занимает - проверка пересечений не нужна
+                occupies = status in Booking.ACTIVE_STATUSES
+                if occupies:
+                    db.execute_query("SELECT pg_advisory_xact_lock(%s, %s)",
+                                     (RESERVE_LOCK_CLASS, table_id))
+                reason = _unavailable_reason(db, user_id, table_id)
+                if reason:
+                    result['status'] = RESERVE_UNAVAILABLE
+                    result['error'] = reason
+                    return result
+                if occupies:
+                    conflicts = _overlapping_bookings(db, table_id, booking_date,
+                                                      booking_time, duration)
+                    if conflicts:
+                        result['status'] = RESERVE_CONFLICT
+                        result['conflicts'] = conflicts
+                        return result
+
+                result['booking_id'] = db.insert(Booking.TABLE_NAME, booking_data, return_id=True)
+                result['status'] = RESERVE_OK
+        audit.record_change('create', result['booking_id'], None, booking_data)
+        return result
+    except Exception as e:
+        print(f"Ошибка бронирования стола: {e}")
+        result['error'] = str(e)
+        return result
+
+
+def reschedule_booking(booking_id: int, **kwargs) -> Dict[str, Any]:
+    """
+    Изменение бронирования с гарантией отсутствия пересечений
+    
+    Строка бронирования блокируется (FOR UPDATE), затем, если бронирование
+    переносится (стол, дата, время, длительность) или снова становится
+    активным, под той же advisory-блокировкой стола, что и в reserve_table,
+    проверяются доступность пользователя и стола и пересечения. Проверка и
+    UPDATE выполняются в одной транзакции.
+    
+    Args:
+        booking_id: ID бронирования
+        **kwargs: Новые значения полей
+    
+    Returns:
+        Dict[str, Any]: {'status': 'reserved' | 'conflict' | 'not_found' |
+                                   'unavailable' | 'error',
+                         'booking_id': ID бронирования,
+                         'conflicts': пересекающиеся бронирования (для 'conflict'),
+                         'error': текст ошибки или причина (для 'error', 'unavailable')}
+    """
+    result = {'status': RESERVE_ERROR, 'booking_id': booking_id, 'conflicts': [], 'error': None}
+    
+    try:
+        if not kwargs:
+            raise ValueError("Нет полей для изменения")
+        
+        with PostgreSQLDriver() as db:
+            with db.transaction():
+                rows = db.execute_query(
+                    f"SELECT user_id, table_id, booking_date, booking_time, duration, status "
+                    f"FROM {Booking.TABLE_NAME} WHERE id = %s FOR UPDATE",
+                    (booking_id,)
+                )
+                if not rows:
+                    result['status'] = RESERVE_NOT_FOUND
+                    return result
+                current = rows[0]
+                target = dict(current, **{field: kwargs[field]
+                                          for field in BOOKING_SLOT_FIELDS if field in kwargs})
+                
+                moved = any(target[field] != current[field]
+                            for field in ('table_id', 'booking_date', 'booking_time', 'duration'))
+                activated = current['status'] not in Booking.ACTIVE_STATUSES
+                if target['status'] in Booking.ACTIVE_STATUSES and (moved or activated):
+                    db.execute_query("SELECT pg_advisory_xact_lock(%s, %s)",
+                                     (RESERVE_LOCK_CLASS, target['table_id']))
+                    reason = _unavailable_reason(db, current['user_id'], target['table_id'])
+                    if reason:
+                        result['status'] = RESERVE_UNAVAILABLE
+                        result['error'] = reason
+                        return result
+                    conflicts = _overlapping_bookings(db, target['table_id'],
+                                                      target['booking_date'],
+                                                      target['booking_time'],
+                                                      target['duration'] or 120,
+                                                      exclude_booking_id=booking_id)
+                    if conflicts:
+                        result['status'] = RESERVE_CONFLICT
+                        result['conflicts'] = conflicts
+                        return result
+                
+                _, changes = _update_bookings(db, kwargs, "id = %(booking_id)s",
+                                              {'booking_id': booking_id})
+                result['status'] = RESERVE_OK
+        audit.record_changes(changes)
+        return result
+    except Exception as e:
+        print(f"Ошибка изменения бронирования: {e}")
+        result['error'] = str(e)
+        return result
+
+
+# ==================== ОПТИМИЗАЦИЯ РАССАДКИ ====================
+
+class _TableSchedule:
+    """
+    Занятость стола за вечер: непересекающиеся интервалы в минутах от
+    начала дня, отсортированные по началу (и, значит, по концу)
+    """
+
+    __slots__ = ('id', 'number', 'capacity', 'location', 'starts', 'ends', 'owners')
+
+    def __init__(self, table: Dict[str, Any]):
+        self.id = table['id']
+        self.number = table['number']
+        self.capacity = table['capacity']
+        self.location = table.get('location')
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        # Индекс запроса или None для существующего бронирования
+        self.owners: List[Optional[int]] = []
+
+    def gap(self, start: int, end: int) -> Optional[int]:
+        """Свободное время вокруг интервала (None - интервал не помещается)"""
+        i = bisect.bisect_right(self.starts, start)
+        if i > 0 and self.ends[i - 1] > start:
+            return None
+        if i < len(self.starts) and self.starts[i] < end:
+            return None
+        before = start - self.ends[i - 1] if i > 0 else start
+        after = self.starts[i] - end if i < len(self.starts) else 24 * 60 - end
+        return before + after
+
+    def add(self, start: int, end: int, owner: Optional[int]):
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.owners.insert(i, owner)
+
+    def remove(self, owner: int):
+        i = self.owners.index(owner)
+        del self.starts[i], self.ends[i], self.owners[i]
+
+    def blockers(self, start: int, end: int) -> List[Optional[int]]:
+        """Владельцы интервалов, пересекающихся с [start, end)"""
+        first = bisect.bisect_right(self.ends, start)
+        last = bisect.bisect_left(self.starts, end)
+        return self.owners[first:last]
+
+
+def _minutes(day: date, booking_date: date, booking_time: time) -> int:
+    """Минуты от начала дня day (для соседних дат - вне 0..1440)"""
+    return (booking_date - day).days * 24 * 60 + booking_time.hour * 60 + booking_time.minute
+
+
+def _best_table(groups: List[Tuple[int, List[_TableSchedule]]], size: int, start: int, end: int,
+                location: Optional[str] = None,
+                exclude: Optional[_TableSchedule] = None) -> Optional[_TableSchedule]:
+    """
+    Стол с наименьшим запасом мест, куда помещается интервал
+
+    Среди столов одной вместимости предпочитается желаемое расположение,
+    затем стол, где интервал оставляет меньше всего свободного времени
+    (плотнее упаковка - больше места для следующих компаний).
+    """
+    start_group = bisect.bisect_left(groups, (size,))
+    for _, tables in groups[start_group:]:
+        best, best_key = None, None
+        for schedule in tables:
+            if schedule is exclude:
+                continue
+            gap = schedule.gap(start, end)
+            if gap is None:
+                continue
+            key = (location is not None and schedule.location != location, gap)
+            if best_key is None or key < best_key:
+                best, best_key = schedule, key
+        if best is not None:
+            return best
+    return None
+
+
+def _build_schedules(booking_date: date, tables: List[Dict[str, Any]],
+                     booked: List[Dict[str, Any]]) -> Dict[int, _TableSchedule]:
+    """Занятость столов существующими активными бронированиями"""
+    schedules = {table['id']: _TableSchedule(table) for table in tables}
+    for booking in booked:
+        schedule = schedules.get(booking['table_id'])
+        if schedule is not None:
+            start = _minutes(booking_date, booking['booking_date'], booking['booking_time'])
+            schedule.add(start, start + (booking['duration'] or 120), None)
+    return schedules
+
+
+def _plan_seating(booking_date: date, tables: List[Dict[str, Any]], booked: List[Dict[str, Any]],
+                  parties: List[Dict[str, Any]], time_budget: float) -> Dict[int, _TableSchedule]:
+    """
+    Распределение компаний по столам
+
+    1. Жадно: сначала большие компании (больше гостей на кону), затем длинные;
+       каждой - наименее избыточный по вместимости стол со свободным интервалом.
+    2. Пока есть время: для каждой нерассаженной компании ищется стол, где
+       мешает ровно одна запланированная компания, которую можно пересадить.
+
+    Returns:
+        Dict[int, _TableSchedule]: {индекс компании: стол}
+    """
+    deadline = time_module.perf_counter() + time_budget
+    schedules = _build_schedules(booking_date, tables, booked)
+
+    by_capacity: Dict[int, List[_TableSchedule]] = {}
+    for schedule in schedules.values():
+        by_capacity.setdefault(schedule.capacity, []).append(schedule)
+    groups = sorted(by_capacity.items(), key=lambda item: item[0])
+
+    order = sorted(range(len(parties)),
+                   key=lambda i: (-parties[i]['guests_count'], -parties[i]['duration'],
+                                  parties[i]['start']))
+    placed: Dict[int, _TableSchedule] = {}
+
+    def place(index: int, exclude: Optional[_TableSchedule] = None) -> Optional[_TableSchedule]:
+        party = parties[index]
+        schedule = _best_table(groups, party['guests_count'], party['start'], party['end'],
+                               party.get('location'), exclude)
+        if schedule is not None:
+            schedule.add(party['start'], party['end'], index)
+            placed[index] = schedule
+        return schedule
+
+    for index in order:
+        place(index)
+
+    # Улучшение: пересадка одной мешающей компании на другой стол
+    for index in order:
+        if index in placed:
+            continue
+        if time_module.perf_counter() > deadline:
+            break
+        party = parties[index]
+        for capacity, group in groups[bisect.bisect_left(groups, (party['guests_count'],)):]:
+            done = False
+            for schedule in group:
+                blockers = schedule.blockers(party['start'], party['end'])
+                if len(blockers) != 1 or blockers[0] is None:
+                    continue
+                moved = blockers[0]
+                schedule.remove(moved)
+                del placed[moved]
+                if schedule.gap(party['start'], party['end']) is not None and place(moved, schedule):
+                    schedule.add(party['start'], party['end'], index)
+                    placed[index] = schedule
+                    done = True
+                    break
+                moved_party = parties[moved]
+                schedule.add(moved_party['start'], moved_party['end'], moved)
+                placed[moved] = schedule
+            if done:
+                break
+
+    return placed
+
+
+def optimize_seating(booking_date: date, requests: List[Dict[str, Any]],
+                     apply: bool = True, time_budget: float = 0.5) -> Dict[str, Any]:
+    """
+    Рассадка компаний вечера по столам
+
+    Максимизирует число рассаженных гостей и минимизирует пустые места
+    (жадное распределение по интервалам с подбором наименьшего подходящего
+    стола и пересадками в пределах time_budget). Уже существующие активные
+    бронирования на дату считаются занятыми интервалами.
+
+    Применение: бронирования всех рассаженных компаний создаются одной
+    вставкой под advisory-блокировками задействованных столов (как в
+    reserve_table); компании, чьи интервалы за время расчета заняли
+    параллельно, переносятся в нерассаженные.
+
+    Args:
+        booking_date: Дата
+        requests: Компании - словари с полями guests_count, booking_time
+                  (time или 'HH:MM') и необязательными duration (120),
+                  location (желаемое расположение), user_id, contact_name,
+                  contact_phone, special_requests, status ('pending')
+        apply: Создать бронирования (False - только расчет)
+        time_budget: Время на улучшение распределения, секунды
+
+    Returns:
+        Dict[str, Any]: assignments (индекс запроса, стол, booking_id),
+                        unseated (индекс запроса, причина), requested_covers,
+                        seated_covers, wasted_seats, elapsed
+    """
+    started = time_module.perf_counter()
+    result = {'assignments': [], 'unseated': [], 'requested_covers': 0,
+              'seated_covers': 0, 'wasted_seats': 0, 'elapsed': 0.0}
+
+    parties = []
+    for request in requests:
+        booking_time = request['booking_time']
+        if isinstance(booking_time, str):
+            booking_time = time.fromisoformat(booking_time)
+        start = _minutes(booking_date, booking_date, booking_time)
+        duration = request.get('duration') or 120
+        parties.append(dict(request, booking_time=booking_time, duration=duration,
+                            start=start, end=start + duration))
+        result['requested_covers'] += request['guests_count']
+
+    active = ', '.join(f"'{status}'" for status in Booking.ACTIVE_STATUSES)
+    booked_query = f"""
+    SELECT table_id, booking_date, booking_time, duration
+    FROM {Booking.TABLE_NAME}
+    WHERE booking_date BETWEEN %s AND %s AND status IN ({active})
+    """
+    day_range = (booking_date - timedelta(days=1), booking_date + timedelta(days=1))
+
+    try:
+        with PostgreSQLDriver() as db:
+            tables = db.select(Table.TABLE_NAME, columns=['id', 'number', 'capacity', 'location'],
+                               where={'is_active': True, 'deleted_at': None})
+            booked = db.execute_query(booked_query, day_range)
+            placed = _plan_seating(booking_date, tables, booked, parties, time_budget)
+
+            if apply and placed:
+                with db.transaction():
+                    table_ids = sorted({schedule.id for schedule in placed.values()})
+                    # Блокировки в порядке ID - без взаимоблокировок с другими рассадками
+                    with repeated_queries.allow_repeats():
+                        for table_id in table_ids:
+                            db.execute_query("SELECT pg_advisory_xact_lock(%s, %s)",
+                                             (RESERVE_LOCK_CLASS, table_id))
+
+                    # Повторная проверка: брони, созданные во время расчета
+                    fresh = _build_schedules(booking_date, tables,
+                                             db.execute_query(booked_query, day_range))
+                    for index, schedule in list(placed.items()):
+                        party = parties[index]
+                        if fresh[schedule.id].gap(party['start'], party['end']) is None:
+                            del placed[index]
+                            result['unseated'].append({'request': index, 'reason': 'conflict'})
+                        else:
+                            fresh[schedule.id].add(party['start'], party['end'], index)
+
+                    indexes = sorted(placed)
+                    new_bookings = [{
+                        'user_id': parties[index].get('user_id'),
+                        'table_id': placed[index].id,
+                        'booking_date': booking_date,
+                        'booking_time': parties[index]['booking_time'],
+                        'guests_count': parties[index]['guests_count'],
+                        'status': parties[index].get('status', 'pending'),
+                        'contact_phone': parties[index].get('contact_phone'),
+                        'contact_name': parties[index].get('contact_name'),
+                        'special_requests': parties[index].get('special_requests'),
+                        'duration': parties[index]['duration']
+                    } for index in indexes]
+                    booking_ids = db.insert_many(Booking.TABLE_NAME, new_bookings, return_ids=True)
+                    created = dict(zip(indexes, booking_ids))
+                audit.record_changes(('create', booking_id, None, booking)
+                                     for booking_id, booking in zip(booking_ids, new_bookings))
+            else:
+                created = {}
+    except Exception as e:
+        print(f"Ошибка оптимизации рассадки: {e}")
+        result['error'] = str(e)
+        result['elapsed'] = round(time_module.perf_counter() - started, 4)
+        return result
+
+    max_capacity = max((table['capacity'] for table in tables), default=0)
+    for index, party in enumerate(parties):
+        schedule = placed.get(index)
+        if schedule is None:
+            if not any(u['request'] == index for u in result['unseated']):
+                reason = 'too_large' if party['guests_count'] > max_capacity else 'no_slot'
+                result['unseated'].append({'request': index, 'reason': reason})
+            continue
+        result['assignments'].append({
+            'request': index,
+            'table_id': schedule.id,
+            'table_number': schedule.number,
+            'capacity': schedule.capacity,
+            'guests_count': party['guests_count'],
+            'booking_time': party['booking_time'],
+            'duration': party['duration'],
+            'booking_id': created.get(index)
+        })
+        result['seated_covers'] += party['guests_count']
+        result['wasted_seats'] += schedule.capacity - party['guests_count']
+
+    result['unseated'].sort(key=lambda u: u['request'])
+    result['elapsed'] = round(time_module.perf_counter() - started, 4)
+    return result
+
+
+# ==================== ПОДБОР БЛИЖАЙШЕГО СВОБОДНОГО ВРЕМЕНИ ====================
+
+def suggest_slots(guests_count: int, preferred_datetime: datetime, duration: int = 120,
+                  window_days: int = 1, limit: int = 5, step_minutes: int = 15,
+                  open_time: Optional[time] = None,
+                  close_time: Optional[time] = None) -> List[Dict[str, Any]]:
+    """
+    Ближайшие к желаемому времени свободные варианты (стол, время)
+    
+    Активные бронирования подходящих по вместимости столов за все окно
+    читаются одним запросом, после чего свободные промежутки каждого стола
+    перебираются в памяти по отсортированным интервалам. Из каждого
+    промежутка берется начало, ближайшее к желаемому времени.
+    
+    Args:
+        guests_count: Количество гостей
+        preferred_datetime: Желаемые дата и время
+        duration: Длительность, минуты
+        window_days: Искать в пределах ± стольких дней от желаемой даты
+        limit: Количество вариантов
+        step_minutes: Шаг сетки времени начала
+        open_time: Начало работы (по умолчанию OPENING_TIME)
+        close_time: Окончание работы - бронь должна закончиться до него
+                    (по умолчанию CLOSING_TIME)
+    
+    Returns:
+        Список вариантов по возрастанию отклонения от желаемого времени, при
+        равенстве - по запасу мест: table_id, table_number, capacity, location,
+        booking_date, booking_time, start, distance_minutes
+    """
+    open_time = open_time or OPENING_TIME
+    close_time = close_time or CLOSING_TIME
+    first_day = preferred_datetime.date() - timedelta(days=window_days)
+    last_day = preferred_datetime.date() + timedelta(days=window_days)
+    open_minutes = open_time.hour * 60 + open_time.minute
+    close_minutes = close_time.hour * 60 + close_time.minute
+    preferred = _minutes(first_day, preferred_datetime.date(), preferred_datetime.time())
+    # Варианты в прошлом не предлагаются
+    now = _minutes(first_day, date.today(), datetime.now().time())
+    
+    active = ', '.join(f"'{status}'" for status in Booking.ACTIVE_STATUSES)
+    try:
+        with PostgreSQLDriver() as db:
+            tables = db.execute_query(f"""
+            SELECT id, number, capacity, location
+            FROM {Table.TABLE_NAME}
+            WHERE is_active AND deleted_at IS NULL AND capacity >= %s
+            """, (guests_count,))
+            booked = db.execute_query(f"""
+            SELECT table_id, booking_date, booking_time, duration
+            FROM {Booking.TABLE_NAME}
+            WHERE table_id = ANY(%s)
+              AND booking_date BETWEEN %s AND %s
+              AND status IN ({active})
+            """, ([table['id'] for table in tables], first_day - timedelta(days=1), last_day))
+    except Exception as e:
+        print(f"Ошибка подбора времени: {e}")
+        return []
+    
+    def align_up(minutes: int) -> int:
+        return -(-minutes // step_minutes) * step_minutes
+    
+    def align_down(minutes: int) -> int:
+        return minutes // step_minutes * step_minutes
+    
+    options = []
+    for schedule in _build_schedules(first_day, tables, booked).values():
+        for day_index in range((last_day - first_day).days + 1):
+            day_start = day_index * 24 * 60
+            lowest = max(day_start + open_minutes, now)
+            highest = day_start + close_minutes - duration
+            if lowest > highest:
+                continue
+            
+            # Свободные промежутки между интервалами в пределах часов работы
+            i = bisect.bisect_right(schedule.ends, lowest)
+            gap_start = lowest
+            while gap_start <= highest:
+                gap_end = schedule.starts[i] if i < len(schedule.starts) else None
+                latest = highest if gap_end is None else min(highest, gap_end - duration)
+                earliest = align_up(gap_start)
+                latest = align_down(latest)
+                if earliest <= latest:
+                    start = min(max(align_down(preferred), earliest), latest)
+                    if start < preferred and start + step_minutes <= latest:
+                        # Ближайшая к желаемому времени точка сетки
+                        if preferred - start > start + step_minutes - preferred:
+                            start += step_minutes
+                    options.append((abs(start - preferred), schedule.capacity - guests_count,
+                                    schedule.number, start, schedule))
+                if gap_end is None:
+                    break
+                gap_start = max(gap_start, schedule.ends[i])
+                i += 1
+    
+    options.sort(key=lambda option: option[:3])
+    suggestions = []
+    for distance, _, _, start, schedule in options[:limit]:
+        start_at = datetime.combine(first_day, time(0)) + timedelta(minutes=start)
+        suggestions.append({
+            'table_id': schedule.id,
+            'table_number': schedule.number,
+            'capacity': schedule.capacity,
+            'location': schedule.location,
+            'booking_date': start_at.date(),
+            'booking_time': start_at.time(),
+            'start': start_at,
+            'distance_minutes': distance
+        })
+    return suggestions
+
+
+# ==================== СЕРИИ ПОВТОРЯЮЩИХСЯ БРОНИРОВАНИЙ ====================
+
+# Поля серии, которые можно менять для всех будущих вхождений сразу
+SERIES_EDITABLE_FIELDS = ('table_id', 'booking_time', 'duration', 'guests_count', 'status',
+                          'contact_phone', 'contact_name', 'special_requests')
+
+
+def _normalize_weekdays(weekdays: Union[None, str, Iterable[str]]) -> Optional[str]:
+    """Дни недели RRULE ('MO,TH' или ['MO', 'TH']) в строку для хранения"""
+    if weekdays is None:
+        return None
+    if isinstance(weekdays, str):
+        weekdays = weekdays.split(',')
+    codes = sorted({code.strip().upper() for code in weekdays if code.strip()},
+                   key=lambda code: BookingSeries.WEEKDAY_CODES.index(code)
+                   if code in BookingSeries.WEEKDAY_CODES else -1)
+    unknown = [code for code in codes if code not in BookingSeries.WEEKDAY_CODES]
+    if unknown:
+        raise ValueError(f"Неизвестные дни недели: {', '.join(unknown)}")
+    return ','.join(codes) or None
+
+
+def _expand_series(frequency: str, start_date: date, repeat_interval: int = 1,
+                   weekdays: Optional[str] = None, until_date: Optional[date] = None,
+                   occurrences: Optional[int] = None) -> List[date]:
+    """
+    Даты вхождений серии по правилу повторения
+    
+    'weekly' - по дням недели weekdays (по умолчанию день недели start_date)
+    каждую repeat_interval-ю неделю; 'monthly' - в число start_date каждый
+    repeat_interval-й месяц, месяцы без такого числа пропускаются (как в RRULE).
+    Перебор заканчивается на until_date, после occurrences вхождений или
+    на BookingSeries.MAX_OCCURRENCES.
+    """
+    if frequency not in BookingSeries.VALID_FREQUENCIES:
+        raise ValueError(f"Неизвестная частота повторения: {frequency}")
+    if repeat_interval < 1:
+        raise ValueError("Шаг повторения должен быть положительным")
+    if until_date is None and occurrences is None:
+        raise ValueError("Укажите until_date или occurrences")
+    
+    limit = min(occurrences or BookingSeries.MAX_OCCURRENCES, BookingSeries.MAX_OCCURRENCES)
+    dates = []
+    
+    if frequency == 'weekly':
+        days = ([BookingSeries.WEEKDAY_CODES.index(code) for code in weekdays.split(',')]
+                if weekdays else [start_date.weekday()])
+        week_start = start_date - timedelta(days=start_date.weekday())
+        while len(dates) < limit:
+            for weekday in days:
+                day = week_start + timedelta(days=weekday)
+                if day < start_date:
+                    continue
+                if (until_date is not None and day > until_date) or len(dates) >= limit:
+                    return dates
+                dates.append(day)
+            week_start += timedelta(weeks=repeat_interval)
+        return dates
+    
+    month_index = start_date.year * 12 + start_date.month - 1
+    while len(dates) < limit:
+        year, month = divmod(month_index, 12)
+        month_index += repeat_interval
+        try:
+            day = date(year, month + 1, start_date.day)
+        except ValueError:
+            continue
+        if until_date is not None and day > until_date:
+            break
+        dates.append(day)
+    return dates
+
+
+def _series_conflicts(db: PostgreSQLDriver, table_id: int, dates: List[date],
+                      booking_time: time, duration: int,
+                      exclude_series_id: Optional[int] = None,
+                      exclude_from: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    Активные бронирования стола, пересекающиеся с любым из вхождений серии
+    
+    Все даты проверяются одним запросом: массив дат разворачивается через
+    unnest и соединяется с bookings по индексу (table_id, booking_date).
+    Вхождения серии exclude_series_id начиная с exclude_from не учитываются
+    (они будут изменены вместе с серией).
+    
+    Returns:
+        Пересекающиеся бронирования с датой вхождения occurrence_date
+    """
+    if not dates:
+        return []
+    active = ', '.join(f"'{status}'" for status in Booking.ACTIVE_STATUSES)
+    query = f"""
+    SELECT o.day AS occurrence_date, b.id, b.booking_date, b.booking_time,
+           b.duration, b.status, b.series_id
+    FROM unnest(%(days)s::date[]) AS o(day)
+    JOIN {Booking.TABLE_NAME} b
+      ON b.table_id = %(table_id)s
+     AND b.booking_date BETWEEN o.day - 1 AND o.day + 1
+     AND b.status IN ({active})
+     AND NOT COALESCE(b.series_id = %(exclude)s AND b.booking_date >= %(exclude_from)s, FALSE)
+     AND b.booking_date + b.booking_time < o.day + %(time)s::time + make_interval(mins => %(duration)s)
+     AND {_BOOKING_END_SQL} > o.day + %(time)s::time
+    ORDER BY o.day, b.booking_date, b.booking_time
+    """
+    return db.execute_query(query, {
+        'days': dates,
+        'table_id': table_id,
+        'exclude': exclude_series_id,
+        'exclude_from': exclude_from or date.min,
+        'time': booking_time,
+        'duration': duration,
+    })
+
+
+def create_booking_series(user_id: int, table_id: int, start_date: date,
+                          booking_time: time, guests_count: int,
+                          frequency: str = 'weekly', repeat_interval: int = 1,
+                          weekdays: Union[None, str, Iterable[str]] = None,
+                          until_date: Optional[date] = None,
+                          occurrences: Optional[int] = None,
+                          duration: int = 120, status: str = 'pending',
+                          contact_phone: Optional[str] = None,
+                          contact_name: Optional[str] = None,
+                          special_requests: Optional[str] = None,
+                          skip_conflicts: bool = False) -> Dict[str, Any]:
+    """
+    Создание серии повторяющихся бронирований стола
+    
+    Вхождения разворачиваются по правилу в памяти, проверяются на пересечения
+    одним запросом и вставляются одним пакетом - в одной транзакции под
+    advisory-блокировкой стола, как в reserve_table.
+    
+    Args:
+        frequency: 'weekly' или 'monthly'
+        repeat_interval: Каждую repeat_interval-ю неделю/месяц
+        weekdays: Дни недели для 'weekly' ('TU,TH' или ['TU', 'TH'])
+        until_date: Последняя дата серии (включительно)
+        occurrences: Количество вхождений
+        skip_conflicts: Пропустить занятые даты вместо отказа от всей серии
+    
+    Returns:
+        Dict[str, Any]: {'status': 'reserved' | 'conflict' | 'unavailable' | 'error',
+                         'series_id': ID серии или None,
+                         'booking_ids': ID созданных бронирований,
+                         'conflicts': пересекающиеся бронирования,
+                         'skipped': пропущенные даты (при skip_conflicts),
+                         'error': текст ошибки или причина (для 'error', 'unavailable')}
+    """
+    result = {'status': RESERVE_ERROR, 'series_id': None, 'booking_ids': [],
+              'conflicts': [], 'skipped': [], 'error': None}
+    
+    try:
+        weekdays = _normalize_weekdays(weekdays)
+        dates = _expand_series(frequency, start_date, repeat_interval, weekdays,
+                               until_date, occurrences)
+        if not dates:
+            raise ValueError("Правило не дает ни одного вхождения")
+        
+        with PostgreSQLDriver() as db:
+            with db.transaction():
+                occupies = status in Booking.ACTIVE_STATUSES
+                if occupies:
+                    db.execute_query("SELECT pg_advisory_xact_lock(%s, %s)",
+                                     (RESERVE_LOCK_CLASS, table_id))
+                reason = _unavailable_reason(db, user_id, table_id)
+                if reason:
+                    result['status'] = RESERVE_UNAVAILABLE
+                    result['error'] = reason
+                    return result
+                if occupies:
+                    conflicts = _series_conflicts(db, table_id, dates, booking_time, duration)
+                    if conflicts and not skip_conflicts:
+                        result['status'] = RESERVE_CONFLICT
+                        result['conflicts'] = conflicts
+                        return result
+                    if conflicts:
+                        busy = {conflict['occurrence_date'] for conflict in conflicts}
+                        result['conflicts'] = conflicts
+                        result['skipped'] = sorted(busy)
+                        dates = [day for day in dates if day not in busy]
+                
+                series_id = db.insert(BookingSeries.TABLE_NAME, {
+                    'user_id': user_id,
+                    'table_id': table_id,
+                    'frequency': frequency,
+                    'repeat_interval': repeat_interval,
+                    'weekdays': weekdays,
+                    'start_date': start_date,
+                    'until_date': until_date,
+                    'occurrences': occurrences,
+                    'booking_time': booking_time,
+                    'duration': duration,
+                    'guests_count': guests_count,
+                    'contact_phone': contact_phone,
+                    'contact_name': contact_name,
+                    'special_requests': special_requests
+                }, return_id=True)
+                
+                new_bookings = [{
+                    'user_id': user_id,
+                    'table_id': table_id,
+                    'booking_date': day,
+                    'booking_time': booking_time,
+                    'guests_count': guests_count,
+                    'status': status,
+                    'contact_phone': contact_phone,
+                    'contact_name': contact_name,
+                    'special_requests': special_requests,
+                    'duration': duration,
+                    'series_id': series_id
+                } for day in dates]
+                result['booking_ids'] = db.insert_many(Booking.TABLE_NAME, new_bookings,
+                                                       return_ids=True)
+                result['series_id'] = series_id
+                result['status'] = RESERVE_OK
+        audit.record_changes(('create', booking_id, None, booking)
+                             for booking_id, booking in zip(result['booking_ids'], new_bookings))
+        return result
+    except Exception as e:
+        print(f"Ошибка создания серии бронирований: {e}")
+        result['error'] = str(e)
+        return result
+
+
+def get_booking_series(series_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Получение серии с ее вхождениями (включая архивные)
+    
+    Returns:
+        Словарь серии с ключом 'bookings' или None
+    """
+    try:
+        with PostgreSQLDriver() as db:
+            series = db.select_by_id(BookingSeries.TABLE_NAME, series_id)
+            if series is None:
+                return None
+            series['bookings'] = _select_with_archive(db, {'series_id': series_id},
+                                                      'booking_date, booking_time')
+            return series
+    except Exception as e:
+        print(f"Ошибка получения серии: {e}")
+        return None
+
+
+def update_booking_series(series_id: int, from_date: Optional[date] = None,
+                          **kwargs) -> Dict[str, Any]:
+    """
+    Изменение всех активных вхождений серии начиная с from_date
+    
+    Одним оператором UPDATE по series_id. При смене стола, времени или
+    длительности новые интервалы предварительно проверяются на пересечения
+    одним запросом под advisory-блокировкой стола.
+    
+    Args:
+        series_id: ID серии
+        from_date: Менять вхождения с этой даты (по умолчанию - с сегодняшней)
+        **kwargs: Поля из SERIES_EDITABLE_FIELDS
+    
+    Returns:
+        Dict[str, Any]: {'status': 'reserved' | 'conflict' | 'unavailable' | 'error',
+                         'updated': количество измененных бронирований,
+                         'conflicts': пересекающиеся бронирования,
+                         'error': текст ошибки или причина (для 'error', 'unavailable')}
+    """
+    result = {'status': RESERVE_ERROR, 'updated': 0, 'conflicts': [], 'error': None}
+    from_date = from_date or date.today()
+    
+    try:
+        unknown = set(kwargs) - set(SERIES_EDITABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Эти поля серии изменить нельзя: {', '.join(sorted(unknown))}")
+        if not kwargs:
+            raise ValueError("Нет полей для изменения")
+        
+        active = ', '.join(f"'{status}'" for status in Booking.ACTIVE_STATUSES)
+        with PostgreSQLDriver() as db:
+            with db.transaction():
+                rows = db.execute_query(
+                    f"SELECT * FROM {BookingSeries.TABLE_NAME} WHERE id = %s FOR UPDATE",
+                    (series_id,)
+                )
+                if not rows:
+                    raise ValueError(f"Серия {series_id} не найдена")
+                series = rows[0]
+                
+                moves = {'table_id', 'booking_time', 'duration'} & set(kwargs)
+                if moves and kwargs.get('status', 'pending') in Booking.ACTIVE_STATUSES:
+                    table_id = kwargs.get('table_id', series['table_id'])
+                    dates = [row['booking_date'] for row in db.execute_query(f"""
+                    SELECT booking_date FROM {Booking.TABLE_NAME}
+                    WHERE series_id = %s AND booking_date >= %s AND status IN ({active})
+                    """, (series_id, from_date))]
+                    db.execute_query("SELECT pg_advisory_xact_lock(%s, %s)",
+                                     (RESERVE_LOCK_CLASS, table_id))
+                    reason = _unavailable_reason(db, series['user_id'], table_id)
+                    if reason:
+                        result['status'] = RESERVE_UNAVAILABLE
+                        result['error'] = reason
+                        return result
+                    conflicts = _series_conflicts(
+                        db, table_id, dates,
+                        kwargs.get('booking_time', series['booking_time']),
+                        kwargs.get('duration', series['duration'] or 120),
+                        exclude_series_id=series_id, exclude_from=from_date
+                    )
+                    if conflicts:
+                        result['status'] = RESERVE_CONFLICT
+                        result['conflicts'] = conflicts
+                        return result
+                
+                result['updated'], changes = _update_bookings(db, kwargs, f"""
+                series_id = %(series_id)s
+                AND booking_date >= %(from_date)s
+                AND status IN ({active})
+                """, {'series_id': series_id, 'from_date': from_date})
+                
+                series_changes = {field: value for field, value in kwargs.items()
+                                  if field in BookingSeries.COLUMNS}
+                if series_changes:
+                    series_changes['updated_at'] = datetime.now()
+                    db.update_by_id(BookingSeries.TABLE_NAME, series_id, series_changes)
+                result['status'] = RESERVE_OK
+        audit.record_changes(changes)
+        return result
+    except Exception as e:
+        print(f"Ошибка изменения серии бронирований: {e}")
+        result['error'] = str(e)
+        return result
+
+
+def cancel_booking_series(series_id: int, from_date: Optional[date] = None) -> int:
+    """
+    Отмена серии: все активные вхождения с from_date отменяются одним UPDATE
+    
+    Если from_date не позже начала серии, серия помечается неактивной,
+    иначе ее until_date сдвигается на день раньше from_date.
+    
+    Args:
+        series_id: ID серии
+        from_date: Отменить вхождения с этой даты (по умолчанию - с сегодняшней)
+    
+    Returns:
+        Количество отмененных бронирований, -1 при ошибке
+    """
+    from_date = from_date or date.today()
+    active = ', '.join(f"'{status}'" for status in Booking.ACTIVE_STATUSES)
+    try:
+        with PostgreSQLDriver() as db:
+            with db.transaction():
+                cancelled, changes = _update_bookings(db, {'status': 'cancelled'}, f"""
+                series_id = %(series_id)s AND booking_date >= %(from_date)s
+                AND status IN ({active})
+                """, {'series_id': series_id, 'from_date': from_date})
+                db.execute_command(f"""
+                UPDATE {BookingSeries.TABLE_NAME}
+                SET is_active = is_active AND start_date < %(from_date)s,
+                    until_date = CASE WHEN start_date < %(from_date)s
+                                      THEN LEAST(until_date, %(until)s::date)
+                                      ELSE until_date END,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = %(series_id)s
+                """, {'from_date': from_date, 'until': from_date - timedelta(days=1),
+                      'series_id': series_id})
+        audit.record_changes(changes)
+        return cancelled
+    except Exception as e:
+        print(f"Ошибка отмены серии бронирований: {e}")
+        return -1
+
+
+# ==================== ДОСТУПНОСТЬ ЗА ПЕРИОД ====================
+
+def _availability_day_grid(payload: Tuple[int, int, int, int, int, bytes]) -> Tuple[int, bytes]:
+    """
+    Сетка доступности одного дня (выполняется в процессе пула)
+    
+    Args:
+        payload: (номер дня, число столов, число слотов, шаг в минутах,
+                  слотов на одну бронь, интервалы занятости array('i') в байтах:
+                  тройки (индекс стола, начало, конец) в минутах от открытия)
+    
+    Returns:
+        (номер дня, байты: по slot_count на стол подряд, 1 - с этого слота
+         стол свободен на всю длительность брони)
+    """
+    day_index, table_count, slot_count, step, span, packed = payload
+    intervals = array('i')
+    intervals.frombytes(packed)
+    
+    busy = bytearray(table_count * slot_count)
+    for k in range(0, len(intervals), 3):
+        offset = intervals[k] * slot_count
+        first = max(0, intervals[k + 1] // step)
+        last = min(slot_count, -(-intervals[k + 2] // step))
+        if first < last:
+            busy[offset + first:offset + last] = b'\x01' * (last - first)
+    
+    # Слот подходит, если за ним не меньше span свободных слотов подряд
+    grid = bytearray(table_count * slot_count)
+    for table in range(table_count):
+        offset = table * slot_count
+        run = 0
+        for slot in range(slot_count - 1, -1, -1):
+            run = 0 if busy[offset + slot] else run + 1
+            if run >= span:
+                grid[offset + slot] = 1
+    return day_index, bytes(grid)
+
+
+def get_availability_range(start_date: date, end_date: date, duration: int = 120,
+                           step_minutes: int = 15, min_capacity: Optional[int] = None,
+                           table_ids: Optional[Iterable[int]] = None,
+                           workers: Optional[int] = None,
+                           open_time: Optional[time] = None,
+                           close_time: Optional[time] = None) -> Dict[str, Any]:
+    """
+    Доступность столов на каждый день периода с шагом step_minutes
+    
+    Бронирования периода читаются одним потоковым запросом (серверный курсор)
+    и раскладываются по дням в компактные массивы интервалов. Сетки дней
+    считаются параллельно в ProcessPoolExecutor и собираются в общий результат.
+    
+    Args:
+        start_date: Первый день
+        end_date: Последний день (включительно)
+        duration: Длительность брони, для которой считается доступность
+        step_minutes: Шаг сетки
+        min_capacity: Только столы не меньше этой вместимости
+        table_ids: Только эти столы (по умолчанию - все активные)
+        workers: Количество процессов (по умолчанию - число ядер, 1 - без пула)
+        open_time: Начало работы (по умолчанию OPENING_TIME)
+        close_time: Окончание работы (по умолчанию CLOSING_TIME)
+    
+    Returns:
+        Dict[str, Any]: {'slots': время начала слотов,
+                         'tables': столы (id, number, capacity, location) в порядке сетки,
+                         'days': [{'date': дата,
+                                   'available': {table_id: bytes, 1 - можно начать бронь},
+                                   'free_tables': число свободных столов по слотам}]}
+        При ошибке - пустые списки
+    """
+    open_time = open_time or OPENING_TIME
+    close_time = close_time or CLOSING_TIME
+    open_minutes = open_time.hour * 60 + open_time.minute
+    work_minutes = close_time.hour * 60 + close_time.minute - open_minutes
+    slot_count = max(0, work_minutes // step_minutes)
+    span = -(-duration // step_minutes)
+    day_count = (end_date - start_date).days + 1
+    empty = {'slots': [], 'tables': [], 'days': []}
+    if day_count <= 0 or slot_count == 0:
+        return empty
+    
+    active = ', '.join(f"'{status}'" for status in Booking.ACTIVE_STATUSES)
+    conditions = ['is_active', 'deleted_at IS NULL']
+    params: Dict[str, Any] = {}
+    if min_capacity is not None:
+        conditions.append('capacity >= %(min_capacity)s')
+        params['min_capacity'] = min_capacity
+    if table_ids is not None:
+        conditions.append('id = ANY(%(table_ids)s)')
+        params['table_ids'] = list(table_ids)
+    
+    shards = [array('i') for _ in range(day_count)]
+    try:
+        with PostgreSQLDriver() as db:
+            tables = db.execute_query(f"""
+            SELECT id, number, capacity, location
+            FROM {Table.TABLE_NAME}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY number
+            """, params)
+            index = {table['id']: position for position, table in enumerate(tables)}
+            
+            rows = db.iter_query(f"""
+            SELECT table_id, booking_date - %(start_date)s AS day_offset,
+                   EXTRACT(EPOCH FROM booking_time)::int / 60 AS start_minute,
+                   COALESCE(duration, 120) AS duration
+            FROM {Booking.TABLE_NAME}
+            WHERE booking_date BETWEEN %(date_from)s AND %(end_date)s
+              AND table_id = ANY(%(table_ids)s)
+              AND status IN ({active})
+            """, {'start_date': start_date, 'date_from': start_date - timedelta(days=1),
+                  'end_date': end_date, 'table_ids': list(index)})
+            
+            # Бронь попадает в каждый день, который она захватывает
+            for table_id, day_offset, start_minute, booked_minutes in rows:
+                start = day_offset * 1440 + start_minute
+                end = start + booked_minutes
+                for day in range(max(0, start // 1440), min(day_count, (end - 1) // 1440 + 1)):
+                    day_start = day * 1440 + open_minutes
+                    if end > day_start and start < day_start + work_minutes:
+                        shards[day].extend((index[table_id], start - day_start, end - day_start))
+    except Exception as e:
+        print(f"Ошибка получения доступности за период: {e}")
+        return empty
+    
+    payloads = [(day, len(tables), slot_count, step_minutes, span, shard.tobytes())
+                for day, shard in enumerate(shards)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and day_count > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, day_count)) as pool:
+            grids = dict(pool.map(_availability_day_grid, payloads,
+                                  chunksize=max(1, day_count // (workers * 4))))
+    else:
+        grids = dict(map(_availability_day_grid, payloads))
+    
+    day_origin = datetime.combine(start_date, open_time)
+    days = []
+    for day in range(day_count):
+        grid = grids[day]
+        available = {table['id']: grid[position * slot_count:(position + 1) * slot_count]
+                     for position, table in enumerate(tables)}
+        days.append({
+            'date': start_date + timedelta(days=day),
+            'available': available,
+            'free_tables': [sum(grid[slot::slot_count]) for slot in range(slot_count)]
+        })
+    return {
+        'slots': [(day_origin + timedelta(minutes=slot * step_minutes)).time()
+                  for slot in range(slot_count)],
+        'tables': tables,
+        'days': days
+    }
+
+
+# ==================== УДАЛЕНИЕ ПОЛЬЗОВАТЕЛЕЙ И СТОЛОВ ====================
+
+# Колонка бронирований, ссылающаяся на удаляемую запись
+_BOOKING_PARENT_COLUMNS = {User.TABLE_NAME: 'user_id', Table.TABLE_NAME: 'table_id'}
+
+
+def _print_purge_progress(deleted: int, total: int):
+    """Вывод хода удаления бронирований"""
+    print(f"Удаление бронирований: {deleted} из {total}")
+
+
+def _invalidate_parent(model, record_id: int):
+    """Сброс кэша удаленной или восстановленной записи"""
+    if model is User:
+        _user_cache.invalidate(record_id)
+    else:
+        _invalidate_table(record_id)
+
+
+def _soft_delete(db: PostgreSQLDriver, model, record_id: int) -> bool:
+    """
+    Мягкое удаление: запись скрывается выставлением deleted_at
+    
+    is_active не меняется, поэтому восстановление возвращает прежнее
+    состояние (например, стол на ремонте остается неактивным).
+    
+    Returns:
+        False - записи нет или она уже удалена
+    """
+    return db.execute_command(f"""
+    UPDATE {model.TABLE_NAME}
+    SET deleted_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+    WHERE id = %s AND deleted_at IS NULL
+    """, (record_id,)) > 0
+
+
+def _purge_record(db: PostgreSQLDriver, model, record_id: int, batch_size: int = 5000,
+                  progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Окончательное удаление пользователя или стола вместе с бронированиями
+    
+    Бронирования (и архивные) удаляются пакетами по batch_size, каждый пакет -
+    отдельная короткая транзакция с FOR UPDATE SKIP LOCKED, поэтому удаление
+    не блокирует работу с остальными бронированиями. Когда свободных строк
+    не осталось, а заблокированные другими транзакциями есть, следующий пакет
+    ждет их блокировки (до lock_timeout). Прерванное удаление можно просто
+    повторить. Затем удаляются серии и сама запись.
+    
+    У архива нет триггеров сводки, поэтому вклад удаленных архивных строк
+    вычитается из booking_daily_summary в том же операторе. Удаленные
+    бронирования (и архивные) пишутся в журнал изменений после каждого пакета.
+    
+    Returns:
+        Количество удаленных бронирований
+    """
+    column = _BOOKING_PARENT_COLUMNS[model.TABLE_NAME]
+    sources = [Booking.TABLE_NAME]
+    if db.table_exists(Booking.ARCHIVE_TABLE_NAME):
+        sources.append(Booking.ARCHIVE_TABLE_NAME)
+    summary_upsert = _summary_upsert_sql(
+        _summary_delta_sql('deleted', sign='-')
+    ).rstrip().rstrip(';')
+    
+    total = sum(db.count(source, {column: record_id}) for source in sources)
+    deleted = 0
+    with repeated_queries.allow_repeats():
+        for source in sources:
+            skip_locked = True
+            while True:
+                batch = f"""
+                DELETE FROM {source}
+                WHERE id IN (
+                    SELECT id FROM {source}
+                    WHERE {column} = %s
+                    LIMIT %s
+                    FOR UPDATE{' SKIP LOCKED' if skip_locked else ''}
+                )"""
+                with db.transaction():
+                    db.execute_command("SET LOCAL lock_timeout = '5s'")
+                    if source == Booking.ARCHIVE_TABLE_NAME:
+                        rows = db.execute_query(f"""
+                        WITH deleted AS (
+                            {batch}
+                            RETURNING *
+                        ), summary AS (
+                            {summary_upsert}
+                        )
+                        SELECT * FROM deleted
+                        """, (record_id, batch_size))
+                    else:
+                        rows = db.execute_query(f"{batch} RETURNING *", (record_id, batch_size))
+                removed = len(rows)
+                audit.record_changes([('delete', row['id'], dict(row), None) for row in rows])
+                if removed == 0:
+                    # Оставшиеся строки заняты другими транзакциями - ждем их
+                    if skip_locked and db.exists(source, {column: record_id}):
+                        skip_locked = False
+                        continue
+                    break
+                skip_locked = True
+                deleted += removed
+                if progress is not None:
+                    progress(deleted, total)
+    
+    with db.transaction():
+        db.execute_command("SET LOCAL lock_timeout = '5s'")
+        db.execute_command(f"DELETE FROM {BookingSeries.TABLE_NAME} WHERE {column} = %s",
+                           (record_id,))
+        db.delete_by_id(model.TABLE_NAME, record_id)
+    return deleted
+
+
+def _delete_record(model, record_id: int, soft: bool, batch_size: int,
+                   progress: Optional[Callable[[int, int], None]]) -> bool:
+    """Мягкое удаление и, если не soft, окончательное удаление записи пакетами"""
+    try:
+        with PostgreSQLDriver() as db:
+            with db.transaction():
+                hidden = _soft_delete(db, model, record_id)
+            _invalidate_parent(model, record_id)
+            if soft:
+                return hidden
+            if not db.exists(model.TABLE_NAME, {'id': record_id}):
+                return False
+            _purge_record(db, model, record_id, batch_size,
+                          progress if progress is not None else _print_purge_progress)
+        _invalidate_parent(model, record_id)
+        return True
+    except Exception as e:
+        what = "пользователя" if model is User else "стола"
+        print(f"Ошибка удаления {what}: {e}")
+        return False
+
+
+def _restore_record(model, record_id: int) -> bool:
+    """Отмена мягкого удаления (is_active остается прежним)"""
+    try:
+        with PostgreSQLDriver() as db:
+            restored = db.execute_command(f"""
+            UPDATE {model.TABLE_NAME}
+            SET deleted_at = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND deleted_at IS NOT NULL
+            """, (record_id,)) > 0
+        _invalidate_parent(model, record_id)
+        return restored
+    except Exception as e:
+        print(f"Ошибка восстановления записи: {e}")
+        return False
+
+
+def restore_user(user_id: int) -> bool:
+    """Восстановление мягко удаленного пользователя"""
+    return _restore_record(User, user_id)
+
+
+def restore_table(table_id: int) -> bool:
+    """Восстановление мягко удаленного стола"""
+    return _restore_record(Table, table_id)
+
+
+def purge_deleted(older_than_hours: int = 0, batch_size: int = 5000,
+                  dry_run: bool = False) -> int:
+    """
+    Окончательное удаление мягко удаленных пользователей и столов
+    
+    Args:
+        older_than_hours: Удалять записи, мягко удаленные не меньше стольких часов назад
+        batch_size: Размер пакета удаления бронирований
+        dry_run: Только посчитать записи, подлежащие удалению
+    
+    Returns:
+        Количество удаленных (при dry_run - подлежащих удалению) записей, -1 при ошибке
+    """
+    cutoff = datetime.now() - timedelta(hours=older_than_hours)
+    purged = 0
+    try:
+        with PostgreSQLDriver() as db:
+            for model in (User, Table):
+                ids = [row[0] for row in db.execute_query(
+                    f"SELECT id FROM {model.TABLE_NAME} WHERE deleted_at <= %s ORDER BY id",
+                    (cutoff,), as_tuples=True
+                )]
+                if dry_run:
+                    purged += len(ids)
+                    continue
+                with repeated_queries.allow_repeats():
+                    for record_id in ids:
+                        bookings = _purge_record(db, model, record_id, batch_size)
+                        _invalidate_parent(model, record_id)
+                        purged += 1
+                        print(f"Удален {model.TABLE_NAME} id={record_id}, бронирований: {bookings}")
+        return purged
+    except Exception as e:
+        print(f"Ошибка удаления помеченных записей (удалено {purged}): {e}")
+        return -1
+
+
+# ==================== СЕКЦИОНИРОВАНИЕ БРОНИРОВАНИЙ ====================
+
+# Секция для строк вне созданных месячных диапазонов
+BOOKINGS_DEFAULT_PARTITION = f"{Booking.TABLE_NAME}_default"
+
+
+def _month_start(value: date, offset: int = 0) -> date:
+    """Первое число месяца value, сдвинутого на offset месяцев"""
+    month_index = value.year * 12 + value.month - 1 + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _booking_partition_name(month: date) -> str:
+    """Имя месячной секции, например bookings_y2025m01"""
+    return f"{Booking.TABLE_NAME}_y{month.year}m{month.month:02d}"
+
+
+def maintain_booking_partitions(months_ahead: int = 3, dry_run: bool = False) -> int:
+    """
+    Обслуживание месячных секций таблицы bookings
+    
+    Создает секции с текущего месяца на months_ahead месяцев вперед, а также
+    для месяцев, строки которых попали в секцию по умолчанию (например,
+    при загрузке истории). Такие строки переносятся в новую секцию: секция
+    по умолчанию на время переноса отсоединяется, поэтому операция короткая
+    только при небольшом числе строк в ней.
+    
+    Args:
+        months_ahead: Сколько будущих месяцев подготовить заранее
+        dry_run: Только посчитать недостающие секции
+    
+    Returns:
+        Количество созданных (при dry_run - недостающих) секций, -1 при ошибке
+    """
+    try:
+        with PostgreSQLDriver() as db:
+            if not db.is_partitioned(Booking.TABLE_NAME):
+                return 0
+            
+            existing = {p['partition_name'] for p in db.get_partitions(Booking.TABLE_NAME)}
+            this_month = _month_start(date.today())
+            months = {_month_start(this_month, i) for i in range(months_ahead + 1)}
+            
+            has_default = BOOKINGS_DEFAULT_PARTITION in existing
+            if has_default:
+                rows = db.execute_query(
+                    f"SELECT DISTINCT date_trunc('month', booking_date)::date AS month "
+                    f"FROM {BOOKINGS_DEFAULT_PARTITION}"
+                )
+                months.update(row['month'] for row in rows)
+            
+            missing = [m for m in sorted(months) if _booking_partition_name(m) not in existing]
+            if dry_run:
+                return len(missing)
+            
+            created = 0
+            for month in missing:
+                partition_name = _booking_partition_name(month)
+                next_month = _month_start(month, 1)
+                with db.transaction():
+                    moved = has_default and db.execute_query(
+                        f"SELECT EXISTS (SELECT 1 FROM {BOOKINGS_DEFAULT_PARTITION} "
+                        f"WHERE booking_date >= %s AND booking_date < %s)",
+                        (month, next_month)
+                    )[0]['exists']
+                    
+                    if moved:
+                        db.execute_command(
+                            f"ALTER TABLE {Booking.TABLE_NAME} "
+                            f"DETACH PARTITION {BOOKINGS_DEFAULT_PARTITION}"
+                        )
+                    db.create_partition(Booking.TABLE_NAME, partition_name, month, next_month)
+                    if moved:
+                        # Перенос напрямую между секциями: триггеры сводки
+                        # на bookings не срабатывают, итоги не меняются
+                        db.execute_command(
+                            f"INSERT INTO {partition_name} SELECT * FROM {BOOKINGS_DEFAULT_PARTITION} "
+                            f"WHERE booking_date >= %s AND booking_date < %s",
+                            (month, next_month)
+                        )
+                        db.execute_command(
+                            f"DELETE FROM {BOOKINGS_DEFAULT_PARTITION} "
+                            f"WHERE booking_date >= %s AND booking_date < %s",
+                            (month, next_month)
+                        )
+                        db.execute_command(
+                            f"ALTER TABLE {Booking.TABLE_NAME} "
+                            f"ATTACH PARTITION {BOOKINGS_DEFAULT_PARTITION} DEFAULT"
+                        )
+                created += 1
+            
+            return created
+    except Exception as e:
+        print(f"Ошибка обслуживания секций bookings: {e}")
+        return -1
+
+
+# ==================== АРХИВ БРОНИРОВАНИЙ ====================
+
+# Последняя дата в архиве; меняется только заданием архивации
+_archive_watermark_cache = TTLCache(maxsize=1, ttl=60)
+
+
+def _archive_watermark(db: PostgreSQLDriver) -> Optional[date]:
+    """Последняя дата бронирования в архиве (None - архива нет или он пуст)"""
+    cached = _archive_watermark_cache.get('watermark')
+    if cached is not None:
+        return cached[0]
+    
+    watermark = None
+    if db.table_exists(Booking.ARCHIVE_TABLE_NAME):
+        watermark = db.execute_query(
+            f"SELECT MAX(booking_date) AS watermark FROM {Booking.ARCHIVE_TABLE_NAME}"
+        )[0]['watermark']
+    _archive_watermark_cache.set('watermark', (watermark,))
+    return watermark
+
+
+def _archive_covers(db: PostgreSQLDriver, date_from: date) -> bool:
+    """Нужно ли читать архив для периода, начинающегося с date_from"""
+    watermark = _archive_watermark(db)
+    return watermark is not None and date_from <= watermark
+
+
+def _bookings_source(db: PostgreSQLDriver, date_from: Optional[date]) -> str:
+    """
+    Источник бронирований для запроса с периодом, начинающимся с date_from
+    
+    Возвращает bookings или, если период захватывает архив, подзапрос
+    UNION ALL из bookings и bookings_archive. Условия внешнего запроса
+    PostgreSQL проталкивает в обе ветви, индексы и отсечение секций работают.
+    None в date_from означает весь период.
+    """
+    watermark = _archive_watermark(db)
+    if watermark is None or (date_from is not None and date_from > watermark):
+        return Booking.TABLE_NAME
+    
+    columns = ', '.join(Booking.FIELDS)
+    return (f"(SELECT {columns} FROM {Booking.TABLE_NAME} "
+            f"UNION ALL SELECT {columns} FROM {Booking.ARCHIVE_TABLE_NAME})")
+
+
+def _select_with_archive(db: PostgreSQLDriver, where: Dict[str, Any], order_by: str,
+                         as_model: bool = False) -> List[Union[Dict[str, Any], Booking]]:
+    """Выборка бронирований из bookings и bookings_archive (UNION ALL)"""
+    columns = ', '.join(Booking.FIELDS)
+    conditions = ' AND '.join(f"{col} = %s" for col in where) or 'TRUE'
+    params = tuple(where.values()) * 2
+    
+    query = f"""
+    SELECT {columns} FROM {Booking.TABLE_NAME} WHERE {conditions}
+    UNION ALL
+    SELECT {columns} FROM {Booking.ARCHIVE_TABLE_NAME} WHERE {conditions}
+    ORDER BY {order_by}
+    """
+    
+    if as_model:
+        return Booking.from_rows(db.execute_query(query, params, as_tuples=True))
+    return db.execute_query(query, params)
+
+
+def archive_bookings(older_than_days: int = 90, batch_size: int = 5000,
+                     max_batches: Optional[int] = None, dry_run: bool = False) -> int:
+    """
+    Перенос старых завершенных и отмененных бронирований в bookings_archive
+    
+    Работает пакетами: каждый пакет - отдельная короткая транзакция
+    (DELETE ... RETURNING + INSERT в одном операторе), строки выбираются
+    с FOR UPDATE SKIP LOCKED и не блокируют работу с остальными. Прерванный
+    перенос можно просто запустить снова - перенесенные пакеты уже зафиксированы.
+    Дневная сводка при переносе не меняется.
+    
+    Args:
+        older_than_days: Архивировать бронирования старше стольких дней
+        batch_size: Размер пакета
+        max_batches: Ограничение числа пакетов за запуск (None - до конца)
+        dry_run: Только посчитать бронирования, подлежащие переносу
+    
+    Returns:
+        Количество перенесенных (при dry_run - подлежащих переносу) бронирований,
+        -1 при ошибке
+    """
+    cutoff = date.today() - timedelta(days=older_than_days)
+    columns = ', '.join(Booking.FIELDS)
+    query = f"""
+    WITH moved AS (
+        DELETE FROM {Booking.TABLE_NAME}
+        WHERE booking_date < %(cutoff)s
+          AND id IN (
+              SELECT id FROM {Booking.TABLE_NAME}
+              WHERE booking_date < %(cutoff)s AND status = ANY(%(statuses)s)
+              ORDER BY booking_date
+              LIMIT %(batch_size)s
+              FOR UPDATE SKIP LOCKED
+          )
+        RETURNING {columns}
+    )
+    INSERT INTO {Booking.ARCHIVE_TABLE_NAME} ({columns})
+    SELECT {columns} FROM moved
+    """
+    params = {'cutoff': cutoff, 'statuses': Booking.TERMINAL_STATUSES, 'batch_size': batch_size}
+    
+    total = 0
+    batches = 0
+    try:
+        with PostgreSQLDriver() as db:
+            if dry_run:
+                return db.execute_query(
+                    f"SELECT COUNT(*) AS total FROM {Booking.TABLE_NAME} "
+                    f"WHERE booking_date < %(cutoff)s AND status = ANY(%(statuses)s)",
+                    params
+                )[0]['total']
+            
+            with repeated_queries.allow_repeats():
+                while max_batches is None or batches < max_batches:
+                    with db.transaction():
+                        db.execute_command("SET LOCAL lock_timeout = '5s'")
+                        db.execute_command("SET LOCAL booking.skip_summary = 'on'")
+                        moved = db.execute_command(query, params)
+                    
+                    batches += 1
+                    total += moved
+                    print(f"Архивация: пакет {batches}, перенесено {moved} (всего {total})")
+                    if moved < batch_size:
+                        break
+        return total
+    except Exception as e:
+        print(f"Ошибка архивации бронирований (перенесено {total}): {e}")
+        return -1
+    finally:
+        _archive_watermark_cache.clear()
+
+
+# ==================== АВТОМАТИЧЕСКАЯ СМЕНА СТАТУСОВ ====================
+
+# Конец бронирования как выражение SQL
+_BOOKING_END_SQL = "booking_date + booking_time + make_interval(mins => COALESCE(duration, 120))"
+
+
+def _transition_bookings(condition: str, params: Dict[str, Any], new_status: str,
+                         dry_run: bool = False) -> int:
+    """
+    Смена статуса всех бронирований, удовлетворяющих условию, одним оператором
+    
+    Returns:
+        Количество измененных (при dry_run - подходящих) бронирований, -1 при ошибке
+    """
+    try:
+        with PostgreSQLDriver() as db:
+            if dry_run:
+                return db.execute_query(
+                    f"SELECT COUNT(*) AS total FROM {Booking.TABLE_NAME} WHERE {condition}",
+                    params
+                )[0]['total']
+            
+            changed, changes = _update_bookings(db, {'status': new_status}, condition, params)
+        audit.record_changes(changes)
+        return changed
+    except Exception as e:
+        print(f"Ошибка смены статуса бронирований на '{new_status}': {e}")
+        return -1
+
+
+def complete_expired_bookings(dry_run: bool = False) -> int:
+    """
+    Перевод закончившихся активных бронирований в 'completed'
+    
+    Бронирование закончилось, если начало + длительность раньше текущего
+    момента. Условие по booking_date ограничивает просмотр прошедшими днями.
+    
+    Args:
+        dry_run: Только посчитать подходящие бронирования
+    
+    Returns:
+        Количество завершенных бронирований, -1 при ошибке
+    """
+    condition = f"""
+        status = ANY(%(statuses)s)
+        AND booking_date <= CURRENT_DATE
+        AND {_BOOKING_END_SQL} < LOCALTIMESTAMP
+    """
+    return _transition_bookings(condition, {'statuses': Booking.ACTIVE_STATUSES},
+                                'completed', dry_run)
+
+
+def cancel_stale_pending_bookings(max_age_hours: int = 24, dry_run: bool = False) -> int:
+    """
+    Отмена неподтвержденных бронирований, ожидающих подтверждения слишком долго
+    
+    Отменяются бронирования в статусе 'pending', созданные более max_age_hours
+    часов назад, которые еще не начались (прошедшие завершает complete_expired_bookings).
+    
+    Args:
+        max_age_hours: Сколько часов бронирование может оставаться неподтвержденным
+        dry_run: Только посчитать подходящие бронирования
+    
+    Returns:
+        Количество отмененных бронирований, -1 при ошибке
+    """
+    condition = """
+        status = 'pending'
+        AND booking_date >= CURRENT_DATE
+        AND booking_date + booking_time > LOCALTIMESTAMP
+        AND created_at < LOCALTIMESTAMP - make_interval(hours => %(max_age_hours)s)
+    """
+    return _transition_bookings(condition, {'max_age_hours': max_age_hours},
+                                'cancelled', dry_run)
+
+
+# ==================== ОТЧЕТЫ ПО ЗАГРУЗКЕ ====================
+
+# Часы работы ресторана, в пределах которых считаются слоты загрузки
+OPENING_TIME = time(10, 0)
+CLOSING_TIME = time(23, 0)
+
+# Статусы, учитываемые в отчетах (отмененные бронирования стол не занимают)
+REPORT_STATUSES = [s for s in Booking.VALID_STATUSES if s != 'cancelled']
+
+# Группировки отчета загрузки: {group_by: (колонки SELECT, число колонок ключа)}
+_UTILIZATION_GROUPS = {
+    'table': ("table_id, table_number, location", 3),
+    'location': ("COALESCE(location, '') AS location", 1),
+    'hour': ("EXTRACT(HOUR FROM slot_start)::int AS hour", 1),
+    'day': ("slot_start::date AS day", 1),
+    'weekday': ("EXTRACT(ISODOW FROM slot_start)::int AS weekday", 1)
+}
+
+
+def report_utilization(start_date: date, end_date: date, group_by: str = 'table',
+                       slot_minutes: int = 30,
+                       open_time: time = OPENING_TIME,
+                       close_time: time = CLOSING_TIME) -> List[Dict[str, Any]]:
+    """
+    Отчет о загрузке столов за период
+    
+    Вся агрегация выполняется в PostgreSQL: сетка слотов строится через
+    generate_series (дни x слоты в часы работы x активные столы), каждое
+    бронирование разворачивается в занятые им слоты и соединяется с сеткой
+    по равенству (table_id, slot_start). В Python возвращается только итог.
+    
+    Args:
+        start_date: Начало периода (включительно)
+        end_date: Конец периода (включительно)
+        group_by: Группировка: 'table', 'location', 'hour', 'day' или 'weekday'
+        slot_minutes: Размер слота в минутах
+        open_time: Время открытия (должно быть кратно slot_minutes)
+        close_time: Время закрытия
+    
+    Returns:
+        Список строк с ключом группировки и полями slots_total, slots_booked,
+        utilization_pct, seat_hours_available, seat_hours_booked, seat_utilization_pct
+    """
+    if group_by not in _UTILIZATION_GROUPS:
+        raise ValueError(f"Неизвестная группировка: {group_by}. "
+                         f"Допустимо: {', '.join(_UTILIZATION_GROUPS)}")
+    if (open_time.hour * 60 + open_time.minute) % slot_minutes:
+        raise ValueError("Время открытия должно быть кратно длине слота")
+    
+    key_columns, key_count = _UTILIZATION_GROUPS[group_by]
+    group_positions = ', '.join(str(i) for i in range(1, key_count + 1))
+    
+    query = """
+    WITH slots AS (
+        SELECT s AS slot_start
+        FROM generate_series(%(start)s::date, %(end)s::date, interval '1 day') AS d(day)
+        CROSS JOIN LATERAL generate_series(
+            d.day::date + %(open)s::time,
+            d.day::date + %(close)s::time - make_interval(mins => %(slot)s),
+            make_interval(mins => %(slot)s)
+        ) AS s
+    ),
+    occupied AS (
+        SELECT b.table_id, s.slot_start, SUM(b.guests_count) AS guests
+        FROM {bookings} b
+        CROSS JOIN LATERAL (
+            SELECT b.booking_date + b.booking_time AS starts_at,
+                   b.booking_date + b.booking_time
+                       + make_interval(mins => COALESCE(b.duration, 120)) AS ends_at
+        ) span
+        CROSS JOIN LATERAL generate_series(
+            date_trunc('day', span.starts_at)
+                + floor(extract(epoch FROM span.starts_at::time) / (%(slot)s * 60))
+                  * make_interval(mins => %(slot)s),
+            span.ends_at - interval '1 second',
+            make_interval(mins => %(slot)s)
+        ) AS s(slot_start)
+        WHERE b.booking_date BETWEEN %(start)s::date - 1 AND %(end)s::date
+          AND b.status = ANY(%(statuses)s)
+        GROUP BY b.table_id, s.slot_start
+    ),
+    grid AS (
+        SELECT t.id AS table_id, t.number AS table_number, t.location, t.capacity,
+               s.slot_start, COALESCE(o.guests, 0) AS guests
+        FROM {tables} t
+        CROSS JOIN slots s
+        LEFT JOIN occupied o ON o.table_id = t.id AND o.slot_start = s.slot_start
+        WHERE t.is_active AND t.deleted_at IS NULL
+    )
+    SELECT {key_columns},
+           COUNT(*) AS slots_total,
+           COUNT(*) FILTER (WHERE guests > 0) AS slots_booked,
+           ROUND(100.0 * COUNT(*) FILTER (WHERE guests > 0) / NULLIF(COUNT(*), 0), 2)
+               AS utilization_pct,
+           ROUND(SUM(capacity) * %(slot)s / 60.0, 2) AS seat_hours_available,
+           ROUND(SUM(LEAST(guests, capacity)) * %(slot)s / 60.0, 2) AS seat_hours_booked,
+           ROUND(100.0 * SUM(LEAST(guests, capacity)) / NULLIF(SUM(capacity), 0), 2)
+               AS seat_utilization_pct
+    FROM grid
+    GROUP BY {group_positions}
+    ORDER BY {group_positions}
+    """
+    params = {
+        'start': start_date,
+        'end': end_date,
+        'open': open_time,
+        'close': close_time,
+        'slot': slot_minutes,
+        'statuses': REPORT_STATUSES
+    }
+    
+    try:
+        with PostgreSQLDriver() as db:
+            query = query.format(
+                bookings=_bookings_source(db, start_date - timedelta(days=1)),
+                tables=Table.TABLE_NAME,
+                key_columns=key_columns,
+                group_positions=group_positions
+            )
+            return db.execute_query(query, params)
+    except Exception as e:
+        print(f"Ошибка построения отчета о загрузке: {e}")
+        return []
+
+
+def report_covers_per_day(start_date: date, end_date: date) -> List[Dict[str, Any]]:
+    """
+    Отчет по дням: количество бронирований, гостей (covers) и забронированных место-часов
+    
+    Args:
+        start_date: Начало периода (включительно)
+        end_date: Конец периода (включительно)
+    
+    Returns:
+        Одна строка на каждый день периода (дни без бронирований - с нулями):
+        day, bookings, covers, seat_hours_booked, cancelled
+    """
+    query = """
+    SELECT d.day::date AS day,
+           COUNT(b.id) FILTER (WHERE b.status = ANY(%(statuses)s)) AS bookings,
+           COALESCE(SUM(b.guests_count) FILTER (WHERE b.status = ANY(%(statuses)s)), 0) AS covers,
+           ROUND(COALESCE(SUM(b.guests_count * COALESCE(b.duration, 120))
+                     FILTER (WHERE b.status = ANY(%(statuses)s)), 0) / 60.0, 2) AS seat_hours_booked,
+           COUNT(b.id) FILTER (WHERE b.status = 'cancelled') AS cancelled
+    FROM generate_series(%(start)s::date, %(end)s::date, interval '1 day') AS d(day)
+    LEFT JOIN {bookings} b
+           ON b.booking_date = d.day::date
+          AND b.booking_date BETWEEN %(start)s::date AND %(end)s::date
+    GROUP BY d.day
+    ORDER BY d.day
+    """
+    params = {'start': start_date, 'end': end_date, 'statuses': REPORT_STATUSES}
+    
+    try:
+        with PostgreSQLDriver() as db:
+            query = query.format(bookings=_bookings_source(db, start_date))
+            return db.execute_query(query, params)
+    except Exception as e:
+        print(f"Ошибка построения отчета по дням: {e}")
+        return []
+
+
+def export_report_csv(rows: List[Dict[str, Any]], path: str) -> int:
+    """
+    Сохранение строк отчета в CSV
+    
+    Args:
+        rows: Результат report_* функции
+        path: Путь к файлу
+    
+    Returns:
+        Количество записанных строк
+    """
+    import csv
+    
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if not rows:
+            return 0
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+
+# ==================== ВЫГРУЗКА БРОНИРОВАНИЙ ====================
+
+# Колонки выгрузки: бронирование с данными пользователя и стола
+_EXPORT_COLUMNS = [
+    'b.id AS booking_id', 'b.booking_date', 'b.booking_time', 'b.duration',
+    'b.guests_count', 'b.status', 'b.contact_name', 'b.contact_phone',
+    'b.special_requests', 'b.created_at', 'b.updated_at',
+    'b.user_id', 'u.username', 'u.email AS user_email', 'u.first_name',
+    'u.last_name', 'u.phone AS user_phone',
+    'b.table_id', 't.number AS table_number', 't.capacity AS table_capacity',
+    't.location AS table_location', 't.table_type'
+]
+
+
+def export_bookings(dest, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                    statuses: Optional[List[str]] = None, header: bool = True) -> int:
+    """
+    Потоковая выгрузка бронирований с данными пользователей и столов в CSV
+
+    Запрос выполняется как COPY (SELECT ...) TO STDOUT: сервер передает
+    строки прямо в файл, результат не собирается в памяти Python.
+    Период, захватывающий архив, читается вместе с bookings_archive.
+
+    Args:
+        dest: Путь к файлу (.gz - со сжатием gzip) или открытый файловый объект
+        start_date: Начало периода (включительно), None - без ограничения
+        end_date: Конец периода (включительно), None - без ограничения
+        statuses: Выгружаемые статусы, None - все
+        header: Первой строкой вывести названия колонок
+
+    Returns:
+        Количество выгруженных строк (-1 при ошибке)
+    """
+    conditions = []
+    params: Dict[str, Any] = {}
+    if start_date is not None:
+        conditions.append("b.booking_date >= %(start_date)s")
+        params['start_date'] = start_date
+    if end_date is not None:
+        conditions.append("b.booking_date <= %(end_date)s")
+        params['end_date'] = end_date
+    if statuses:
+        invalid = set(statuses) - set(Booking.VALID_STATUSES)
+        if invalid:
+            print(f"Ошибка выгрузки бронирований: неизвестные статусы {sorted(invalid)}")
+            return -1
+        conditions.append("b.status = ANY(%(statuses)s)")
+        params['statuses'] = list(statuses)
+
+    try:
+        with PostgreSQLDriver() as db:
+            query = f"""
+            SELECT {', '.join(_EXPORT_COLUMNS)}
+            FROM {_bookings_source(db, start_date)} b
+            LEFT JOIN {User.TABLE_NAME} u ON u.id = b.user_id
+            LEFT JOIN {Table.TABLE_NAME} t ON t.id = b.table_id
+            WHERE {' AND '.join(conditions) or 'TRUE'}
+            ORDER BY b.booking_date, b.booking_time, b.id
+            """
+
+            if not isinstance(dest, str):
+                return db.copy_to(query, dest, params, header=header)
+
+            import gzip
+            opener = gzip.open if dest.endswith('.gz') else open
+            with opener(dest, 'wb') as f:
+                return db.copy_to(query, f, params, header=header)
+    except Exception as e:
+        print(f"Ошибка выгрузки бронирований: {e}")
+        return -1
+
+
+# ==================== ДНЕВНАЯ СВОДКА ЗАГРУЗКИ ====================
+
+_SUMMARY_COUNTERS = [
+    'bookings_count', 'booked_minutes', 'covers',
+    'pending_count', 'confirmed_count', 'cancelled_count', 'completed_count'
+]
+
+
+def _summary_delta_sql(source: str, sign: str = '', where: str = '') -> str:
+    """
+    SELECT вклада строк бронирований в сводку, сгруппированный по (дата, стол)
+    
+    Args:
+        source: Таблица-источник (bookings или переходная таблица триггера)
+        sign: '' для добавления вклада, '-' для вычитания
+        where: Дополнительное условие отбора строк
+    """
+    condition = f"table_id IS NOT NULL{' AND ' + where if where else ''}"
+    return f"""
+        SELECT booking_date AS summary_date, table_id,
+               {sign}COUNT(*) AS bookings_count,
+               {sign}COALESCE(SUM(COALESCE(duration, 120))
+                   FILTER (WHERE status <> 'cancelled'), 0) AS booked_minutes,
+               {sign}COALESCE(SUM(guests_count)
+                   FILTER (WHERE status <> 'cancelled'), 0) AS covers,
+               {sign}COUNT(*) FILTER (WHERE status = 'pending') AS pending_count,
+               {sign}COUNT(*) FILTER (WHERE status = 'confirmed') AS confirmed_count,
+               {sign}COUNT(*) FILTER (WHERE status = 'cancelled') AS cancelled_count,
+               {sign}COUNT(*) FILTER (WHERE status = 'completed') AS completed_count
+        FROM {source}
+        WHERE {condition}
+        GROUP BY booking_date, table_id"""
+
+
+def _summary_upsert_sql(*deltas: str) -> str:
+    """INSERT ... ON CONFLICT, прибавляющий дельты к строкам сводки"""
+    columns = ', '.join(_SUMMARY_COUNTERS)
+    sums = ', '.join(f"SUM({c})" for c in _SUMMARY_COUNTERS)
+    updates = ', '.join(f"{c} = s.{c} + EXCLUDED.{c}" for c in _SUMMARY_COUNTERS)
+    union = ' UNION ALL '.join(f"({delta})" for delta in deltas)
+    return f"""
+        INSERT INTO {BookingDailySummary.TABLE_NAME} AS s (summary_date, table_id, {columns})
+        SELECT summary_date, table_id, {sums}
+        FROM ({union}) AS d
+        GROUP BY summary_date, table_id
+        ON CONFLICT (summary_date, table_id) DO UPDATE SET {updates};"""
+
+
+def _install_daily_summary_triggers(db: PostgreSQLDriver):
+    """
+    Установка триггеров инкрементального обновления сводки
+    
+    Триггеры уровня оператора с переходными таблицами: одна агрегирующая
+    запись в сводку на оператор, а не на строку - массовые UPDATE/COPY
+    обходятся дешево. PostgreSQL не допускает переходные таблицы у триггера
+    с несколькими событиями, поэтому триггеров три на одну функцию.
+    
+    Внутри транзакции с SET LOCAL booking.skip_summary = 'on' сводка не обновляется.
+    """
+    new_rows = _summary_delta_sql('new_rows')
+    old_rows = _summary_delta_sql('old_rows', sign='-')
+    
+    db.execute_command(f"""
+    CREATE OR REPLACE FUNCTION booking_daily_summary_apply() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        -- Служебные переносы строк (архивация) итоги не меняют
+        IF current_setting('booking.skip_summary', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        
+        IF TG_OP = 'INSERT' THEN
+            {_summary_upsert_sql(new_rows)}
+        ELSIF TG_OP = 'DELETE' THEN
+            {_summary_upsert_sql(old_rows)}
+        ELSE
+            {_summary_upsert_sql(old_rows, new_rows)}
+        END IF;
+        RETURN NULL;
+    END;
+    $$
+    """)
+    
+    transitions = {
+        'INSERT': 'NEW TABLE AS new_rows',
+        'UPDATE': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+        'DELETE': 'OLD TABLE AS old_rows'
+    }
+    for event, referencing in transitions.items():
+        trigger_name = f"bookings_summary_{event.lower()}"
+        db.execute_command(f"DROP TRIGGER IF EXISTS {trigger_name} ON {Booking.TABLE_NAME}")
+        db.execute_command(f"""
+        CREATE TRIGGER {trigger_name}
+        AFTER {event} ON {Booking.TABLE_NAME}
+        REFERENCING {referencing}
+        FOR EACH STATEMENT EXECUTE FUNCTION booking_daily_summary_apply()
+        """)
+    db.connection.commit()
+
+
+def rebuild_daily_summary(start_date: Optional[date] = None,
+                          end_date: Optional[date] = None) -> int:
+    """
+    Пересчет сводки из таблицы bookings (первичное заполнение и восстановление)
+    
+    На время пересчета запись в bookings блокируется (SHARE), чтобы
+    триггеры не изменили сводку параллельно; чтение не блокируется.
+    
+    Args:
+        start_date: Начало периода (None - с самой ранней даты)
+        end_date: Конец периода (None - до самой поздней даты)
+    
+    Returns:
+        Количество строк сводки после пересчета, -1 при ошибке
+    """
+    conditions = []
+    params = []
+    if start_date is not None:
+        conditions.append("booking_date >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("booking_date <= %s")
+        params.append(end_date)
+    where = ' AND '.join(conditions)
+    summary_where = where.replace('booking_date', 'summary_date')
+    
+    try:
+        with PostgreSQLDriver() as db:
+            with db.transaction():
+                db.execute_command(f"LOCK TABLE {Booking.TABLE_NAME} IN SHARE MODE")
+                db.execute_command(
+                    f"DELETE FROM {BookingDailySummary.TABLE_NAME}"
+                    + (f" WHERE {summary_where}" if summary_where else ""),
+                    tuple(params) or None
+                )
+                # Сводка учитывает и архивные бронирования
+                delta = _summary_delta_sql(f"{_bookings_source(db, None)} AS b", where=where)
+                return db.execute_command(_summary_upsert_sql(delta), tuple(params) or None)
+    except Exception as e:
+        print(f"Ошибка пересчета дневной сводки: {e}")
+        return -1
+
+
+def get_daily_summary(start_date: date, end_date: date,
+                      table_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Дневная сводка по столам за период (чтение по первичному ключу)
+    
+    Args:
+        start_date: Начало периода (включительно)
+        end_date: Конец периода (включительно)
+        table_id: Только указанный стол
+    """
+    query = f"""
+    SELECT * FROM {BookingDailySummary.TABLE_NAME}
+    WHERE summary_date BETWEEN %s AND %s
+    """
+    params = [start_date, end_date]
+    if table_id is not None:
+        query += " AND table_id = %s"
+        params.append(table_id)
+    query += " ORDER BY summary_date, table_id"
+    
+    try:
+        with PostgreSQLDriver() as db:
+            return db.execute_query(query, tuple(params))
+    except Exception as e:
+        print(f"Ошибка получения дневной сводки: {e}")
+        return []
+
+
+def get_daily_totals(start_date: date, end_date: date) -> List[Dict[str, Any]]:
+    """
+    Итоги по дням за период по всем столам (из дневной сводки)
+    
+    Args:
+        start_date: Начало периода (включительно)
+        end_date: Конец периода (включительно)
+    """
+    sums = ', '.join(f"SUM({c})::bigint AS {c}" for c in _SUMMARY_COUNTERS)
+    query = f"""
+    SELECT summary_date, {sums}
+    FROM {BookingDailySummary.TABLE_NAME}
+    WHERE summary_date BETWEEN %s AND %s
+    GROUP BY summary_date
+    ORDER BY summary_date
+    """
+    
+    try:
+        with PostgreSQLDriver() as db:
+            return db.execute_query(query, (start_date, end_date))
+    except Exception as e:
+        print(f"Ошибка получения итогов по дням: {e}")
+        return []
+
+
+# ==================== МЕТРИКИ ОПЕРАЦИЙ ====================
+
+# Все публичные функции выше учитываются в metrics.registry: вызовы,
+# задержки, ошибки, строки результата, подключения и запросы к БД
+metrics.instrument_module(globals())
+
+# Вызовы backend вне действий GUI (API, задания) профилируются отдельно
+# при включенном профилировании (profiling.py, BOOKING_PROFILE=1)
+profiling.profile_module(globals(), 'backend.')
+
 
 if __name__ == "__main__":
-    create_tables()
\ No newline at end of file
+    import sys
+    if '--rebuild-summary' in sys.argv:
+        print(f"Строк сводки: {rebuild_daily_summary()}")
+    elif '--maintain-partitions' in sys.argv:
+        print(f"Создано секций: {maintain_booking_partitions()}")
+    elif '--archive' in sys.argv:
+        print(f"Перенесено в архив: {archive_bookings()}")
+    else:
+        create_tables(concurrent_indexes='--concurrent-indexes' in sys.argv,
+                      partition_bookings='--partition-bookings' in sys.argv)
\ No newline at end of file
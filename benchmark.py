@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark Suite
+Микробенчмарки горячих путей драйвера, backend и загрузки списков GUI
+
+Бенчмарк работает с отдельной базой (BENCH_DB_NAME, по умолчанию
+booking_bench), заполняет ее синтетическим рестораном заданного масштаба
+и измеряет пропускную способность и задержки p50/p99. Результаты
+сохраняются в JSON и сравниваются с сохраненным базовым прогоном.
+
+Запуск:
+    python benchmark.py                          # заполнить базу и измерить
+    python benchmark.py --tables 100 --users 20000 --years 3
+    python benchmark.py --reuse                  # не пересоздавать данные
+    python benchmark.py --save-baseline          # сохранить результат как базовый
+    python benchmark.py --only create_booking --iterations 500
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time as _time
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Бенчмарк не должен трогать рабочую базу: backend и драйвер берут имя базы
+# из окружения, а load_dotenv не перезаписывает уже заданные переменные
+BENCH_DB_NAME = os.getenv('BENCH_DB_NAME', 'booking_bench')
+os.environ['DB_NAME'] = BENCH_DB_NAME
+
+import psycopg2
+from dotenv import load_dotenv
+
+import backend
+from models.booking import Booking
+from models.booking_series import BookingSeries
+from models.tables import Table
+from models.user import User
+from postgresql_driver import PostgreSQLDriver
+
+
+DEFAULT_RESULTS = 'benchmark_results.json'
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+# Начала бронирований в синтетических данных (по 2 часа, без пересечений)
+_SEED_SLOTS = [time(12, 0), time(14, 0), time(16, 0), time(18, 0), time(20, 0)]
+
+
+# ==================== ИЗМЕРЕНИЯ ====================
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(percent / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def measure(func: Callable[[], Any], iterations: int, warmup: int = 3,
+            rows_per_call: int = 1) -> Dict[str, Any]:
+    """
+    Измерение задержки и пропускной способности вызова
+
+    Args:
+        func: Измеряемая функция без аргументов
+        iterations: Количество измеряемых вызовов
+        warmup: Количество вызовов прогрева (не учитываются)
+        rows_per_call: Строк, обрабатываемых одним вызовом (для rows_per_s)
+
+    Returns:
+        Dict[str, Any]: Задержки в миллисекундах и пропускная способность
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    started = _time.perf_counter()
+    for _ in range(iterations):
+        call_started = _time.perf_counter()
+        func()
+        timings.append(_time.perf_counter() - call_started)
+    total = _time.perf_counter() - started
+
+    timings.sort()
+    result = {
+        'iterations': iterations,
+        'total_s': round(total, 4),
+        'ops_per_s': round(iterations / total, 2) if total else 0.0,
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'min_ms': round(timings[0] * 1000, 3),
+        'p50_ms': round(_percentile(timings, 50) * 1000, 3),
+        'p99_ms': round(_percentile(timings, 99) * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3),
+    }
+    if rows_per_call > 1:
+        result['rows_per_s'] = round(iterations * rows_per_call / total, 1) if total else 0.0
+    return result
+
+
+# ==================== СИНТЕТИЧЕСКИЕ ДАННЫЕ ====================
+
+def ensure_database():
+    """Создание базы бенчмарка, если ее нет"""
+    load_dotenv()
+    params = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', '5432')),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', 'password'),
+        'database': os.getenv('BENCH_ADMIN_DB', 'postgres'),
+    }
+    connection = psycopg2.connect(**params)
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (BENCH_DB_NAME,))
+            if cursor.fetchone() is None:
+                print(f"Создание базы {BENCH_DB_NAME}...")
+                cursor.execute(f'CREATE DATABASE "{BENCH_DB_NAME}"')
+    finally:
+        connection.close()
+
+
+def _chunks(iterable: Iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def seed(tables: int, users: int, years: float, fill: float, rng: random.Random) -> Dict[str, Any]:
+    """
+    Пересоздание схемы и заполнение синтетическим рестораном
+
+    Бронирования охватывают years лет до сегодняшнего дня и 60 дней вперед;
+    каждый слот стола занят с вероятностью fill. Прошедшие бронирования
+    завершены или отменены, будущие - ожидают подтверждения или подтверждены.
+
+    Returns:
+        Dict[str, Any]: Масштаб созданных данных
+    """
+    print(f"Заполнение {BENCH_DB_NAME}: столов {tables}, пользователей {users}, лет {years}...")
+    with PostgreSQLDriver() as db:
+        db.execute_command(
+            f"DROP TABLE IF EXISTS {Booking.ARCHIVE_TABLE_NAME}, {backend.BookingDailySummary.TABLE_NAME}, "
+            f"{backend.BookingAudit.TABLE_NAME}, "
+            f"{Booking.TABLE_NAME}, {BookingSeries.TABLE_NAME}, {Table.TABLE_NAME}, {User.TABLE_NAME} CASCADE"
+        )
+    backend.create_tables()
+
+    first_day = date.today() - timedelta(days=int(365 * years))
+    last_day = date.today() + timedelta(days=60)
+    booking_count = 0
+
+    with PostgreSQLDriver() as db:
+        user_rows = ((f"user{i}", f"user{i}@bench.local", 'x' * 60, f"Имя{i}", f"Фамилия{i}",
+                      f"+7900{i:07d}", 'user') for i in range(1, users + 1))
+        for chunk in _chunks(user_rows, 10000):
+            db.copy_from(User.TABLE_NAME, ['username', 'email', 'password_hash', 'first_name',
+                                           'last_name', 'phone', 'role'], chunk)
+
+        table_rows = ((number, rng.choice([2, 2, 4, 4, 6, 8]), rng.choice(Table.VALID_LOCATIONS))
+                      for number in range(1, tables + 1))
+        db.copy_from(Table.TABLE_NAME, ['number', 'capacity', 'location'], table_rows)
+        db.connection.commit()
+
+        user_ids = [row[0] for row in db.execute_query(f"SELECT id FROM {User.TABLE_NAME}", as_tuples=True)]
+        table_ids = [row[0] for row in db.execute_query(f"SELECT id FROM {Table.TABLE_NAME}", as_tuples=True)]
+
+        def booking_rows():
+            today = date.today()
+            day = first_day
+            while day <= last_day:
+                past = day < today
+                for table_id in table_ids:
+                    for slot in _SEED_SLOTS:
+                        if rng.random() >= fill:
+                            continue
+                        if past:
+                            status = 'completed' if rng.random() < 0.9 else 'cancelled'
+                        else:
+                            status = 'confirmed' if rng.random() < 0.6 else 'pending'
+                        yield (rng.choice(user_ids), table_id, day, slot, rng.randint(1, 6),
+                               status, 120)
+                day += timedelta(days=1)
+
+        columns = ['user_id', 'table_id', 'booking_date', 'booking_time', 'guests_count',
+                   'status', 'duration']
+        for chunk in _chunks(booking_rows(), 50000):
+            booking_count += db.copy_from(Booking.TABLE_NAME, columns, chunk)
+            db.connection.commit()
+
+        db.execute_command("ANALYZE")
+        db.connection.commit()
+
+    print(f"Создано бронирований: {booking_count}")
+    return {'tables': tables, 'users': users, 'years': years, 'fill': fill,
+            'bookings': booking_count, 'first_day': first_day.isoformat(),
+            'last_day': last_day.isoformat()}
+
+
+def current_scale() -> Dict[str, Any]:
+    """Масштаб уже заполненной базы (для --reuse)"""
+    with PostgreSQLDriver() as db:
+        row = db.execute_query(f"""
+        SELECT (SELECT COUNT(*) FROM {Table.TABLE_NAME}) AS tables,
+               (SELECT COUNT(*) FROM {User.TABLE_NAME}) AS users,
+               COUNT(*) AS bookings,
+               MIN(booking_date)::text AS first_day,
+               MAX(booking_date)::text AS last_day
+        FROM {Booking.TABLE_NAME}
+        """)[0]
+    return dict(row)
+
+
+# ==================== БЕНЧМАРКИ ====================
+
+class _HeadlessTree:
+    """Замена ttk.Treeview для запуска функций загрузки GUI без дисплея"""
+
+    def __init__(self):
+        self.rows = []
+
+    def get_children(self):
+        return list(range(len(self.rows)))
+
+    def delete(self, item):
+        self.rows.pop()
+
+    def insert(self, parent, index, values=()):
+        self.rows.append(values)
+
+
+def _gui_loader(method_name: str) -> Optional[Callable[[], Any]]:
+    """Функция загрузки списка GUI на объекте с безголовыми таблицами"""
+    try:
+        import gui
+    except ImportError:
+        return None
+
+    class _View:
+        users_tree = _HeadlessTree()
+        tables_tree = _HeadlessTree()
+        bookings_tree = _HeadlessTree()
+
+    view = _View()
+    method = getattr(gui.BookingSystemGUI, method_name)
+    return lambda: method(view)
+
+
+def build_benchmarks(scale: Dict[str, Any], rng: random.Random,
+                     db: PostgreSQLDriver) -> Dict[str, Dict[str, Any]]:
+    """
+    Набор бенчмарков: имя -> {'func', 'iterations' (доля от --iterations), 'rows'}
+
+    Функции выбирают случайные стол, пользователя, дату и время из
+    заполненного диапазона, чтобы не измерять один и тот же кэшированный план.
+    """
+    table_ids = [row[0] for row in db.execute_query(f"SELECT id FROM {Table.TABLE_NAME}", as_tuples=True)]
+    user_ids = [row[0] for row in db.execute_query(f"SELECT id FROM {User.TABLE_NAME}", as_tuples=True)]
+    booking_ids = [row[0] for row in db.execute_query(
+        f"SELECT id FROM {Booking.TABLE_NAME} ORDER BY id DESC LIMIT 1000", as_tuples=True
+    )]
+    first_day = date.fromisoformat(scale['first_day'])
+    days = (date.fromisoformat(scale['last_day']) - first_day).days + 1
+    # create_booking пишет за пределами заполненного диапазона
+    write_day = date.fromisoformat(scale['last_day']) + timedelta(days=30)
+
+    def any_day() -> date:
+        return first_day + timedelta(days=rng.randrange(days))
+
+    def any_time() -> time:
+        return time(rng.randint(10, 21), rng.choice([0, 30]))
+
+    insert_batch = 1000
+
+    def insert_many_rows():
+        rows = [{'user_id': rng.choice(user_ids), 'table_id': rng.choice(table_ids),
+                 'booking_date': write_day, 'booking_time': any_time(),
+                 'guests_count': 2, 'status': 'cancelled', 'duration': 120}
+                for _ in range(insert_batch)]
+        with db.transaction():
+            db.insert_many(Booking.TABLE_NAME, rows)
+
+    benchmarks = {
+        'is_table_available': {
+            'func': lambda: backend.is_table_available(rng.choice(table_ids), any_day(), any_time()),
+        },
+        'create_booking': {
+            'func': lambda: backend.create_booking(rng.choice(user_ids), rng.choice(table_ids),
+                                                   write_day, any_time(), 2, status='cancelled'),
+        },
+        'update_booking': {
+            'func': lambda: backend.update_booking(rng.choice(booking_ids),
+                                                   special_requests=f"bench {rng.random():.6f}"),
+        },
+        'get_all_bookings[date]': {
+            'func': lambda: backend.get_all_bookings(booking_date=any_day()),
+        },
+        'get_all_bookings[user]': {
+            'func': lambda: backend.get_all_bookings(user_id=rng.choice(user_ids)),
+        },
+        'get_all_bookings[week]': {
+            'func': lambda: (lambda start: backend.get_all_bookings(
+                date_from=start, date_to=start + timedelta(days=7),
+                statuses=Booking.ACTIVE_STATUSES, location='VIP', sort='date_asc', limit=100
+            ))(any_day()),
+        },
+        'iter_bookings[all]': {
+            'func': lambda: sum(1 for _ in backend.iter_bookings(batch_size=5000)),
+            'iterations': 0.05,
+        },
+        'get_all_bookings[all]': {
+            'func': lambda: backend.get_all_bookings(),
+            'iterations': 0.05,
+        },
+        'search_users': {
+            'func': lambda: backend.search_users(f"user{rng.randint(1, 999)}", limit=20),
+        },
+        'get_table_availability': {
+            'func': lambda: backend.get_table_availability(rng.choice(table_ids), any_day()),
+        },
+        'driver.select': {
+            'func': lambda: db.select(Booking.TABLE_NAME,
+                                      where={'table_id': rng.choice(table_ids),
+                                             'booking_date': any_day()}),
+        },
+        'driver.insert_many': {
+            'func': insert_many_rows,
+            'iterations': 0.1,
+            'rows': insert_batch,
+        },
+    }
+
+    for name, method in (('gui.load_users', 'load_users'), ('gui.load_tables', 'load_tables'),
+                         ('gui.load_bookings', 'load_bookings')):
+        loader = _gui_loader(method)
+        if loader is not None:
+            benchmarks[name] = {'func': loader, 'iterations': 0.05}
+
+    return benchmarks
+
+
+def run_benchmarks(scale: Dict[str, Any], iterations: int, rng: random.Random,
+                   only: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Выполнение бенчмарков; возвращает {имя: результат measure()}"""
+    results = {}
+    with PostgreSQLDriver() as db:
+        benchmarks = build_benchmarks(scale, rng, db)
+        for name, spec in benchmarks.items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            count = max(3, int(iterations * spec.get('iterations', 1.0)))
+            backend.clear_caches()
+            result = measure(spec['func'], count, rows_per_call=spec.get('rows', 1))
+            results[name] = result
+            print(f"{name:<26}{result['ops_per_s']:>10.1f} оп/с  p50 {result['p50_ms']:>9.3f} мс"
+                  f"  p99 {result['p99_ms']:>9.3f} мс")
+    return results
+
+
+# ==================== РЕЗУЛЬТАТЫ ====================
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def _server_version() -> Optional[str]:
+    with PostgreSQLDriver() as db:
+        return db.execute_query("SHOW server_version")[0]['server_version']
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float) -> List[str]:
+    """
+    Сравнение с базовым прогоном по p50 и пропускной способности
+
+    Returns:
+        List[str]: Имена бенчмарков с ухудшением больше threshold (доля)
+    """
+    regressions = []
+    print(f"\n{'Бенчмарк':<26}{'p50 база':>11}{'p50':>11}{'Δ p50':>9}{'оп/с база':>12}{'оп/с':>10}{'Δ оп/с':>9}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<26}{'-':>11}{result['p50_ms']:>11.3f}{'new':>9}")
+            continue
+        p50_delta = result['p50_ms'] / base['p50_ms'] - 1 if base['p50_ms'] else 0.0
+        ops_delta = result['ops_per_s'] / base['ops_per_s'] - 1 if base['ops_per_s'] else 0.0
+        regressed = p50_delta > threshold or ops_delta < -threshold
+        mark = '  <-- хуже' if regressed else ''
+        print(f"{name:<26}{base['p50_ms']:>11.3f}{result['p50_ms']:>11.3f}{p50_delta:>+9.1%}"
+              f"{base['ops_per_s']:>12.1f}{result['ops_per_s']:>10.1f}{ops_delta:>+9.1%}{mark}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки драйвера, backend и GUI")
+    parser.add_argument('--tables', type=int, default=40, help="количество столов")
+    parser.add_argument('--users', type=int, default=2000, help="количество пользователей")
+    parser.add_argument('--years', type=float, default=1.0, help="лет истории бронирований")
+    parser.add_argument('--fill', type=float, default=0.6, help="доля занятых слотов")
+    parser.add_argument('--iterations', type=int, default=200, help="вызовов на бенчмарк")
+    parser.add_argument('--seed', type=int, default=42, help="seed генератора данных")
+    parser.add_argument('--reuse', action='store_true', help="использовать уже заполненную базу")
+    parser.add_argument('--only', action='append', help="только бенчмарки с этим префиксом")
+    parser.add_argument('--output', default=DEFAULT_RESULTS, help="файл результатов JSON")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="файл базового прогона")
+    parser.add_argument('--save-baseline', action='store_true', help="сохранить как базовый прогон")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="допустимое ухудшение относительно базы (доля)")
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="код возврата 1 при ухудшении")
+    args = parser.parse_args()
+
+    # Драйвер пишет в лог каждое подключение; при измерениях это шум
+    driver_logger = logging.getLogger('postgresql_driver')
+    driver_logger.addHandler(logging.NullHandler())
+    driver_logger.setLevel(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    ensure_database()
+    if args.reuse:
+        scale = current_scale()
+    else:
+        scale = seed(args.tables, args.users, args.years, args.fill, rng)
+
+    results = run_benchmarks(scale, args.iterations, rng, args.only)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'postgres': _server_version(),
+            'database': BENCH_DB_NAME,
+            'iterations': args.iterations,
+            'scale': scale,
+        },
+        'results': results,
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты: {args.output}")
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Базовый прогон сохранен: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        # Количество бронирований растет от бенчмарков записи, сравниваем справочники
+        base_scale = baseline['meta'].get('scale', {})
+        if any(base_scale.get(key) != scale.get(key) for key in ('tables', 'users')):
+            print("Внимание: масштаб данных отличается от базового прогона")
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\nУхудшение больше {args.threshold:.0%}: {', '.join(regressions)}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exporter Module
+Потоковая выгрузка бронирований с данными пользователей и столов в CSV
+
+Запуск:
+    python exporter.py bookings.csv --from 2025-01-01 --to 2025-01-31
+    python exporter.py bookings.csv.gz --status completed --status cancelled
+    python exporter.py - --from 2025-01-01 | gzip > bookings.csv.gz
+"""
+
+import argparse
+import sys
+from datetime import date
+
+import backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Выгрузка бронирований в CSV")
+    parser.add_argument('path', help="файл выгрузки (.gz - со сжатием, '-' - stdout)")
+    parser.add_argument('--from', dest='start_date', type=date.fromisoformat,
+                        help="начало периода YYYY-MM-DD")
+    parser.add_argument('--to', dest='end_date', type=date.fromisoformat,
+                        help="конец периода YYYY-MM-DD")
+    parser.add_argument('--status', action='append', choices=backend.Booking.VALID_STATUSES,
+                        help="выгружаемый статус (можно указать несколько раз)")
+    parser.add_argument('--no-header', action='store_true', help="без строки заголовка")
+    args = parser.parse_args()
+
+    dest = sys.stdout.buffer if args.path == '-' else args.path
+    count = backend.export_bookings(dest, args.start_date, args.end_date,
+                                    statuses=args.status, header=not args.no_header)
+    if count < 0:
+        sys.exit(1)
+    print(f"✓ Выгружено бронирований: {count}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,16 @@
 Графический интерфейс для системы бронирования
 """
 
+import os
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox as tk_messagebox, scrolledtext
 from datetime import datetime, date, time, timedelta
 import backend
+import profiling
+
+
+# Ожидание ответа в окнах сообщений не входит в время профилируемого действия
+messagebox = profiling.ModalProxy(tk_messagebox)
 
 
 class BookingSystemGUI:
@@ -15,6 +21,7 @@ class BookingSystemGUI:
         self.root = root
         self.root.title("Система бронирования столов")
         self.root.geometry("1300x700")
+        self.init_menu()
         
         # Создаем вкладки
         self.notebook = ttk.Notebook(root)
@@ -30,6 +37,45 @@ class BookingSystemGUI:
         self.load_tables()
         self.load_bookings()
     
+    # ==================== МЕНЮ ====================
+    
+    def init_menu(self):
+        """Меню "Сервис": профилирование действий (BOOKING_PROFILE=1 включает его при запуске)"""
+        menubar = tk.Menu(self.root)
+        service_menu = tk.Menu(menubar, tearoff=0)
+        self.profiling_var = tk.BooleanVar(value=profiling.profiler.enabled)
+        service_menu.add_checkbutton(label="Профилирование действий", variable=self.profiling_var,
+                                     command=self.toggle_profiling)
+        service_menu.add_command(label="Самые долгие действия...", command=self.slow_actions_dialog)
+        menubar.add_cascade(label="Сервис", menu=service_menu)
+        self.root.config(menu=menubar)
+    
+    def toggle_profiling(self):
+        """Включение и выключение профилирования действий"""
+        if self.profiling_var.get():
+            profiling.profiler.enable()
+            messagebox.showinfo("Профилирование",
+                                f"Профили действий пишутся в каталог\n"
+                                f"{os.path.abspath(profiling.profiler.directory)}")
+        else:
+            profiling.profiler.disable()
+    
+    def slow_actions_dialog(self):
+        """Окно со списком самых долгих действий и сводкой по видам действий"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Самые долгие действия")
+        dialog.geometry("1100x500")
+        dialog.transient(self.root)
+        
+        text = scrolledtext.ScrolledText(dialog, font=("Courier", 9), wrap=tk.NONE)
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        entries = profiling.load_index()
+        text.insert(1.0, profiling.format_slowest(entries, 30) + "\n\n" +
+                    profiling.format_by_action(entries))
+        text.config(state=tk.DISABLED)
+        
+        ttk.Button(dialog, text="Закрыть", command=dialog.destroy, width=15).pack(pady=5)
+    
     # ==================== ВКЛАДКА ПОЛЬЗОВАТЕЛЕЙ ====================
     
     def init_users_tab(self):
@@ -216,6 +262,7 @@ class BookingSystemGUI:
     
     # ==================== ОБРАБОТЧИКИ ВЫБОРА ====================
     
+    @profiling.profiled('select_user')
     def on_user_select(self, event):
         """Обработка выбора пользователя"""
         selected = self.users_tree.selection()
@@ -236,6 +283,7 @@ class BookingSystemGUI:
             self.user_info_text.delete(1.0, tk.END)
             self.user_info_text.insert(1.0, info)
     
+    @profiling.profiled('select_table')
     def on_table_select(self, event):
         """Обработка выбора стола"""
         selected = self.tables_tree.selection()
@@ -256,6 +304,7 @@ class BookingSystemGUI:
             self.table_info_text.delete(1.0, tk.END)
             self.table_info_text.insert(1.0, info)
     
+    @profiling.profiled('select_booking')
     def on_booking_select(self, event):
         """Обработка выбора бронирования"""
         selected = self.bookings_tree.selection()
@@ -289,6 +338,7 @@ class BookingSystemGUI:
     
     # ==================== ФИЛЬТРАЦИЯ ====================
     
+    @profiling.profiled('filter_by_date')
     def filter_by_date(self):
         """Фильтрация бронирований по дате"""
         date_str = self.filter_date_entry.get()
@@ -303,6 +353,7 @@ class BookingSystemGUI:
         except ValueError:
             messagebox.showerror("Ошибка", "Неверный формат даты. Используйте YYYY-MM-DD")
     
+    @profiling.profiled('reset_filter')
     def reset_filter(self):
         """Сброс фильтра"""
         self.filter_date_entry.delete(0, tk.END)
@@ -313,13 +364,17 @@ class BookingSystemGUI:
         for item in self.bookings_tree.get_children():
             self.bookings_tree.delete(item)
         
+        # Пользователи и столы загружаются одним запросом на весь список
+        users = backend.get_users_by_ids({b['user_id'] for b in bookings})
+        tables = backend.get_tables_by_ids({b['table_id'] for b in bookings})
+        
         for booking in bookings:
             # Получаем информацию о пользователе
-            user = backend.get_user_by_id(booking['user_id'])
+            user = users.get(booking['user_id'])
             user_name = f"{user['first_name']} {user['last_name']}" if user else f"ID:{booking['user_id']}"
             
             # Получаем информацию о столе
-            table = backend.get_table_by_id(booking['table_id'])
+            table = tables.get(booking['table_id'])
             table_num = f"№{table['number']}" if table else f"ID:{booking['table_id']}"
             
             # Вычисляем время окончания
@@ -336,8 +391,20 @@ class BookingSystemGUI:
                 booking.get('guests_count')
             ))
     
+    @staticmethod
+    def format_conflicts(conflicts):
+        """Текст сообщения о пересекающихся бронированиях"""
+        lines = ["Стол занят в это время. Пересекающиеся бронирования:"]
+        for booking in conflicts:
+            start = datetime.combine(booking['booking_date'], booking['booking_time'])
+            end = start + timedelta(minutes=booking['duration'] or 120)
+            lines.append(f"  ID {booking['id']}: {booking['booking_date']} "
+                         f"{start.strftime('%H:%M')} - {end.strftime('%H:%M')} ({booking['status']})")
+        return "\n".join(lines)
+    
     # ==================== ДИАЛОГИ СОЗДАНИЯ ====================
     
+    @profiling.profiled('create_user_dialog')
     def create_user_dialog(self):
         """Диалоговое окно создания пользователя"""
         dialog = tk.Toplevel(self.root)
@@ -383,6 +450,7 @@ class BookingSystemGUI:
         role_combo.grid(row=13, column=0, pady=5)
         role_combo.set("user")
         
+        @profiling.profiled('create_user.save')
         def save():
             if not username_entry.get() or not email_entry.get() or not password_entry.get():
                 messagebox.showerror("Ошибка", "Заполните обязательные поля")
@@ -407,6 +475,7 @@ class BookingSystemGUI:
         ttk.Button(btn_frame, text="Создать", command=save, width=15).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Отмена", command=dialog.destroy, width=15).pack(side=tk.LEFT, padx=5)
     
+    @profiling.profiled('create_table_dialog')
     def create_table_dialog(self):
         """Диалоговое окно создания стола"""
         dialog = tk.Toplevel(self.root)
@@ -446,6 +515,7 @@ class BookingSystemGUI:
         active_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(form_frame, text="Активен", variable=active_var).grid(row=10, column=0, pady=5)
         
+        @profiling.profiled('create_table.save')
         def save():
             try:
                 number = int(number_entry.get())
@@ -473,6 +543,7 @@ class BookingSystemGUI:
         ttk.Button(btn_frame, text="Создать", command=save, width=15).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Отмена", command=dialog.destroy, width=15).pack(side=tk.LEFT, padx=5)
     
+    @profiling.profiled('create_booking_dialog')
     def create_booking_dialog(self):
         """Диалоговое окно создания бронирования"""
         dialog = tk.Toplevel(self.root)
@@ -486,17 +557,32 @@ class BookingSystemGUI:
         main_frame = ttk.Frame(dialog, padding=15)
         main_frame.pack(expand=True, fill=tk.BOTH)
         
-        # Загружаем пользователей и столы
-        users = backend.get_all_users()
+        # Пользователи ищутся по мере ввода, столы загружаются сразу
         tables = backend.get_all_tables(is_active=True)
         
         form_frame = ttk.Frame(main_frame)
         form_frame.pack(expand=True)
         
-        ttk.Label(form_frame, text="Пользователь *").grid(row=0, column=0, pady=3)
-        user_combo = ttk.Combobox(form_frame, state="readonly", width=28)
+        ttk.Label(form_frame, text="Пользователь * (логин, email, имя, телефон)").grid(row=0, column=0, pady=3)
+        user_combo = ttk.Combobox(form_frame, width=28)
         user_combo.grid(row=1, column=0, pady=3)
-        user_combo['values'] = [f"{u['id']} - {u['username']} ({u['email']})" for u in users]
+        search_job = [None]
+        
+        @profiling.profiled('create_booking.search_users')
+        def search_users():
+            search_job[0] = None
+            users = backend.search_users(user_combo.get(), limit=20)
+            user_combo['values'] = [f"{u['id']} - {u['username']} ({u['email']})" for u in users]
+        
+        def schedule_user_search(event):
+            # Поиск запускается после паузы в наборе, а не на каждую клавишу
+            if event.keysym in ('Up', 'Down', 'Return', 'Escape', 'Tab'):
+                return
+            if search_job[0] is not None:
+                dialog.after_cancel(search_job[0])
+            search_job[0] = dialog.after(300, search_users)
+        
+        user_combo.bind("<KeyRelease>", schedule_user_search)
         
         ttk.Label(form_frame, text="Стол *").grid(row=2, column=0, pady=3)
         table_combo = ttk.Combobox(form_frame, state="readonly", width=28)
@@ -543,6 +629,7 @@ class BookingSystemGUI:
         check_label = ttk.Label(form_frame, text="")
         check_label.grid(row=20, column=0, pady=5)
         
+        @profiling.profiled('create_booking.check_availability')
         def check_availability():
             if not table_combo.get() or not date_entry.get() or not time_entry.get():
                 check_label.config(text="")
@@ -566,6 +653,7 @@ class BookingSystemGUI:
         time_entry.bind("<KeyRelease>", lambda e: check_availability())
         duration_entry.bind("<KeyRelease>", lambda e: check_availability())
         
+        @profiling.profiled('create_booking.save')
         def save():
             if not user_combo.get() or not table_combo.get() or not date_entry.get() or not time_entry.get() or not guests_entry.get():
                 messagebox.showerror("Ошибка", "Заполните все обязательные поля")
@@ -582,18 +670,7 @@ class BookingSystemGUI:
                 messagebox.showerror("Ошибка", f"Неверный формат данных: {e}")
                 return
             
-            # Проверяем доступность с указанной длительностью
-            if not backend.is_table_available(table_id, booking_date, booking_time, duration):
-                from datetime import timedelta
-                end_time = datetime.combine(booking_date, booking_time) + timedelta(minutes=duration)
-                if not messagebox.askyesno(
-                    "Предупреждение", 
-                    f"Стол занят на это время ({booking_time} - {end_time.strftime('%H:%M')}).\n"
-                    "Создать бронирование?"
-                ):
-                    return
-            
-            booking_id = backend.create_booking(
+            booking_args = (
                 user_id, table_id, booking_date, booking_time, guests_count,
                 status_combo.get(), phone_entry.get() or None,
                 contact_name_entry.get() or None,
@@ -601,6 +678,18 @@ class BookingSystemGUI:
                 duration
             )
             
+            # Проверка пересечений и вставка выполняются атомарно;
+            # пересекающееся бронирование не создается
+            result = backend.reserve_table(*booking_args)
+            booking_id = result['booking_id']
+            
+            if result['status'] == backend.RESERVE_CONFLICT:
+                messagebox.showerror("Стол занят", self.format_conflicts(result['conflicts']))
+                return
+            if result['status'] == backend.RESERVE_UNAVAILABLE:
+                messagebox.showerror("Ошибка", result['error'])
+                return
+            
             if booking_id:
                 messagebox.showinfo("Успех", f"Бронирование создано с ID: {booking_id}")
                 dialog.destroy()
@@ -614,6 +703,7 @@ class BookingSystemGUI:
         ttk.Button(btn_frame, text="Создать", command=save, width=15).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Отмена", command=dialog.destroy, width=15).pack(side=tk.LEFT, padx=5)
     
+    @profiling.profiled('check_availability_dialog')
     def check_availability_dialog(self):
         """Диалог проверки доступности стола"""
         dialog = tk.Toplevel(self.root)
@@ -650,6 +740,7 @@ class BookingSystemGUI:
         btn_frame = ttk.Frame(dialog)
         btn_frame.pack(side=tk.BOTTOM, pady=15)
         
+        @profiling.profiled('check_availability.check')
         def check():
             try:
                 table_id = int(table_id_entry.get())
@@ -673,6 +764,7 @@ class BookingSystemGUI:
     
     # ==================== РЕДАКТИРОВАНИЕ И УДАЛЕНИЕ ====================
     
+    @profiling.profiled('edit_user_dialog')
     def edit_user_dialog(self):
         """Диалог редактирования пользователя"""
         selected = self.users_tree.selection()
@@ -718,6 +810,7 @@ class BookingSystemGUI:
         btn_frame = ttk.Frame(dialog)
         btn_frame.pack(side=tk.BOTTOM, pady=15)
         
+        @profiling.profiled('edit_user.save')
         def save():
             update_data = {}
             if first_name_entry.get():
@@ -738,6 +831,7 @@ class BookingSystemGUI:
         ttk.Button(btn_frame, text="Сохранить", command=save, width=15).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Отмена", command=dialog.destroy, width=15).pack(side=tk.LEFT, padx=5)
     
+    @profiling.profiled('edit_table_dialog')
     def edit_table_dialog(self):
         """Диалог редактирования стола"""
         selected = self.tables_tree.selection()
@@ -781,6 +875,7 @@ class BookingSystemGUI:
         btn_frame = ttk.Frame(dialog)
         btn_frame.pack(side=tk.BOTTOM, pady=15)
         
+        @profiling.profiled('edit_table.save')
         def save():
             update_data = {}
             if location_entry.get():
@@ -801,6 +896,7 @@ class BookingSystemGUI:
         ttk.Button(btn_frame, text="Сохранить", command=save, width=15).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Отмена", command=dialog.destroy, width=15).pack(side=tk.LEFT, padx=5)
     
+    @profiling.profiled('edit_booking_dialog')
     def edit_booking_dialog(self):
         """Диалог редактирования бронирования"""
         selected = self.bookings_tree.selection()
@@ -837,6 +933,7 @@ class BookingSystemGUI:
         btn_frame = ttk.Frame(dialog)
         btn_frame.pack(side=tk.BOTTOM, pady=15)
         
+        @profiling.profiled('edit_booking.save')
         def save():
             try:
                 guests_count = int(guests_entry.get())
@@ -844,16 +941,24 @@ class BookingSystemGUI:
                 messagebox.showerror("Ошибка", "Количество гостей должно быть числом")
                 return
             
-            if backend.update_booking(booking_id, guests_count=guests_count, status=status_combo.get()):
+            # Возврат в активный статус проверяется на пересечения под блокировкой стола
+            result = backend.reschedule_booking(booking_id, guests_count=guests_count,
+                                                status=status_combo.get())
+            if result['status'] == backend.RESERVE_OK:
                 messagebox.showinfo("Успех", "Бронирование обновлено")
                 dialog.destroy()
                 self.load_bookings()
+            elif result['status'] == backend.RESERVE_CONFLICT:
+                messagebox.showerror("Стол занят", self.format_conflicts(result['conflicts']))
+            elif result['status'] == backend.RESERVE_UNAVAILABLE:
+                messagebox.showerror("Ошибка", result['error'])
             else:
                 messagebox.showerror("Ошибка", "Не удалось обновить бронирование")
         
         ttk.Button(btn_frame, text="Сохранить", command=save, width=15).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Отмена", command=dialog.destroy, width=15).pack(side=tk.LEFT, padx=5)
     
+    @profiling.profiled('delete_user')
     def delete_user_dialog(self):
         """Удаление пользователя"""
         selected = self.users_tree.selection()
@@ -865,12 +970,13 @@ class BookingSystemGUI:
             return
         
         user_id = int(self.users_tree.item(selected[0])['values'][0])
-        if backend.delete_user(user_id):
+        if backend.delete_user(user_id, soft=True):
             messagebox.showinfo("Успех", "Пользователь удален")
             self.load_users()
         else:
             messagebox.showerror("Ошибка", "Не удалось удалить пользователя")
     
+    @profiling.profiled('delete_table')
     def delete_table_dialog(self):
         """Удаление стола"""
         selected = self.tables_tree.selection()
@@ -882,12 +988,13 @@ class BookingSystemGUI:
             return
         
         table_id = int(self.tables_tree.item(selected[0])['values'][0])
-        if backend.delete_table(table_id):
+        if backend.delete_table(table_id, soft=True):
             messagebox.showinfo("Успех", "Стол удален")
             self.load_tables()
         else:
             messagebox.showerror("Ошибка", "Не удалось удалить стол")
     
+    @profiling.profiled('delete_booking')
     def delete_booking_dialog(self):
         """Удаление бронирования"""
         selected = self.bookings_tree.selection()
@@ -907,6 +1014,7 @@ class BookingSystemGUI:
     
     # ==================== ЗАГРУЗКА ДАННЫХ ====================
     
+    @profiling.profiled('load_users')
     def load_users(self):
         """Загрузка списка пользователей"""
         for item in self.users_tree.get_children():
@@ -921,6 +1029,7 @@ class BookingSystemGUI:
                 user.get('phone', ''), user.get('role'), status
             ))
     
+    @profiling.profiled('load_tables')
     def load_tables(self):
         """Загрузка списка столов"""
         for item in self.tables_tree.get_children():
@@ -934,19 +1043,25 @@ class BookingSystemGUI:
                 table.get('location', ''), table.get('table_type', ''), status
             ))
     
+    @profiling.profiled('load_bookings')
     def load_bookings(self):
         """Загрузка списка бронирований"""
         for item in self.bookings_tree.get_children():
             self.bookings_tree.delete(item)
         
         bookings = backend.get_all_bookings()
+        
+        # Пользователи и столы загружаются одним запросом на весь список
+        users = backend.get_users_by_ids({b['user_id'] for b in bookings})
+        tables = backend.get_tables_by_ids({b['table_id'] for b in bookings})
+        
         for booking in bookings:
             # Получаем информацию о пользователе
-            user = backend.get_user_by_id(booking['user_id'])
+            user = users.get(booking['user_id'])
             user_name = f"{user['first_name']} {user['last_name']}" if user and user.get('first_name') and user.get('last_name') else (user['username'] if user else f"ID:{booking['user_id']}")
             
             # Получаем информацию о столе
-            table = backend.get_table_by_id(booking['table_id'])
+            table = tables.get(booking['table_id'])
             table_num = f"№{table['number']}" if table else f"ID:{booking['table_id']}"
             
             # Вычисляем время окончания
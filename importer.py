@@ -0,0 +1,574 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Importer Module
+Потоковый импорт пользователей, столов и бронирований из CSV/JSONL
+
+Файл обрабатывается конвейером генераторов: чтение -> проверка по COLUMNS
+модели -> пакетное разрешение внешних ключей -> загрузка пачками через COPY.
+В памяти одновременно находится не больше одной пачки, поэтому объем файла
+не ограничен. Ошибочные строки не прерывают импорт, а записываются в файл
+отклоненных строк с номером строки и причиной.
+
+Запуск:
+    python importer.py users users.csv
+    python importer.py tables tables.jsonl
+    python importer.py bookings bookings.csv.gz --batch-size 10000
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import re
+import time as _time
+from datetime import date, datetime, time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import backend
+from cache import TTLCache
+from models.booking import Booking
+from models.tables import Table
+from models.user import User
+from postgresql_driver import PostgreSQLDriver
+
+
+# Импортируемые сущности: имя -> модель
+IMPORT_MODELS = {model.TABLE_NAME: model for model in (User, Table, Booking)}
+
+# Допустимые значения колонок
+_CHOICES = {
+    (User.TABLE_NAME, 'role'): User.VALID_ROLES,
+    (Booking.TABLE_NAME, 'status'): Booking.VALID_STATUSES,
+}
+
+# Колонки, значения которых должны быть положительными
+_POSITIVE = {
+    (Table.TABLE_NAME, 'capacity'),
+    (Booking.TABLE_NAME, 'guests_count'),
+    (Booking.TABLE_NAME, 'duration'),
+}
+
+# Внешние ключи бронирований: колонка -> (модель, {поле файла: колонка модели}).
+# В файле вместо ID можно указать естественный ключ записи
+_FOREIGN_KEYS = {
+    Booking.TABLE_NAME: {
+        'user_id': (User, {'username': 'username', 'user_email': 'email'}),
+        'table_id': (Table, {'table_number': 'number'}),
+    }
+}
+
+_TRUE_VALUES = {'true', 't', '1', 'yes', 'y', 'да'}
+_FALSE_VALUES = {'false', 'f', '0', 'no', 'n', 'нет'}
+
+# Первое ключевое слово после типа колонки
+_CONSTRAINT_RE = re.compile(r'\s+(PRIMARY|UNIQUE|NOT|DEFAULT|REFERENCES|CHECK)\b', re.IGNORECASE)
+_DEFAULT_RE = re.compile(r'\bDEFAULT\s+(.+?)(?:\s+(?:NOT\s+NULL|UNIQUE|REFERENCES|CHECK)\b|$)',
+                         re.IGNORECASE)
+_VARCHAR_RE = re.compile(r'VARCHAR\((\d+)\)', re.IGNORECASE)
+
+
+class RowError(ValueError):
+    """Ошибка проверки строки импорта"""
+
+
+# ==================== СХЕМА ИМПОРТА ====================
+
+class _Column:
+    """Описание колонки для проверки и загрузки, построенное по COLUMNS модели"""
+
+    __slots__ = ('name', 'sql_type', 'parse', 'max_length', 'required', 'default',
+                 'unique', 'choices', 'positive')
+
+    def __init__(self, table_name: str, name: str, definition: str):
+        self.name = name
+        match = _CONSTRAINT_RE.search(definition)
+        self.sql_type = (definition[:match.start()] if match else definition).strip()
+        upper = definition.upper()
+
+        default = _DEFAULT_RE.search(definition)
+        self.default = default.group(1).strip() if default else None
+        self.required = 'NOT NULL' in upper and self.default is None
+        self.unique = 'UNIQUE' in upper
+        length = _VARCHAR_RE.search(self.sql_type)
+        self.max_length = int(length.group(1)) if length else None
+        self.parse = _parser_for(self.sql_type)
+        self.choices = _CHOICES.get((table_name, name))
+        self.positive = (table_name, name) in _POSITIVE
+
+    def convert(self, value: Any) -> Any:
+        """Приведение значения из файла к типу колонки с проверкой ограничений"""
+        if isinstance(value, str):
+            value = value.strip()
+            if value == '':
+                value = None
+        if value is None:
+            if self.required:
+                raise RowError(f"{self.name}: обязательное поле")
+            return None
+
+        try:
+            value = self.parse(value)
+        except (TypeError, ValueError):
+            raise RowError(f"{self.name}: некорректное значение {value!r} для {self.sql_type}")
+
+        if self.max_length is not None and len(value) > self.max_length:
+            raise RowError(f"{self.name}: длина больше {self.max_length}")
+        if self.choices is not None and value not in self.choices:
+            raise RowError(f"{self.name}: недопустимое значение {value!r}")
+        if self.positive and value <= 0:
+            raise RowError(f"{self.name}: значение должно быть больше 0")
+        return value
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False
+    raise ValueError(value)
+
+
+def _parse_int(value: Any) -> int:
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(value)
+    return int(value)
+
+
+def _parse_str(value: Any) -> str:
+    if not isinstance(value, str):
+        raise ValueError(value)
+    return value
+
+
+def _parse_date(value: Any) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _parse_time(value: Any) -> time:
+    return value if isinstance(value, time) else time.fromisoformat(value)
+
+
+def _parse_timestamp(value: Any) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def _parser_for(sql_type: str) -> Callable[[Any], Any]:
+    """Функция разбора значения по SQL типу колонки"""
+    base = sql_type.upper()
+    if base.startswith(('INTEGER', 'SERIAL', 'BIGINT', 'SMALLINT')):
+        return _parse_int
+    if base.startswith('BOOLEAN'):
+        return _parse_bool
+    if base.startswith('TIMESTAMP'):
+        return _parse_timestamp
+    if base.startswith('DATE'):
+        return _parse_date
+    if base.startswith('TIME'):
+        return _parse_time
+    return _parse_str
+
+
+def _import_columns(model) -> List[_Column]:
+    """Загружаемые колонки модели (id назначает база)"""
+    return [_Column(model.TABLE_NAME, name, definition)
+            for name, definition in model.COLUMNS.items() if name != 'id']
+
+
+# ==================== КОНВЕЙЕР ====================
+
+def _open_text(path: str):
+    """Открытие файла на чтение, .gz распаковывается на лету"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8-sig', newline='')
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+
+def read_records(path: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Чтение записей файла
+
+    Формат определяется по расширению: .jsonl/.ndjson - JSON Lines, иначе CSV
+    с заголовком. Для JSONL некорректная строка возвращается как RowError.
+
+    Yields:
+        (номер строки, словарь полей или RowError)
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    with _open_text(path) as f:
+        if name.endswith(('.jsonl', '.ndjson')):
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_no, RowError(f"некорректный JSON: {e}")
+                    continue
+                if not isinstance(record, dict):
+                    yield line_no, RowError("ожидается JSON-объект")
+                    continue
+                yield line_no, record
+        else:
+            reader = csv.DictReader(f)
+            for record in reader:
+                # Номер строки файла с учетом заголовка
+                yield reader.line_num, record
+
+
+def validate_records(records: Iterable[Tuple[int, Any]], model,
+                     reject: Callable[[int, Any, str], None]) -> Iterator[Tuple[int, Dict[str, Any], Dict[str, Any]]]:
+    """
+    Проверка и приведение типов по COLUMNS модели
+
+    Поля внешних ключей (_FOREIGN_KEYS) пропускаются как есть - они
+    разрешаются позже пачками. Неизвестные поля игнорируются.
+
+    Yields:
+        (номер строки, приведенные значения, исходная запись)
+    """
+    columns = _import_columns(model)
+    foreign_keys = _FOREIGN_KEYS.get(model.TABLE_NAME, {})
+    # Разбор естественных ключей по типу колонки ссылочной таблицы
+    key_parsers = {
+        alias: _parser_for(_Column(ref_model.TABLE_NAME, ref_column,
+                                   ref_model.COLUMNS[ref_column]).sql_type)
+        for ref_model, aliases in foreign_keys.values()
+        for alias, ref_column in aliases.items()
+    }
+
+    for line_no, record in records:
+        if isinstance(record, RowError):
+            reject(line_no, None, str(record))
+            continue
+
+        values = {}
+        try:
+            for column in columns:
+                if column.name in foreign_keys:
+                    ref_model, aliases = foreign_keys[column.name]
+                    raw = record.get(column.name)
+                    if raw not in (None, ''):
+                        values[column.name] = ('id', _parse_int(raw))
+                        continue
+                    for alias, ref_column in aliases.items():
+                        raw = record.get(alias)
+                        if raw not in (None, ''):
+                            if isinstance(raw, str):
+                                raw = raw.strip()
+                            values[column.name] = (ref_column, key_parsers[alias](raw))
+                            break
+                    else:
+                        raise RowError(f"{column.name}: не указан ни {column.name}, "
+                                       f"ни {', '.join(aliases)}")
+                    continue
+                values[column.name] = column.convert(record.get(column.name))
+        except RowError as e:
+            reject(line_no, record, str(e))
+            continue
+        except (TypeError, ValueError) as e:
+            reject(line_no, record, f"некорректное значение: {e}")
+            continue
+
+        yield line_no, values, record
+
+
+def _batches(iterable: Iterable, size: int) -> Iterator[list]:
+    """Разбиение потока на пачки по size элементов"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class _KeyResolver:
+    """
+    Пакетное разрешение внешних ключей
+
+    Для пачки строк собираются все неизвестные ключи и разрешаются одним
+    запросом = ANY на каждую колонку. Найденные ID хранятся в ограниченном
+    LRU-кэше, чтобы повторяющиеся ключи не запрашивались снова.
+    """
+
+    def __init__(self, db: PostgreSQLDriver, model, cache_size: int = 100000):
+        self.db = db
+        self.foreign_keys = _FOREIGN_KEYS.get(model.TABLE_NAME, {})
+        self.cache = TTLCache(maxsize=cache_size, ttl=24 * 60 * 60)
+
+    def resolve(self, batch: List[Tuple[int, Dict[str, Any], Dict[str, Any]]],
+                reject: Callable[[int, Any, str], None]) -> list:
+        """Замена ссылок (колонка, значение) на ID; строки с ненайденными ссылками отклоняются"""
+        if not self.foreign_keys:
+            return batch
+
+        # Сбор ключей, отсутствующих в кэше: {(таблица, колонка): {значения}}
+        wanted: Dict[Tuple[str, str], set] = {}
+        for _, values, _ in batch:
+            for name, (ref_model, _) in self.foreign_keys.items():
+                key = (ref_model.TABLE_NAME,) + values[name]
+                if self.cache.get(key) is None:
+                    wanted.setdefault(key[:2], set()).add(key[2])
+
+        for (table_name, column), keys in wanted.items():
+            rows = self.db.execute_query(
+                f"SELECT {column}, id FROM {table_name} WHERE {column} = ANY(%s)",
+                (list(keys),), as_tuples=True
+            )
+            for value, record_id in rows:
+                self.cache.set((table_name, column, value), record_id)
+
+        resolved = []
+        for line_no, values, record in batch:
+            missing = []
+            for name, (ref_model, _) in self.foreign_keys.items():
+                column, value = values[name]
+                record_id = self.cache.get((ref_model.TABLE_NAME, column, value))
+                if record_id is None:
+                    missing.append(f"{name}: не найден {ref_model.TABLE_NAME}.{column} = {value!r}")
+                else:
+                    values[name] = record_id
+            if missing:
+                reject(line_no, record, '; '.join(missing))
+            else:
+                resolved.append((line_no, values, record))
+        return resolved
+
+
+def _unique_conflicts_sql(model, columns: List[_Column], stage: str) -> Optional[str]:
+    """
+    Запрос строк пачки, нарушающих уникальность: значение уже есть в таблице
+    или повторяется в самой пачке (остается первое вхождение)
+    """
+    parts = []
+    for column in columns:
+        if not column.unique:
+            continue
+        parts.append(f"""
+        SELECT s.line_no, '{column.name}: значение уже существует' AS reason
+        FROM {stage} s
+        WHERE EXISTS (SELECT 1 FROM {model.TABLE_NAME} t WHERE t.{column.name} = s.{column.name})
+        UNION ALL
+        SELECT d.line_no, '{column.name}: повтор в файле' AS reason
+        FROM (
+            SELECT line_no,
+                   row_number() OVER (PARTITION BY {column.name} ORDER BY line_no) AS rn
+            FROM {stage}
+            WHERE {column.name} IS NOT NULL
+        ) d
+        WHERE d.rn > 1""")
+    return ' UNION ALL '.join(parts) if parts else None
+
+
+class _BatchLoader:
+    """
+    Загрузка пачек через COPY во временную таблицу и INSERT ... SELECT
+
+    Промежуточная таблица не имеет ограничений, поэтому COPY не падает на
+    конфликтах: строки с нарушением уникальности отбираются запросом и
+    отклоняются, остальные переносятся в целевую таблицу с подстановкой
+    значений по умолчанию вместо NULL. Если пачка все же не загрузилась
+    (например, параллельная вставка того же ключа), она повторяется построчно
+    с точками сохранения, и отклоняются только ошибочные строки.
+    """
+
+    def __init__(self, db: PostgreSQLDriver, model):
+        self.db = db
+        self.model = model
+        self.columns = _import_columns(model)
+        self.names = [column.name for column in self.columns]
+        self.stage = f"import_{model.TABLE_NAME}"
+
+        stage_columns = ', '.join(f"{column.name} {column.sql_type}" for column in self.columns)
+        db.execute_command(
+            f"CREATE TEMP TABLE IF NOT EXISTS {self.stage} "
+            f"(line_no BIGINT, {stage_columns}) ON COMMIT DELETE ROWS"
+        )
+        db.connection.commit()
+
+        self.conflicts_sql = _unique_conflicts_sql(model, self.columns, self.stage)
+        select_list = ', '.join(
+            f"COALESCE({column.name}, {column.default})" if column.default else column.name
+            for column in self.columns
+        )
+        self.insert_sql = f"""
+        INSERT INTO {model.TABLE_NAME} ({', '.join(self.names)})
+        SELECT {select_list}
+        FROM {self.stage}
+        WHERE NOT (line_no = ANY(%s))
+        """
+        self.row_insert_sql = self.insert_sql.replace(
+            "WHERE NOT (line_no = ANY(%s))", "WHERE line_no = %s"
+        )
+
+    def load(self, batch: list, reject: Callable[[int, Any, str], None]) -> int:
+        """Загрузка пачки (line_no, values, record); возвращает число вставленных строк"""
+        if not batch:
+            return 0
+        by_line = {line_no: record for line_no, _, record in batch}
+
+        try:
+            with self.db.transaction():
+                self._copy_to_stage(batch)
+
+                rejected: Dict[int, List[str]] = {}
+                if self.conflicts_sql:
+                    for line_no, reason in self.db.execute_query(self.conflicts_sql, as_tuples=True):
+                        rejected.setdefault(line_no, []).append(reason)
+
+                inserted = self.db.execute_command(self.insert_sql, (list(rejected),))
+        except Exception as e:
+            print(f"Пачка не загружена целиком ({e}), повтор построчно...")
+            return self._load_rows(batch, reject)
+
+        for line_no, reasons in rejected.items():
+            reject(line_no, by_line[line_no], '; '.join(reasons))
+        return inserted
+
+    def _copy_to_stage(self, batch: list):
+        """Загрузка пачки во временную таблицу через COPY"""
+        self.db.copy_from(
+            self.stage, ['line_no'] + self.names,
+            ((line_no,) + tuple(values[name] for name in self.names)
+             for line_no, values, _ in batch)
+        )
+
+    def _load_rows(self, batch: list, reject: Callable[[int, Any, str], None]) -> int:
+        """Построчный перенос пачки с точкой сохранения на каждую строку"""
+        inserted = 0
+        try:
+            with self.db.transaction():
+                self._copy_to_stage(batch)
+                for line_no, _, record in batch:
+                    self.db.execute_command("SAVEPOINT import_row")
+                    try:
+                        inserted += self.db.execute_command(self.row_insert_sql, (line_no,))
+                        self.db.execute_command("RELEASE SAVEPOINT import_row")
+                    except Exception as e:
+                        self.db.execute_command("ROLLBACK TO SAVEPOINT import_row")
+                        reject(line_no, record, str(e).strip().splitlines()[0])
+        except Exception as e:
+            for line_no, _, record in batch:
+                reject(line_no, record, f"пачка не загружена: {e}")
+            return 0
+        return inserted
+
+
+class _RejectWriter:
+    """Запись отклоненных строк в JSONL (файл создается при первой ошибке)"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.count = 0
+        self._file = None
+
+    def __call__(self, line_no: int, record: Any, reason: str):
+        self.count += 1
+        if self.path is None:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'w', encoding='utf-8')
+        self._file.write(json.dumps({'line': line_no, 'reason': reason, 'record': record},
+                                    ensure_ascii=False, default=str) + '\n')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def _print_progress(stats: Dict[str, Any]):
+    """Вывод прогресса импорта"""
+    print(f"{stats['table']}: прочитано {stats['read']}, загружено {stats['loaded']}, "
+          f"отклонено {stats['rejected']} ({stats['rows_per_second']:.0f} строк/с)")
+
+
+def import_file(table_name: str, path: str, batch_size: int = 5000,
+                rejects_path: Optional[str] = '',
+                progress: Optional[Callable[[Dict[str, Any]], None]] = _print_progress) -> Dict[str, Any]:
+    """
+    Потоковый импорт файла в таблицу users, tables или bookings
+
+    Каждая пачка загружается и фиксируется отдельной транзакцией, поэтому
+    прерванный импорт оставляет в базе уже загруженные пачки. Пересечения
+    бронирований не проверяются: импортируется история как есть.
+
+    Для bookings вместо user_id можно указать username или user_email,
+    вместо table_id - table_number.
+
+    Args:
+        table_name: Имя целевой таблицы
+        path: Путь к файлу .csv или .jsonl (можно .gz)
+        batch_size: Количество строк в пачке
+        rejects_path: Файл отклоненных строк (по умолчанию <path>.rejects.jsonl,
+                      None - не записывать)
+        progress: Функция, вызываемая после каждой пачки со статистикой
+
+    Returns:
+        Dict[str, Any]: Статистика импорта (read, loaded, rejected, seconds, rows_per_second)
+    """
+    model = IMPORT_MODELS.get(table_name)
+    if model is None:
+        raise ValueError(f"Неизвестная таблица '{table_name}'. Допустимые: {', '.join(IMPORT_MODELS)}")
+    if rejects_path == '':
+        rejects_path = f"{path}.rejects.jsonl"
+
+    reject = _RejectWriter(rejects_path)
+    stats = {'table': table_name, 'read': 0, 'loaded': 0, 'rejected': 0,
+             'seconds': 0.0, 'rows_per_second': 0.0, 'rejects_path': rejects_path}
+    started = _time.perf_counter()
+
+    def counted(records):
+        for item in records:
+            stats['read'] += 1
+            yield item
+
+    try:
+        with PostgreSQLDriver() as db:
+            resolver = _KeyResolver(db, model)
+            loader = _BatchLoader(db, model)
+            valid = validate_records(counted(read_records(path)), model, reject)
+
+            for batch in _batches(valid, batch_size):
+                batch = resolver.resolve(batch, reject)
+                stats['loaded'] += loader.load(batch, reject)
+                stats['rejected'] = reject.count
+                stats['seconds'] = _time.perf_counter() - started
+                stats['rows_per_second'] = stats['read'] / stats['seconds'] if stats['seconds'] else 0.0
+                if progress:
+                    progress(stats)
+    finally:
+        reject.close()
+        # Новые пользователи и столы должны быть видны в кэшированных списках
+        backend.clear_caches()
+
+    stats['rejected'] = reject.count
+    stats['seconds'] = _time.perf_counter() - started
+    stats['rows_per_second'] = stats['read'] / stats['seconds'] if stats['seconds'] else 0.0
+    if reject.count == 0:
+        stats['rejects_path'] = None
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Импорт пользователей, столов и бронирований")
+    parser.add_argument('table', choices=list(IMPORT_MODELS), help="целевая таблица")
+    parser.add_argument('path', help="файл .csv или .jsonl (можно .gz)")
+    parser.add_argument('--batch-size', type=int, default=5000, help="строк в пачке")
+    parser.add_argument('--rejects', help="файл отклоненных строк (JSONL)")
+    args = parser.parse_args()
+
+    stats = import_file(args.table, args.path, batch_size=args.batch_size,
+                        rejects_path=args.rejects or '')
+    print(f"\n✓ Импорт завершен: загружено {stats['loaded']} из {stats['read']}, "
+          f"отклонено {stats['rejected']} за {stats['seconds']:.1f} c")
+    if stats['rejects_path']:
+        print(f"Отклоненные строки: {stats['rejects_path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load Simulator
+Нагрузочный сценарий "пятничный вечер": много одновременных клиентов
+
+Каждый клиент работает в отдельном процессе и вызывает функции backend
+так же, как GUI администратора: проверяет доступность столов, бронирует
+и отменяет бронирования. Запросы приходят пуассоновским потоком, время
+брони смещено к вечернему пику, а часть столов популярнее остальных -
+так возникает конкуренция за одни и те же слоты.
+
+Работает с базой бенчмарка (BENCH_DB_NAME, по умолчанию booking_bench);
+пустая база заполняется через benchmark.seed().
+
+Запуск:
+    python loadsim.py --clients 32 --duration 20
+    python loadsim.py --clients 64 --rate 20 --date 2025-06-13
+"""
+
+import argparse
+import logging
+import random
+import threading
+import time as _time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, time, timedelta
+from typing import Any, Dict, List, Optional
+
+import benchmark  # задает DB_NAME базы бенчмарка до импорта backend
+import backend
+from models.booking import Booking
+from models.tables import Table
+from postgresql_driver import PostgreSQLDriver
+
+
+# Время начала брони и его относительная частота: пик 19:00-20:30
+_EVENING_SLOTS = [
+    (time(17, 0), 2), (time(17, 30), 3), (time(18, 0), 5), (time(18, 30), 7),
+    (time(19, 0), 10), (time(19, 30), 10), (time(20, 0), 9), (time(20, 30), 6),
+    (time(21, 0), 3), (time(21, 30), 2),
+]
+
+# Размер компании и его относительная частота
+_PARTY_SIZES = [(1, 1), (2, 10), (3, 3), (4, 6), (5, 1), (6, 2), (8, 1)]
+
+# Доли операций клиента
+_OPERATION_MIX = [('check', 0.55), ('book', 0.35), ('cancel', 0.10)]
+
+# Метка бронирований нагрузки (special_requests): по ней они удаляются
+# перед следующим прогоном и не сдвигают дату по умолчанию
+LOADSIM_MARK = 'loadsim'
+
+
+def _quiet_driver():
+    """Отключение INFO-лога драйвера (пишет о каждом подключении)"""
+    driver_logger = logging.getLogger('postgresql_driver')
+    driver_logger.addHandler(logging.NullHandler())
+    driver_logger.setLevel(logging.WARNING)
+
+
+def _book(mode: str, user_id: int, table_id: int, day: date, start: time,
+          guests: int, duration: int) -> Optional[int]:
+    """
+    Бронирование выбранным способом
+
+    naive - is_table_available, затем create_booking (есть гонка
+    между проверкой и вставкой); reserve - backend.reserve_table.
+    """
+    if mode == 'reserve':
+        result = backend.reserve_table(user_id, table_id, day, start, guests,
+                                       status='confirmed', special_requests=LOADSIM_MARK,
+                                       duration=duration)
+        return result['booking_id']
+    if not backend.is_table_available(table_id, day, start, duration):
+        return None
+    return backend.create_booking(user_id, table_id, day, start, guests,
+                                  status='confirmed', special_requests=LOADSIM_MARK,
+                                  duration=duration)
+
+
+def run_client(client_id: int, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Один клиент нагрузки (выполняется в отдельном процессе)
+
+    Returns:
+        Dict[str, Any]: {'latencies': {операция: [секунды]}, 'outcomes': {исход: количество}}
+    """
+    _quiet_driver()
+    rng = random.Random(config['seed'] * 1000 + client_id)
+    day = config['date']
+    tables = config['tables']
+    table_weights = config['table_weights']
+    slots, slot_weights = zip(*_EVENING_SLOTS)
+    sizes, size_weights = zip(*_PARTY_SIZES)
+    operations, operation_weights = zip(*_OPERATION_MIX)
+
+    latencies: Dict[str, List[float]] = {name: [] for name in operations}
+    outcomes: Dict[str, int] = {}
+    own_bookings: List[int] = []
+
+    def outcome(name: str):
+        outcomes[name] = outcomes.get(name, 0) + 1
+
+    # Старт всех клиентов в один момент, чтобы нагрузка была одновременной
+    while _time.time() < config['start_at']:
+        _time.sleep(0.005)
+    deadline = config['start_at'] + config['duration']
+
+    while True:
+        # Пуассоновский поток: экспоненциальные интервалы между запросами
+        _time.sleep(rng.expovariate(config['rate']))
+        if _time.time() >= deadline:
+            break
+
+        operation = rng.choices(operations, operation_weights)[0]
+        if operation == 'cancel' and not own_bookings:
+            operation = 'check'
+
+        guests = rng.choices(sizes, size_weights)[0]
+        fitting = [i for i, table in enumerate(tables) if table['capacity'] >= guests] or range(len(tables))
+        table_id = tables[rng.choices(fitting, [table_weights[i] for i in fitting])[0]]['id']
+        start = rng.choices(slots, slot_weights)[0]
+        duration = rng.choice([90, 120, 120, 150])
+
+        started = _time.perf_counter()
+        if operation == 'check':
+            available = backend.is_table_available(table_id, day, start, duration)
+            outcome('check_free' if available else 'check_busy')
+        elif operation == 'book':
+            booking_id = _book(config['mode'], rng.choice(config['user_ids']), table_id,
+                               day, start, guests, duration)
+            if booking_id:
+                own_bookings.append(booking_id)
+                outcome('booked')
+            else:
+                outcome('rejected')
+        else:
+            booking_id = own_bookings.pop(rng.randrange(len(own_bookings)))
+            outcome('cancelled' if backend.update_booking(booking_id, status='cancelled')
+                    else 'cancel_failed')
+        latencies[operation].append(_time.perf_counter() - started)
+
+    return {'latencies': latencies, 'outcomes': outcomes}
+
+
+class ConnectionSampler(threading.Thread):
+    """Периодический замер числа подключений к базе (pg_stat_activity)"""
+
+    def __init__(self, interval: float = 0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples: List[int] = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        with PostgreSQLDriver() as db:
+            db.connection.autocommit = True
+            while not self._stop_event.is_set():
+                row = db.execute_query(
+                    "SELECT COUNT(*) AS n FROM pg_stat_activity WHERE datname = current_database()"
+                )[0]
+                self.samples.append(row['n'])
+                self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _sessions_opened(db: PostgreSQLDriver) -> Optional[int]:
+    """Счетчик открытых сессий базы (pg_stat_database.sessions, PostgreSQL 14+)"""
+    try:
+        with db.transaction():
+            return db.execute_query(
+                "SELECT sessions FROM pg_stat_database WHERE datname = current_database()"
+            )[0]['sessions']
+    except Exception:
+        return None
+
+
+def count_overlaps(day: date) -> int:
+    """Количество пар пересекающихся активных бронирований одного стола за день"""
+    active = ', '.join(f"'{status}'" for status in Booking.ACTIVE_STATUSES)
+    end_a = "a.booking_date + a.booking_time + make_interval(mins => COALESCE(a.duration, 120))"
+    end_b = "b.booking_date + b.booking_time + make_interval(mins => COALESCE(b.duration, 120))"
+    query = f"""
+    SELECT COUNT(*) AS overlaps
+    FROM {Booking.TABLE_NAME} a
+    JOIN {Booking.TABLE_NAME} b
+      ON b.table_id = a.table_id AND b.booking_date = a.booking_date AND b.id > a.id
+    WHERE a.booking_date = %s
+      AND a.status IN ({active}) AND b.status IN ({active})
+      AND a.booking_date + a.booking_time < {end_b}
+      AND b.booking_date + b.booking_time < {end_a}
+    """
+    with PostgreSQLDriver() as db:
+        return db.execute_query(query, (day,))[0]['overlaps']
+
+
+def _default_date(db: PostgreSQLDriver) -> date:
+    """Первая пятница после заполненного бенчмарком диапазона (без бронирований нагрузки)"""
+    last = db.execute_query(
+        f"SELECT MAX(booking_date) AS last FROM {Booking.TABLE_NAME} "
+        f"WHERE special_requests IS DISTINCT FROM %s",
+        (LOADSIM_MARK,)
+    )[0]['last']
+    day = (last or date.today()) + timedelta(days=1)
+    return day + timedelta(days=(4 - day.weekday()) % 7)
+
+
+def _report(results: List[Dict[str, Any]], wall: float, samples: List[int],
+            sessions: Optional[int], overlaps: int, clients: int):
+    """Вывод итогов нагрузки"""
+    latencies: Dict[str, List[float]] = {}
+    outcomes: Dict[str, int] = {}
+    for result in results:
+        for name, values in result['latencies'].items():
+            latencies.setdefault(name, []).extend(values)
+        for name, count in result['outcomes'].items():
+            outcomes[name] = outcomes.get(name, 0) + count
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"\nКлиентов: {clients}, время: {wall:.1f} c, операций: {total} "
+          f"({total / wall:.1f} оп/с)")
+    print(f"\n{'Операция':<10}{'Кол-во':>8}{'оп/с':>9}{'p50, мс':>10}{'p90, мс':>10}"
+          f"{'p99, мс':>10}{'max, мс':>10}")
+    for name, values in latencies.items():
+        if not values:
+            continue
+        values.sort()
+        p = lambda percent: benchmark._percentile(values, percent) * 1000
+        print(f"{name:<10}{len(values):>8}{len(values) / wall:>9.1f}{p(50):>10.2f}{p(90):>10.2f}"
+              f"{p(99):>10.2f}{values[-1] * 1000:>10.2f}")
+
+    print("\nИсходы: " + ', '.join(f"{name}={count}" for name, count in sorted(outcomes.items())))
+    if samples:
+        print(f"Подключения к базе: пик {max(samples)}, в среднем {sum(samples) / len(samples):.1f}")
+    if sessions is not None:
+        print(f"Открыто сессий: {sessions} ({sessions / wall:.0f}/с)")
+    print(f"Пересекающихся активных бронирований: {overlaps}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный сценарий одновременных бронирований")
+    parser.add_argument('--clients', type=int, default=16, help="одновременных клиентов (процессов)")
+    parser.add_argument('--duration', type=float, default=15.0, help="длительность, c")
+    parser.add_argument('--rate', type=float, default=10.0, help="запросов в секунду на клиента")
+    parser.add_argument('--date', type=date.fromisoformat, help="дата бронирований (YYYY-MM-DD)")
+    parser.add_argument('--mode', choices=['reserve', 'naive'], default='reserve',
+                        help="способ бронирования")
+    parser.add_argument('--hot-tables', type=float, default=0.2,
+                        help="доля популярных столов (в 5 раз чаще остальных)")
+    parser.add_argument('--seed', type=int, default=42, help="seed генератора")
+    parser.add_argument('--keep', action='store_true',
+                        help="не удалять бронирования прошлых прогонов")
+    args = parser.parse_args()
+
+    _quiet_driver()
+    benchmark.ensure_database()
+    with PostgreSQLDriver() as db:
+        if not db.table_exists(Table.TABLE_NAME) or not db.count(Table.TABLE_NAME):
+            benchmark.seed(40, 2000, 0.25, 0.6, random.Random(args.seed))
+        day = args.date or _default_date(db)
+        if not args.keep:
+            deleted = db.execute_command(
+                f"DELETE FROM {Booking.TABLE_NAME} WHERE special_requests = %s", (LOADSIM_MARK,)
+            )
+            if deleted:
+                print(f"Удалено бронирований прошлых прогонов: {deleted}")
+        tables = [dict(row) for row in db.execute_query(
+            f"SELECT id, capacity FROM {Table.TABLE_NAME} WHERE is_active ORDER BY number"
+        )]
+        user_ids = [row[0] for row in db.execute_query(
+            "SELECT id FROM users ORDER BY id LIMIT 5000", as_tuples=True
+        )]
+
+    rng = random.Random(args.seed)
+    hot = set(rng.sample(range(len(tables)), max(1, int(len(tables) * args.hot_tables))))
+    # Запас времени на запуск процессов
+    startup = 1.0 + args.clients * 0.02
+    config = {
+        'date': day,
+        'tables': tables,
+        'table_weights': [5 if i in hot else 1 for i in range(len(tables))],
+        'user_ids': user_ids,
+        'rate': args.rate,
+        'duration': args.duration,
+        'mode': args.mode,
+        'seed': args.seed,
+        'start_at': _time.time() + startup,
+    }
+    started = _time.perf_counter()
+
+    print(f"Нагрузка на {day} ({day.strftime('%A')}): клиентов {args.clients}, "
+          f"{args.rate} запр/с на клиента, {args.duration} c, режим {args.mode}")
+
+    with PostgreSQLDriver() as db:
+        sessions_before = _sessions_opened(db)
+    sampler = ConnectionSampler()
+    sampler.start()
+
+    with ProcessPoolExecutor(max_workers=args.clients) as pool:
+        futures = [pool.submit(run_client, client_id, config) for client_id in range(args.clients)]
+        results = [future.result() for future in futures]
+    # Клиенты заканчивают позже срока на последнюю паузу и операцию
+    wall = _time.perf_counter() - started - startup
+
+    sampler.stop()
+    with PostgreSQLDriver() as db:
+        sessions_after = _sessions_opened(db)
+    sessions = (sessions_after - sessions_before
+                if sessions_before is not None and sessions_after is not None else None)
+
+    _report(results, wall, sampler.samples, sessions, count_overlaps(day), args.clients)
+
+
+if __name__ == "__main__":
+    main()
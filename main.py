@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Headless Job Runner
+Фоновый исполнитель регламентных заданий системы бронирования
+
+Запуск:
+    python main.py                 # выполнять задания по расписанию
+    python main.py --once          # выполнить все задания один раз
+    python main.py --dry-run       # только посчитать, что было бы изменено
+    python main.py --job complete_expired --once
+    python main.py --list          # список заданий
+"""
+
+import argparse
+import logging
+import os
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import audit
+import backend
+import metrics
+
+
+logger = logging.getLogger('booking.jobs')
+
+# Срок, в течение которого мягкое удаление можно отменить (restore_user/restore_table)
+PURGE_GRACE_HOURS = 72
+
+
+class Job:
+    """
+    Регламентное задание
+
+    Функция задания принимает dry_run и возвращает количество обработанных
+    записей (-1 при ошибке, как функции backend).
+    """
+
+    def __init__(self, name: str, func: Callable[..., int], interval: int, description: str):
+        """
+        Инициализация задания
+
+        Args:
+            name: Имя задания
+            func: Функция задания func(dry_run=...) -> int
+            interval: Интервал запуска в секундах
+            description: Описание задания
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.description = description
+
+        # Метрики выполнения
+        self.runs = 0
+        self.failures = 0
+        self.total_affected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds: Optional[float] = None
+        self.last_result: Optional[int] = None
+        self.last_run_at: Optional[float] = None
+        self.next_run_at = 0.0
+
+    def run(self, dry_run: bool = False) -> int:
+        """Выполнение задания с учетом метрик"""
+        started = time.perf_counter()
+        try:
+            with audit.acting_as(f"job:{self.name}"):
+                result = self.func(dry_run=dry_run)
+        except Exception as e:
+            logger.exception(f"Задание {self.name} завершилось с исключением: {e}")
+            result = -1
+        elapsed = time.perf_counter() - started
+
+        self.runs += 1
+        self.last_seconds = elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        self.total_seconds += elapsed
+        self.last_result = result
+        self.last_run_at = time.time()
+        self.next_run_at = time.monotonic() + self.interval
+        if result < 0:
+            self.failures += 1
+        elif not dry_run:
+            self.total_affected += result
+
+        mode = " (dry-run)" if dry_run else ""
+        logger.info(f"{self.name}{mode}: результат={result}, время={elapsed:.3f} c")
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        """Метрики выполнения задания"""
+        return {
+            'job': self.name,
+            'runs': self.runs,
+            'failures': self.failures,
+            'affected': self.total_affected,
+            'last_result': self.last_result,
+            'last_seconds': round(self.last_seconds, 4) if self.last_seconds is not None else None,
+            'avg_seconds': round(self.total_seconds / self.runs, 4) if self.runs else None,
+            'max_seconds': round(self.max_seconds, 4)
+        }
+
+
+def export_previous_day(dry_run: bool = False) -> int:
+    """
+    Ночная выгрузка бронирований за вчерашний день в EXPORT_DIR
+
+    Файл bookings_YYYY-MM-DD.csv.gz перезаписывается при повторном запуске.
+    В режиме dry_run выгрузка не создается.
+    """
+    day = date.today() - timedelta(days=1)
+    if dry_run:
+        return 0
+    export_dir = os.getenv('EXPORT_DIR', 'exports')
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, f"bookings_{day.isoformat()}.csv.gz")
+    return backend.export_bookings(path, start_date=day, end_date=day)
+
+
+def build_jobs() -> List[Job]:
+    """Список регламентных заданий"""
+    return [
+        Job('complete_expired', backend.complete_expired_bookings, 5 * 60,
+            "Перевод закончившихся бронирований в 'completed'"),
+        Job('cancel_stale_pending',
+            lambda dry_run: backend.cancel_stale_pending_bookings(max_age_hours=24, dry_run=dry_run),
+            15 * 60,
+            "Отмена бронирований, не подтвержденных за 24 часа"),
+        Job('archive', backend.archive_bookings, 24 * 60 * 60,
+            "Перенос старых завершенных и отмененных бронирований в архив"),
+        Job('maintain_partitions', backend.maintain_booking_partitions, 24 * 60 * 60,
+            "Создание месячных секций bookings на будущее"),
+        Job('export_previous_day', export_previous_day, 24 * 60 * 60,
+            "Выгрузка бронирований за вчера в EXPORT_DIR (CSV.gz)"),
+        Job('purge_deleted',
+            lambda dry_run: backend.purge_deleted(older_than_hours=PURGE_GRACE_HOURS,
+                                                  dry_run=dry_run),
+            60 * 60,
+            f"Удаление пользователей и столов, мягко удаленных более {PURGE_GRACE_HOURS} ч назад, "
+            "с бронированиями (пакетами)")
+    ]
+
+
+def run_once(jobs: List[Job], dry_run: bool = False):
+    """Однократное выполнение всех заданий"""
+    for job in jobs:
+        job.run(dry_run)
+
+
+def run_forever(jobs: List[Job], dry_run: bool = False, tick: float = 1.0):
+    """
+    Выполнение заданий по расписанию до прерывания (Ctrl+C)
+
+    Args:
+        jobs: Задания
+        dry_run: Режим без изменений
+        tick: Период проверки расписания в секундах
+    """
+    logger.info(f"Запуск исполнителя заданий: {', '.join(job.name for job in jobs)}")
+    while True:
+        now = time.monotonic()
+        for job in jobs:
+            if now >= job.next_run_at:
+                job.run(dry_run)
+        next_due = min(job.next_run_at for job in jobs)
+        time.sleep(max(0.0, min(tick, next_due - time.monotonic())))
+
+
+def print_metrics(jobs: List[Job]):
+    """Вывод сводки метрик заданий"""
+    print(f"\n{'Задание':<22}{'Запусков':>9}{'Ошибок':>8}{'Записей':>10}"
+          f"{'Посл., c':>10}{'Сред., c':>10}{'Макс., c':>10}")
+    for job in jobs:
+        m = job.metrics()
+        last = f"{m['last_seconds']:.3f}" if m['last_seconds'] is not None else '-'
+        avg = f"{m['avg_seconds']:.3f}" if m['avg_seconds'] is not None else '-'
+        print(f"{m['job']:<22}{m['runs']:>9}{m['failures']:>8}{m['affected']:>10}"
+              f"{last:>10}{avg:>10}{m['max_seconds']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Исполнитель регламентных заданий бронирования")
+    parser.add_argument('--once', action='store_true', help="выполнить задания один раз и выйти")
+    parser.add_argument('--dry-run', action='store_true', help="ничего не менять, только посчитать")
+    parser.add_argument('--job', action='append', help="выполнять только указанное задание")
+    parser.add_argument('--list', action='store_true', help="показать список заданий")
+    parser.add_argument('--verbose', action='store_true', help="подробный лог драйвера БД")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not args.verbose:
+        # Драйвер пишет в лог каждое подключение; в фоновом режиме это шум
+        driver_logger = logging.getLogger('postgresql_driver')
+        driver_logger.addHandler(logging.NullHandler())
+        driver_logger.setLevel(logging.WARNING)
+
+    jobs = build_jobs()
+    if args.list:
+        for job in jobs:
+            print(f"{job.name:<22} каждые {job.interval} c  {job.description}")
+        return
+
+    if args.job:
+        unknown = set(args.job) - {job.name for job in jobs}
+        if unknown:
+            parser.error(f"неизвестные задания: {', '.join(sorted(unknown))}")
+        jobs = [job for job in jobs if job.name in args.job]
+
+    try:
+        if args.once:
+            run_once(jobs, args.dry_run)
+        else:
+            run_forever(jobs, args.dry_run)
+    except KeyboardInterrupt:
+        logger.info("Остановка исполнителя заданий")
+    finally:
+        print_metrics(jobs)
+        print()
+        print(metrics.registry.summary())
+
+
+if __name__ == "__main__":
+    main()
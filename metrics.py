@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Metrics Module
+Метрики операций backend: вызовы, гистограмма задержек, ошибки, строки
+результата, подключения и запросы к БД
+
+Все публичные функции backend оборачиваются instrument() при импорте
+модуля (BOOKING_METRICS=0 - без оберток). Подключения, запросы и ошибки БД
+считает драйвер в текущем потоке (thread_counters), обертка берет их
+разность до и после вызова. Поэтому вложенная операция учитывается и сама
+по себе, и в вызвавшей ее операции, а ошибкой считается как исключение из
+функции, так и ошибка БД внутри нее - функции backend перехватывают
+исключения и возвращают None/False/-1.
+
+Доступ к метрикам:
+    metrics.registry.snapshot()         словарь (для JSON)
+    metrics.registry.to_prometheus()    текстовый формат Prometheus
+    metrics.registry.summary()          таблица для консоли
+    GET /metrics/backend, GET /metrics/prometheus в api_server.py
+    BOOKING_METRICS_DUMP=metrics.json   сохранить снимок при выходе из процесса
+
+Запуск:
+    python metrics.py metrics.json                # сводка из снимка
+    python metrics.py http://127.0.0.1:8080       # сводка с работающего API-сервера
+    python metrics.py metrics.json --prometheus   # снимок в формате Prometheus
+"""
+
+import argparse
+import atexit
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from postgresql_driver import thread_counters
+
+
+# Границы корзин гистограммы задержек, секунды (последняя корзина - +Inf)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_PREFIX = 'booking_backend'
+
+SORT_KEYS = {
+    'total': lambda op: op['total_seconds'],
+    'calls': lambda op: op['calls'],
+    'avg': lambda op: op['total_seconds'] / op['calls'] if op['calls'] else 0.0,
+    'p99': lambda op: op['p99_ms'],
+    'errors': lambda op: op['errors'],
+    'connections': lambda op: op['connections'],
+}
+
+
+class OperationStats:
+    """Накопленные метрики одной операции"""
+
+    __slots__ = ('calls', 'errors', 'total_seconds', 'max_seconds', 'rows',
+                 'connections', 'queries', 'buckets')
+
+    def __init__(self, bucket_count: int):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.connections = 0
+        self.queries = 0
+        self.buckets = [0] * bucket_count
+
+
+class MetricsRegistry:
+    """Потокобезопасный реестр метрик операций"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        Args:
+            buckets: Верхние границы корзин гистограммы задержек, секунды
+        """
+        self.bounds = tuple(buckets)
+        self._operations: Dict[str, OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, error: bool = False, rows: int = 0,
+                connections: int = 0, queries: int = 0):
+        """Учет одного вызова операции"""
+        index = len(self.bounds)
+        for position, bound in enumerate(self.bounds):
+            if seconds <= bound:
+                index = position
+                break
+
+        with self._lock:
+            stats = self._operations.get(name)
+            if stats is None:
+                stats = self._operations[name] = OperationStats(len(self.bounds) + 1)
+            stats.calls += 1
+            stats.errors += error
+            stats.total_seconds += seconds
+            if seconds > stats.max_seconds:
+                stats.max_seconds = seconds
+            stats.rows += rows
+            stats.connections += connections
+            stats.queries += queries
+            stats.buckets[index] += 1
+
+    def reset(self):
+        """Сброс всех метрик"""
+        with self._lock:
+            self._operations.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Снимок метрик
+
+        Returns:
+            Dict[str, Any]: {'buckets': границы корзин,
+                             'operations': {операция: {calls, errors, total_seconds,
+                                                       max_seconds, rows, connections,
+                                                       queries, buckets}}}
+        """
+        with self._lock:
+            operations = {
+                name: {
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'total_seconds': stats.total_seconds,
+                    'max_seconds': stats.max_seconds,
+                    'rows': stats.rows,
+                    'connections': stats.connections,
+                    'queries': stats.queries,
+                    'buckets': list(stats.buckets)
+                }
+                for name, stats in self._operations.items()
+            }
+        return {'buckets': list(self.bounds), 'operations': operations}
+
+    def save(self, path: str):
+        """Сохранение снимка в JSON"""
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file, ensure_ascii=False, indent=1)
+
+    def to_prometheus(self) -> str:
+        """Снимок в текстовом формате Prometheus"""
+        return format_prometheus(self.snapshot())
+
+    def summary(self, sort: str = 'total', top: Optional[int] = None) -> str:
+        """Таблица операций для консоли"""
+        return format_summary(self.snapshot(), sort, top)
+
+
+registry = MetricsRegistry()
+
+
+# ==================== ОБЕРТКИ ====================
+
+def _count_rows(result: Any) -> int:
+    """Строк в результате: длина списка, 1 для записи, 0 для None/bool/чисел"""
+    if result is None or isinstance(result, (bool, int, float, str, bytes)):
+        return 0
+    if isinstance(result, (list, tuple, set)):
+        return len(result)
+    return 1
+
+
+def instrument(func: Callable, name: Optional[str] = None,
+               target: Optional[MetricsRegistry] = None) -> Callable:
+    """
+    Обертка функции с учетом вызова в реестре
+
+    Для функций-генераторов время, строки и счетчики БД учитываются до
+    исчерпания (или закрытия) генератора.
+
+    Args:
+        func: Функция
+        name: Имя операции (по умолчанию - имя функции)
+        target: Реестр (по умолчанию - общий registry)
+    """
+    name = name or func.__name__
+    target = target or registry
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            connections, queries, errors = thread_counters.snapshot()
+            started = time.perf_counter()
+            rows = 0
+            failed = False
+            generator = func(*args, **kwargs)
+            try:
+                for item in generator:
+                    rows += 1
+                    yield item
+            except GeneratorExit:
+                raise
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                generator.close()
+                after = thread_counters.snapshot()
+                target.observe(name, time.perf_counter() - started,
+                               failed or after[2] > errors, rows,
+                               after[0] - connections, after[1] - queries)
+
+        generator_wrapper.__instrumented__ = True
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        connections, queries, errors = thread_counters.snapshot()
+        started = time.perf_counter()
+        result = None
+        failed = False
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            after = thread_counters.snapshot()
+            target.observe(name, time.perf_counter() - started,
+                           failed or after[2] > errors, _count_rows(result),
+                           after[0] - connections, after[1] - queries)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def enabled() -> bool:
+    """Включены ли метрики операций (BOOKING_METRICS, по умолчанию - да)"""
+    return os.getenv('BOOKING_METRICS', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def instrument_module(namespace: Dict[str, Any]) -> List[str]:
+    """
+    Обертка всех публичных функций, определенных в модуле
+
+    Вызывается в конце модуля: instrument_module(globals()). Внутренние
+    вызовы модуля идут через глобальные имена и тоже учитываются.
+
+    Returns:
+        List[str]: Имена обернутых функций
+    """
+    if not enabled():
+        return []
+    module_name = namespace.get('__name__')
+    wrapped = []
+    for name, value in list(namespace.items()):
+        if (name.startswith('_') or not inspect.isfunction(value)
+                or value.__module__ != module_name
+                or getattr(value, '__instrumented__', False)):
+            continue
+        namespace[name] = instrument(value, name)
+        wrapped.append(name)
+    return wrapped
+
+
+# ==================== ФОРМАТЫ ВЫВОДА ====================
+
+def _percentile(operation: Dict[str, Any], bounds: Sequence[float], q: float) -> float:
+    """
+    Оценка перцентиля задержки по гистограмме, секунды
+
+    Внутри корзины значения считаются равномерно распределенными; верхняя
+    граница последней (+Inf) корзины - максимальная задержка.
+    """
+    calls = operation['calls']
+    if not calls:
+        return 0.0
+    rank = q * calls
+    cumulative = 0
+    lower = 0.0
+    for index, count in enumerate(operation['buckets']):
+        upper = bounds[index] if index < len(bounds) else operation['max_seconds']
+        upper = min(upper, operation['max_seconds'])
+        if count and cumulative + count >= rank:
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = upper
+    return operation['max_seconds']
+
+
+def _with_percentiles(snapshot: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Операции снимка с оценками p50/p95/p99 в миллисекундах"""
+    bounds = snapshot['buckets']
+    rows = []
+    for name, operation in snapshot['operations'].items():
+        row = dict(operation, name=name)
+        for label, q in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+            row[label] = _percentile(operation, bounds, q) * 1000
+        rows.append(row)
+    return rows
+
+
+def format_summary(snapshot: Dict[str, Any], sort: str = 'total',
+                   top: Optional[int] = None) -> str:
+    """
+    Таблица операций: вызовы, ошибки, задержки (ср., p50/p95/p99, макс., мс),
+    строк, подключений и запросов на вызов
+
+    Args:
+        snapshot: Снимок MetricsRegistry.snapshot()
+        sort: Сортировка ('total', 'calls', 'avg', 'p99', 'errors', 'connections')
+        top: Показать только первые top операций
+    """
+    rows = sorted(_with_percentiles(snapshot), key=SORT_KEYS[sort], reverse=True)
+    if top:
+        rows = rows[:top]
+    if not rows:
+        return "Вызовов операций backend не было"
+
+    lines = [f"{'Операция':<34}{'Вызовов':>9}{'Ошибок':>8}{'Всего, c':>10}{'Сред.':>9}"
+             f"{'p50':>9}{'p95':>9}{'p99':>9}{'Макс.':>9}{'Строк':>9}{'Подкл.':>8}{'Запр.':>8}"]
+    for row in rows:
+        calls = row['calls'] or 1
+        lines.append(
+            f"{row['name'][:33]:<34}{row['calls']:>9}{row['errors']:>8}"
+            f"{row['total_seconds']:>10.3f}{row['total_seconds'] * 1000 / calls:>9.2f}"
+            f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+            f"{row['max_seconds'] * 1000:>9.2f}{row['rows'] / calls:>9.1f}"
+            f"{row['connections'] / calls:>8.2f}{row['queries'] / calls:>8.1f}"
+        )
+    lines.append("Задержки в мс; строк, подключений и запросов - в среднем на вызов")
+    return '\n'.join(lines)
+
+
+def _label(value: str) -> str:
+    """Экранирование значения метки Prometheus"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_prometheus(snapshot: Dict[str, Any], prefix: str = PROMETHEUS_PREFIX) -> str:
+    """Снимок в текстовом формате Prometheus (version 0.0.4)"""
+    bounds = snapshot['buckets']
+    operations = sorted(snapshot['operations'].items())
+    lines = []
+
+    counters = [
+        ('calls_total', 'calls', "Вызовы операций backend"),
+        ('errors_total', 'errors', "Вызовы с исключением или ошибкой БД"),
+        ('rows_total', 'rows', "Строк в результатах операций"),
+        ('connections_total', 'connections', "Подключения к БД, открытые операциями"),
+        ('queries_total', 'queries', "Команды SQL, выполненные операциями"),
+    ]
+    for metric, key, help_text in counters:
+        lines.append(f"# HELP {prefix}_{metric} {help_text}")
+        lines.append(f"# TYPE {prefix}_{metric} counter")
+        for name, operation in operations:
+            lines.append(f'{prefix}_{metric}{{operation="{_label(name)}"}} {operation[key]}')
+
+    metric = f"{prefix}_duration_seconds"
+    lines.append(f"# HELP {metric} Длительность операций backend")
+    lines.append(f"# TYPE {metric} histogram")
+    for name, operation in operations:
+        label = _label(name)
+        cumulative = 0
+        for index, count in enumerate(operation['buckets']):
+            cumulative += count
+            le = repr(float(bounds[index])) if index < len(bounds) else '+Inf'
+            lines.append(f'{metric}_bucket{{operation="{label}",le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{operation="{label}"}} {operation["total_seconds"]:.6f}')
+        lines.append(f'{metric}_count{{operation="{label}"}} {operation["calls"]}')
+    return '\n'.join(lines) + '\n'
+
+
+# ==================== СНИМОК ПРИ ВЫХОДЕ ====================
+
+def _save_on_exit(path: str):
+    """Сохранение снимка при выходе, если операции вызывались"""
+    try:
+        if registry.snapshot()['operations']:
+            registry.save(path)
+    except OSError as e:
+        print(f"Не удалось сохранить метрики в {path}: {e}")
+
+
+if os.getenv('BOOKING_METRICS_DUMP'):
+    atexit.register(_save_on_exit, os.getenv('BOOKING_METRICS_DUMP'))
+
+
+def load_snapshot(source: str) -> Dict[str, Any]:
+    """Снимок из файла JSON или с API-сервера (http://host:port)"""
+    if source.startswith(('http://', 'https://')):
+        url = source.rstrip('/') + '/metrics/backend'
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return json.loads(response.read().decode('utf-8'))
+    with open(source, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def main():
+    """Сводка или вывод в формате Prometheus по снимку метрик"""
+    parser = argparse.ArgumentParser(description="Метрики операций backend")
+    parser.add_argument('source', help="файл снимка (BOOKING_METRICS_DUMP) или адрес API-сервера")
+    parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='total',
+                        help="сортировка сводки")
+    parser.add_argument('--top', type=int, help="показать только первые N операций")
+    parser.add_argument('--prometheus', action='store_true',
+                        help="вывести в текстовом формате Prometheus")
+    args = parser.parse_args()
+
+    snapshot = load_snapshot(args.source)
+    if args.prometheus:
+        print(format_prometheus(snapshot), end='')
+    else:
+        print(format_summary(snapshot, args.sort, args.top))
+
+
+if __name__ == '__main__':
+    main()
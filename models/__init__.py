@@ -5,9 +5,14 @@ Models Package
 Пакет с моделями для системы бронирования
 """
 
+from models.base import BaseModel
 from models.user import User
 from models.tables import Table
 from models.booking import Booking
+from models.booking_series import BookingSeries
+from models.booking_summary import BookingDailySummary
+from models.booking_audit import BookingAudit
 
-__all__ = ['User', 'Table', 'Booking']
+__all__ = ['BaseModel', 'User', 'Table', 'Booking', 'BookingSeries',
+           'BookingDailySummary', 'BookingAudit']
 
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Base Model
+Базовый класс компактных моделей (__slots__) с быстрым созданием из строк БД
+"""
+
+from itertools import starmap
+from typing import Any, Dict, Iterable, List, Sequence
+
+
+class BaseModel:
+    """
+    Базовая модель на __slots__
+
+    Наследники задают TABLE_NAME, COLUMNS, FIELDS = tuple(COLUMNS) и
+    __slots__ = FIELDS, а параметры __init__ перечисляют поля в порядке FIELDS.
+    Благодаря этому строку-кортеж из БД (SELECT <FIELDS>) можно передать
+    в конструктор позиционно, без обращения к ключам.
+    """
+
+    __slots__ = ()
+
+    TABLE_NAME = ''
+    COLUMNS: Dict[str, str] = {}
+    FIELDS: tuple = ()
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any]):
+        """
+        Создание объекта из кортежа в порядке FIELDS
+
+        Args:
+            row: Строка результата запроса SELECT <FIELDS>
+        """
+        return cls(*row)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[Any]]) -> List[Any]:
+        """
+        Массовое создание объектов из кортежей в порядке FIELDS
+
+        Args:
+            rows: Строки результата запроса SELECT <FIELDS>
+        """
+        return list(starmap(cls, rows))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        """
+        Создание объекта из словаря (например, строки RealDictCursor)
+
+        Лишние ключи игнорируются, для отсутствующих берутся значения по умолчанию.
+        """
+        return cls(**{field: data[field] for field in cls.FIELDS if field in data})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразование объекта в словарь {поле: значение}"""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __eq__(self, other) -> bool:
+        """Сравнение объектов по значениям полей"""
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.FIELDS)
+
+    __hash__ = None
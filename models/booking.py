@@ -8,8 +8,10 @@ Booking Model
 from typing import Optional
 from datetime import datetime
 
+from models.base import BaseModel
 
-class Booking:
+
+class Booking(BaseModel):
     """
     Модель бронирования стола в ресторане
     
@@ -27,6 +29,7 @@ class Booking:
         duration: Длительность бронирования в минутах
         created_at: Дата создания бронирования
         updated_at: Дата последнего обновления
+        series_id: ID серии повторяющихся бронирований (None - разовое)
     """
     
     # Определение схемы таблицы для базы данных
@@ -45,11 +48,57 @@ class Booking:
         'special_requests': 'TEXT',
         'duration': 'INTEGER DEFAULT 120',
         'created_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
-        'updated_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
+        'updated_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
+        'series_id': 'INTEGER REFERENCES booking_series(id) ON DELETE SET NULL'
+    }
+    
+    # Порядок полей совпадает с порядком параметров __init__
+    FIELDS = tuple(COLUMNS)
+    __slots__ = FIELDS
+    
+    # Схема для декларативного секционирования по месяцам booking_date.
+    # Первичный ключ секционированной таблицы обязан включать ключ секционирования
+    PARTITION_BY = 'RANGE (booking_date)'
+    PARTITIONED_COLUMNS = dict(COLUMNS, id='SERIAL')
+    PARTITIONED_CONSTRAINTS = ['PRIMARY KEY (id, booking_date)']
+    
+    # Архив завершенных и отмененных бронирований: те же колонки,
+    # id сохраняется из bookings, плюс время переноса в архив
+    ARCHIVE_TABLE_NAME = 'bookings_archive'
+    ARCHIVE_COLUMNS = dict(COLUMNS, id='INTEGER PRIMARY KEY',
+                           archived_at='TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
+    ARCHIVE_INDEXES = {
+        'idx_bookings_archive_date_time': '(booking_date, booking_time)',
+        'idx_bookings_archive_table_date': '(table_id, booking_date)',
+        'idx_bookings_archive_user_id': '(user_id)',
+    }
+    
+    # Индексы таблицы: {имя_индекса: определение после "ON bookings"}
+    INDEXES = {
+        # Проверка доступности и выборка бронирований стола на дату
+        'idx_bookings_table_date': '(table_id, booking_date, booking_time)',
+        # Бронирования пользователя
+        'idx_bookings_user_id': '(user_id)',
+        # Фильтрация по статусу
+        'idx_bookings_status': '(status)',
+        # Списки по датам (сортировка booking_date, booking_time)
+        'idx_bookings_date_time': '(booking_date, booking_time)',
+        # Только активные бронирования - основа проверки пересечений
+        'idx_bookings_active_table_date': (
+            "(table_id, booking_date) WHERE status IN ('pending', 'confirmed')"
+        ),
+        # Вхождения серии повторяющихся бронирований
+        'idx_bookings_series_id': '(series_id, booking_date) WHERE series_id IS NOT NULL',
     }
     
     VALID_STATUSES = ['pending', 'confirmed', 'cancelled', 'completed']
     
+    # Статусы, при которых бронирование занимает стол
+    ACTIVE_STATUSES = ['pending', 'confirmed']
+    
+    # Конечные статусы - такие бронирования переносятся в архив
+    TERMINAL_STATUSES = ['completed', 'cancelled']
+    
     def __init__(self,
                  id: Optional[int] = None,
                  user_id: int = 0,
@@ -63,7 +112,8 @@ class Booking:
                  special_requests: Optional[str] = None,
                  duration: int = 120,
                  created_at: Optional[datetime] = None,
-                 updated_at: Optional[datetime] = None):
+                 updated_at: Optional[datetime] = None,
+                 series_id: Optional[int] = None):
         """Инициализация модели бронирования"""
         self.id = id
         self.user_id = user_id
@@ -78,6 +128,7 @@ class Booking:
         self.duration = duration
         self.created_at = created_at
         self.updated_at = updated_at
+        self.series_id = series_id
     
     def __str__(self) -> str:
         """Строковое представление объекта"""
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Booking Audit Model
+Модель журнала изменений бронирований
+"""
+
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+from models.base import BaseModel
+
+
+class BookingAudit(BaseModel):
+    """
+    Запись журнала изменений бронирования
+
+    Записи пишутся асинхронно (audit.py) пачками через COPY, поэтому
+    changed_at - момент изменения, а не момент записи в журнал.
+
+    Атрибуты:
+        id: Уникальный идентификатор записи
+        booking_id: ID бронирования
+        action: Действие ('create', 'update', 'delete')
+        actor: Кто изменил (пользователь ОС, API-клиент, задание)
+        changed_at: Момент изменения
+        old_values: Значения до изменения (только измененные поля)
+        new_values: Значения после изменения (только измененные поля)
+    """
+
+    # Определение схемы таблицы для базы данных
+    TABLE_NAME = 'booking_audit'
+
+    # booking_id без внешнего ключа: история удаленного бронирования сохраняется
+    COLUMNS = {
+        'id': 'BIGSERIAL PRIMARY KEY',
+        'booking_id': 'INTEGER NOT NULL',
+        'action': 'VARCHAR(10) NOT NULL',
+        'actor': 'VARCHAR(100)',
+        'changed_at': 'TIMESTAMP NOT NULL',
+        'old_values': 'JSONB',
+        'new_values': 'JSONB'
+    }
+
+    # Порядок полей совпадает с порядком параметров __init__
+    FIELDS = tuple(COLUMNS)
+    __slots__ = FIELDS
+
+    INDEXES = {
+        'idx_booking_audit_booking_id': '(booking_id, changed_at)',
+        'idx_booking_audit_changed_at': '(changed_at)',
+    }
+
+    VALID_ACTIONS = ['create', 'update', 'delete']
+
+    def __init__(self,
+                 id: Optional[int] = None,
+                 booking_id: int = 0,
+                 action: str = 'update',
+                 actor: Optional[str] = None,
+                 changed_at: Optional[datetime] = None,
+                 old_values: Optional[Dict[str, Any]] = None,
+                 new_values: Optional[Dict[str, Any]] = None):
+        """Инициализация модели записи журнала"""
+        self.id = id
+        self.booking_id = booking_id
+        self.action = action
+        self.actor = actor
+        self.changed_at = changed_at
+        self.old_values = old_values
+        self.new_values = new_values
+
+    def __str__(self) -> str:
+        """Строковое представление объекта"""
+        return (f"BookingAudit(id={self.id}, booking_id={self.booking_id}, "
+                f"action='{self.action}', actor='{self.actor}')")
+
+    def __repr__(self) -> str:
+        """Представление объекта для отладки"""
+        return self.__str__()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Booking Series Model
+Модель серии повторяющихся бронирований
+"""
+
+from typing import Optional
+from datetime import date, datetime, time
+
+from models.base import BaseModel
+
+
+class BookingSeries(BaseModel):
+    """
+    Серия повторяющихся бронирований одного стола (правило в духе RRULE)
+
+    Сама серия хранит только правило повторения и общие параметры брони,
+    вхождения - обычные записи bookings со ссылкой series_id.
+
+    Атрибуты:
+        id: Уникальный идентификатор серии
+        user_id: ID пользователя (внешний ключ на users.id)
+        table_id: ID стола (внешний ключ на tables.id)
+        frequency: Частота повторения ('weekly', 'monthly')
+        repeat_interval: Шаг повторения (каждую 1, 2, ... неделю/месяц)
+        weekdays: Дни недели для 'weekly' через запятую ('MO,TH'),
+                  пусто - день недели start_date
+        start_date: Дата начала серии
+        until_date: Дата окончания серии (включительно)
+        occurrences: Количество вхождений (вместо или вместе с until_date)
+        booking_time: Время бронирования
+        duration: Длительность бронирования в минутах
+        guests_count: Количество гостей
+        contact_phone: Контактный телефон
+        contact_name: Имя для контакта
+        special_requests: Особые пожелания
+        is_active: Серия действует (False - отменена)
+        created_at: Дата создания серии
+        updated_at: Дата последнего обновления
+    """
+
+    # Определение схемы таблицы для базы данных
+    TABLE_NAME = 'booking_series'
+
+    COLUMNS = {
+        'id': 'SERIAL PRIMARY KEY',
+        'user_id': 'INTEGER REFERENCES users(id) ON DELETE CASCADE',
+        'table_id': 'INTEGER REFERENCES tables(id) ON DELETE CASCADE',
+        'frequency': 'VARCHAR(10) NOT NULL',
+        'repeat_interval': 'INTEGER NOT NULL DEFAULT 1',
+        'weekdays': 'VARCHAR(20)',
+        'start_date': 'DATE NOT NULL',
+        'until_date': 'DATE',
+        'occurrences': 'INTEGER',
+        'booking_time': 'TIME NOT NULL',
+        'duration': 'INTEGER DEFAULT 120',
+        'guests_count': 'INTEGER NOT NULL',
+        'contact_phone': 'VARCHAR(20)',
+        'contact_name': 'VARCHAR(100)',
+        'special_requests': 'TEXT',
+        'is_active': 'BOOLEAN DEFAULT TRUE',
+        'created_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
+        'updated_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
+    }
+
+    # Порядок полей совпадает с порядком параметров __init__
+    FIELDS = tuple(COLUMNS)
+    __slots__ = FIELDS
+
+    INDEXES = {
+        'idx_booking_series_user_id': '(user_id)',
+        'idx_booking_series_table_id': '(table_id)',
+    }
+
+    VALID_FREQUENCIES = ['weekly', 'monthly']
+
+    # Коды дней недели RRULE в порядке date.weekday()
+    WEEKDAY_CODES = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+    # Ограничение числа вхождений, создаваемых за один раз
+    MAX_OCCURRENCES = 366
+
+    def __init__(self,
+                 id: Optional[int] = None,
+                 user_id: int = 0,
+                 table_id: int = 0,
+                 frequency: str = 'weekly',
+                 repeat_interval: int = 1,
+                 weekdays: Optional[str] = None,
+                 start_date: Optional[date] = None,
+                 until_date: Optional[date] = None,
+                 occurrences: Optional[int] = None,
+                 booking_time: Optional[time] = None,
+                 duration: int = 120,
+                 guests_count: int = 1,
+                 contact_phone: Optional[str] = None,
+                 contact_name: Optional[str] = None,
+                 special_requests: Optional[str] = None,
+                 is_active: bool = True,
+                 created_at: Optional[datetime] = None,
+                 updated_at: Optional[datetime] = None):
+        """Инициализация модели серии бронирований"""
+        self.id = id
+        self.user_id = user_id
+        self.table_id = table_id
+        self.frequency = frequency
+        self.repeat_interval = repeat_interval
+        self.weekdays = weekdays
+        self.start_date = start_date
+        self.until_date = until_date
+        self.occurrences = occurrences
+        self.booking_time = booking_time
+        self.duration = duration
+        self.guests_count = guests_count
+        self.contact_phone = contact_phone
+        self.contact_name = contact_name
+        self.special_requests = special_requests
+        self.is_active = is_active
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    def __str__(self) -> str:
+        """Строковое представление объекта"""
+        return (f"BookingSeries(id={self.id}, table_id={self.table_id}, "
+                f"frequency='{self.frequency}', start_date={self.start_date})")
+
+    def __repr__(self) -> str:
+        """Представление объекта для отладки"""
+        return self.__str__()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Booking Daily Summary Model
+Модель дневной сводки загрузки столов
+"""
+
+from typing import Optional
+from datetime import date
+
+from models.base import BaseModel
+
+
+class BookingDailySummary(BaseModel):
+    """
+    Дневная сводка бронирований по столу
+
+    Поддерживается инкрементально триггерами на таблице bookings,
+    поэтому чтение сводки за день - поиск по первичному ключу.
+
+    Атрибуты:
+        summary_date: Дата
+        table_id: ID стола
+        bookings_count: Количество бронирований (все статусы)
+        booked_minutes: Забронированные минуты (без отмененных)
+        covers: Количество гостей (без отмененных)
+        pending_count: Бронирований в статусе 'pending'
+        confirmed_count: Бронирований в статусе 'confirmed'
+        cancelled_count: Бронирований в статусе 'cancelled'
+        completed_count: Бронирований в статусе 'completed'
+    """
+
+    # Определение схемы таблицы для базы данных
+    TABLE_NAME = 'booking_daily_summary'
+
+    # table_id без внешнего ключа: при каскадном удалении стола триггер
+    # еще пишет в сводку отрицательные дельты по удаляемым бронированиям
+    COLUMNS = {
+        'summary_date': 'DATE NOT NULL',
+        'table_id': 'INTEGER NOT NULL',
+        'bookings_count': 'INTEGER NOT NULL DEFAULT 0',
+        'booked_minutes': 'BIGINT NOT NULL DEFAULT 0',
+        'covers': 'INTEGER NOT NULL DEFAULT 0',
+        'pending_count': 'INTEGER NOT NULL DEFAULT 0',
+        'confirmed_count': 'INTEGER NOT NULL DEFAULT 0',
+        'cancelled_count': 'INTEGER NOT NULL DEFAULT 0',
+        'completed_count': 'INTEGER NOT NULL DEFAULT 0'
+    }
+
+    # Порядок полей совпадает с порядком параметров __init__
+    FIELDS = tuple(COLUMNS)
+    __slots__ = FIELDS
+
+    CONSTRAINTS = ['PRIMARY KEY (summary_date, table_id)']
+
+    def __init__(self,
+                 summary_date: Optional[date] = None,
+                 table_id: int = 0,
+                 bookings_count: int = 0,
+                 booked_minutes: int = 0,
+                 covers: int = 0,
+                 pending_count: int = 0,
+                 confirmed_count: int = 0,
+                 cancelled_count: int = 0,
+                 completed_count: int = 0):
+        """Инициализация модели дневной сводки"""
+        self.summary_date = summary_date
+        self.table_id = table_id
+        self.bookings_count = bookings_count
+        self.booked_minutes = booked_minutes
+        self.covers = covers
+        self.pending_count = pending_count
+        self.confirmed_count = confirmed_count
+        self.cancelled_count = cancelled_count
+        self.completed_count = completed_count
+
+    def __str__(self) -> str:
+        """Строковое представление объекта"""
+        return (f"BookingDailySummary(date={self.summary_date}, table_id={self.table_id}, "
+                f"bookings={self.bookings_count}, covers={self.covers})")
+
+    def __repr__(self) -> str:
+        """Представление объекта для отладки"""
+        return self.__str__()
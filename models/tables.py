@@ -8,8 +8,10 @@ Table Model
 from typing import Optional
 from datetime import datetime
 
+from models.base import BaseModel
 
-class Table:
+
+class Table(BaseModel):
     """
     Модель стола в ресторане для системы бронирования
     
@@ -23,6 +25,7 @@ class Table:
         description: Описание стола
         created_at: Дата создания записи
         updated_at: Дата последнего обновления
+        deleted_at: Время мягкого удаления (None - не удален)
     """
     
     # Определение схемы таблицы для базы данных
@@ -37,9 +40,14 @@ class Table:
         'is_active': 'BOOLEAN DEFAULT TRUE',
         'description': 'TEXT',
         'created_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
-        'updated_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
+        'updated_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
+        'deleted_at': 'TIMESTAMP'
     }
     
+    # Порядок полей совпадает с порядком параметров __init__
+    FIELDS = tuple(COLUMNS)
+    __slots__ = FIELDS
+    
     VALID_LOCATIONS = ['у окна', 'VIP', 'основной зал', 'летняя веранда', 'некурящий зал']
     
     def __init__(self,
@@ -51,7 +59,8 @@ class Table:
                  is_active: bool = True,
                  description: Optional[str] = None,
                  created_at: Optional[datetime] = None,
-                 updated_at: Optional[datetime] = None):
+                 updated_at: Optional[datetime] = None,
+                 deleted_at: Optional[datetime] = None):
         """Инициализация модели стола"""
         self.id = id
         self.number = number
@@ -62,6 +71,7 @@ class Table:
         self.description = description
         self.created_at = created_at
         self.updated_at = updated_at
+        self.deleted_at = deleted_at
     
     def __str__(self) -> str:
         """Строковое представление объекта"""
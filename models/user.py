@@ -8,8 +8,10 @@ User Model
 from typing import Optional
 from datetime import datetime
 
+from models.base import BaseModel
 
-class User:
+
+class User(BaseModel):
     """
     Модель пользователя системы бронирования
     
@@ -25,6 +27,7 @@ class User:
         is_active: Статус активности аккаунта
         created_at: Дата создания аккаунта
         updated_at: Дата последнего обновления
+        deleted_at: Время мягкого удаления (None - не удален)
     """
     
     # Определение схемы таблицы для базы данных
@@ -41,7 +44,35 @@ class User:
         'role': 'VARCHAR(20) DEFAULT \'user\'',
         'is_active': 'BOOLEAN DEFAULT TRUE',
         'created_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
-        'updated_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
+        'updated_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
+        'deleted_at': 'TIMESTAMP'
+    }
+    
+    # Порядок полей совпадает с порядком параметров __init__
+    FIELDS = tuple(COLUMNS)
+    __slots__ = FIELDS
+    
+    # Выражения для поиска: запрос должен использовать их дословно,
+    # иначе индексы по выражениям не применяются
+    NAME_SEARCH_EXPR = "lower(coalesce(first_name, '') || ' ' || coalesce(last_name, ''))"
+    PHONE_SEARCH_EXPR = "regexp_replace(coalesce(phone, ''), '[^0-9]', '', 'g')"
+    
+    # Индексы поиска по префиксу (работают без расширений)
+    INDEXES = {
+        'idx_users_username_prefix': '(lower(username) text_pattern_ops)',
+        'idx_users_email_prefix': '(lower(email) text_pattern_ops)',
+        'idx_users_first_name_prefix': '(lower(first_name) text_pattern_ops)',
+        'idx_users_last_name_prefix': '(lower(last_name) text_pattern_ops)',
+        'idx_users_phone_prefix': f'(({PHONE_SEARCH_EXPR}) text_pattern_ops)',
+    }
+    
+    # Триграммные индексы нечеткого поиска - создаются, только если
+    # удалось подключить расширение pg_trgm
+    TRGM_INDEXES = {
+        'idx_users_username_trgm': 'USING gin (lower(username) gin_trgm_ops)',
+        'idx_users_email_trgm': 'USING gin (lower(email) gin_trgm_ops)',
+        'idx_users_name_trgm': f'USING gin (({NAME_SEARCH_EXPR}) gin_trgm_ops)',
+        'idx_users_phone_trgm': f'USING gin (({PHONE_SEARCH_EXPR}) gin_trgm_ops)',
     }
     
     VALID_ROLES = ['user', 'admin']
@@ -57,7 +88,8 @@ class User:
                  role: str = 'user',
                  is_active: bool = True,
                  created_at: Optional[datetime] = None,
-                 updated_at: Optional[datetime] = None):
+                 updated_at: Optional[datetime] = None,
+                 deleted_at: Optional[datetime] = None):
         """Инициализация модели пользователя"""
         self.id = id
         self.username = username
@@ -70,6 +102,7 @@ class User:
         self.is_active = is_active
         self.created_at = created_at
         self.updated_at = updated_at
+        self.deleted_at = deleted_at
     
     def __str__(self) -> str:
         """Строковое представление объекта"""
@@ -7,21 +7,445 @@ PostgreSQL Driver Module
 """
 
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
 from psycopg2 import sql
 from psycopg2.extras import RealDictCursor, execute_values
+import functools
+import io
 import os
 import logging
-from typing import Optional, Dict, Any, List, Tuple, Union
+import re
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Sequence, Tuple, Union
 from contextlib import contextmanager
 from dotenv import load_dotenv
 
 
+class ThreadCounters(threading.local):
+    """
+    Счетчики работы драйвера в текущем потоке
+    
+    Метрики операций (metrics.py) берут разность счетчиков до и после
+    вызова: так считаются подключения, запросы и ошибки БД одной операции
+    независимо от того, перехватила ли она исключение. Здесь же хранится
+    стек открытых областей детектора повторяющихся запросов.
+    """
+    
+    def __init__(self):
+        self.connections = 0
+        self.queries = 0
+        self.errors = 0
+        self.scopes: List['QueryScope'] = []
+        self.repeats_allowed = 0
+    
+    def snapshot(self) -> Tuple[int, int, int]:
+        """Текущие значения (подключения, запросы, ошибки)"""
+        return self.connections, self.queries, self.errors
+
+
+thread_counters = ThreadCounters()
+
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_NUMBER = re.compile(r"(?<![\w.$])\d+(?:\.\d+)?")
+_CONSTANT = re.compile(r"\b(?:NULL|TRUE|FALSE)\b", re.IGNORECASE)
+_VALUE_LIST = re.compile(r"([(\[])\s*\?(?:\s*,\s*\?)+\s*([)\]])")
+_REPEATED_ROWS = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+
+# Файлы, кадры которых не показываются в стеке вызова повторяющегося запроса
+_INTERNAL_FILES = ('postgresql_driver.py', 'metrics.py', 'profiling.py',
+                   'contextlib.py', 'functools.py', 'threading.py', 'extras.py')
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize_statement(query: str) -> str:
+    """
+    Форма SQL-запроса: запрос без значений
+    
+    Строки, числа, параметры (%s, %(name)s), NULL/TRUE/FALSE заменяются
+    на ?, списки значений (IN (...), строки VALUES) сворачиваются - запросы,
+    отличающиеся только значениями, получают одинаковую форму.
+    
+    Args:
+        query: Текст SQL-запроса
+        
+    Returns:
+        str: Нормализованный запрос
+    """
+    shape = _STRING_LITERAL.sub('?', query)
+    shape = _WHITESPACE.sub(' ', shape)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    shape = _CONSTANT.sub('?', shape)
+    shape = _VALUE_LIST.sub(r'\1?, ...\2', shape)
+    shape = _REPEATED_ROWS.sub(r'\1, ...', shape)
+    return shape.strip()
+
+
+def _caller_stack(depth: int) -> List[str]:
+    """Последние depth кадров стека вызова без кадров драйвера и оберток"""
+    frames = [frame for frame in traceback.extract_stack()[:-2]
+              if os.path.basename(frame.filename) not in _INTERNAL_FILES
+              and 'psycopg2' not in frame.filename]
+    return [f"{os.path.basename(frame.filename)}:{frame.lineno} в {frame.name}: {frame.line}"
+            for frame in frames[-depth:]]
+
+
+class RepeatedQueryError(Exception):
+    """Запрос одной формы повторен в области больше порога (режим raise)"""
+
+
+class QueryScope:
+    """
+    Область подсчета запросов: действие GUI, вызов backend, запрос API
+    
+    Запрос учитывается во всех открытых областях потока, поэтому цикл
+    вызовов backend внутри действия GUI виден в области действия, даже если
+    каждый вызов выполняет один запрос.
+    """
+    
+    __slots__ = ('detector', 'name', 'threshold', 'counts', 'stacks', 'reported')
+    
+    def __init__(self, detector: 'RepeatedQueryDetector', name: str, threshold: int):
+        self.detector = detector
+        self.name = name
+        self.threshold = threshold
+        self.counts: Dict[str, int] = {}
+        # Форма запроса -> стек вызова в момент превышения порога
+        self.stacks: Dict[str, List[str]] = {}
+        # Формы, о которых уже сообщила вложенная область
+        self.reported = set()
+    
+    def __enter__(self) -> 'QueryScope':
+        thread_counters.scopes.append(self)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        scopes = thread_counters.scopes
+        if scopes and scopes[-1] is self:
+            scopes.pop()
+        else:
+            scopes.remove(self)
+        findings = [(shape, self.counts[shape], stack)
+                    for shape, stack in self.stacks.items() if shape not in self.reported]
+        if not findings:
+            return False
+        for outer in scopes:
+            outer.reported.update(shape for shape, _, _ in findings)
+        self.detector.report(self, findings, can_raise=exc_type is None)
+        return False
+
+
+class _AllowRepeats:
+    """Контекст, в котором повторы запросов ожидаемы (пакетная обработка)"""
+    
+    def __enter__(self):
+        thread_counters.repeats_allowed += 1
+    
+    def __exit__(self, exc_type, exc, tb):
+        thread_counters.repeats_allowed -= 1
+        return False
+
+
+class _NullScope:
+    """Пустая область (детектор выключен)"""
+    
+    def __enter__(self):
+        return None
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class RepeatedQueryDetector:
+    """
+    Детектор N+1: повторение запроса одной формы внутри области
+    
+    Драйвер сообщает о каждом выполненном запросе, пока в потоке открыта
+    хотя бы одна область (scope). Если запрос одной формы
+    (normalize_statement) выполнен в области больше threshold раз, при
+    закрытии области пишется предупреждение со стеком вызова, а в режиме
+    raise выбрасывается RepeatedQueryError (для тестов и отладки).
+    
+    Настройка через переменные окружения:
+        BOOKING_NPLUS1            off / warn / raise (по умолчанию warn)
+        BOOKING_NPLUS1_THRESHOLD  допустимое число повторов (по умолчанию 10)
+        BOOKING_NPLUS1_STACK      кадров стека в предупреждении (по умолчанию 6)
+    """
+    
+    MODES = ('off', 'warn', 'raise')
+    RECENT_SIZE = 20
+    
+    def __init__(self, mode: Optional[str] = None, threshold: Optional[int] = None,
+                 stack_depth: Optional[int] = None):
+        """
+        Инициализация детектора
+        
+        Args:
+            mode: Режим (по умолчанию - BOOKING_NPLUS1)
+            threshold: Порог повторов (по умолчанию - BOOKING_NPLUS1_THRESHOLD)
+            stack_depth: Кадров стека в сообщении (по умолчанию - BOOKING_NPLUS1_STACK)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.configure(mode or os.getenv('BOOKING_NPLUS1', 'warn'),
+                       threshold or int(os.getenv('BOOKING_NPLUS1_THRESHOLD', '10')),
+                       stack_depth or int(os.getenv('BOOKING_NPLUS1_STACK', '6')))
+        self.detections = 0
+        self.recent = deque(maxlen=self.RECENT_SIZE)
+        self._lock = threading.Lock()
+    
+    def configure(self, mode: Optional[str] = None, threshold: Optional[int] = None,
+                  stack_depth: Optional[int] = None):
+        """Изменение режима, порога и глубины стека (None - без изменений)"""
+        if mode is not None:
+            mode = mode.strip().lower()
+            if mode not in self.MODES:
+                raise ValueError(f"Режим детектора должен быть одним из: {', '.join(self.MODES)}")
+            self.mode = mode
+        if threshold is not None:
+            if threshold < 1:
+                raise ValueError("Порог повторов должен быть положительным")
+            self.threshold = threshold
+        if stack_depth is not None:
+            self.stack_depth = stack_depth
+    
+    def scope(self, name: Optional[str], threshold: Optional[int] = None):
+        """
+        Область подсчета запросов (контекстный менеджер)
+        
+        Args:
+            name: Имя области (None - без подсчета)
+            threshold: Порог повторов этой области (по умолчанию - общий)
+        """
+        if name is None or self.mode == 'off':
+            return _NULL_SCOPE
+        return QueryScope(self, name, threshold or self.threshold)
+    
+    @staticmethod
+    def allow_repeats() -> _AllowRepeats:
+        """
+        Контекст, запросы в котором не учитываются
+        
+        Для намеренных циклов: пакетное удаление, блокировки по списку и т.п.
+        """
+        return _AllowRepeats()
+    
+    def record(self, query: Any, cursor) -> None:
+        """Учет выполненного запроса во всех открытых областях потока"""
+        if thread_counters.repeats_allowed:
+            return
+        if isinstance(query, sql.Composable):
+            query = query.as_string(cursor)
+        elif isinstance(query, bytes):
+            query = query.decode('utf-8', 'replace')
+        shape = normalize_statement(query)
+        
+        stack = None
+        for scope in thread_counters.scopes:
+            count = scope.counts.get(shape, 0) + 1
+            scope.counts[shape] = count
+            if count > scope.threshold and shape not in scope.stacks:
+                if stack is None:
+                    stack = _caller_stack(self.stack_depth)
+                scope.stacks[shape] = stack
+    
+    def report(self, scope: QueryScope, findings: List[Tuple[str, int, List[str]]],
+               can_raise: bool = True) -> None:
+        """
+        Сообщение о повторяющихся запросах области
+        
+        Args:
+            scope: Закрываемая область
+            findings: Список (форма запроса, число выполнений, стек вызова)
+            can_raise: Можно ли выбросить RepeatedQueryError (нет - если
+                      область закрывается из-за другого исключения)
+        """
+        messages = []
+        with self._lock:
+            for shape, count, stack in findings:
+                self.detections += 1
+                self.recent.append({
+                    'scope': scope.name,
+                    'statement': shape,
+                    'count': count,
+                    'threshold': scope.threshold,
+                    'stack': stack,
+                })
+        for shape, count, stack in findings:
+            lines = [f"Возможный N+1 в '{scope.name}': запрос выполнен {count} раз "
+                     f"(порог {scope.threshold})", f"    {shape}", "  Вызов:"]
+            lines.extend(f"    {frame}" for frame in stack)
+            messages.append('\n'.join(lines))
+        message = '\n'.join(messages)
+        
+        if self.mode == 'raise' and can_raise:
+            raise RepeatedQueryError(message)
+        self.logger.warning(message)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Режим, порог и последние обнаруженные повторы"""
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'threshold': self.threshold,
+                'detections': self.detections,
+                'recent': list(self.recent),
+            }
+
+
+repeated_queries = RepeatedQueryDetector()
+
+
+class _TrackedCursorMixin:
+    """Подсчет выполненных команд и ошибок БД в thread_counters"""
+    
+    def execute(self, query, vars=None):
+        thread_counters.queries += 1
+        if thread_counters.scopes:
+            repeated_queries.record(query, self)
+        try:
+            return super().execute(query, vars)
+        except psycopg2.Error:
+            thread_counters.errors += 1
+            raise
+    
+    def executemany(self, query, vars_list):
+        thread_counters.queries += 1
+        if thread_counters.scopes:
+            repeated_queries.record(query, self)
+        try:
+            return super().executemany(query, vars_list)
+        except psycopg2.Error:
+            thread_counters.errors += 1
+            raise
+    
+    def copy_expert(self, sql, file, size=8192):
+        thread_counters.queries += 1
+        if thread_counters.scopes:
+            repeated_queries.record(sql, self)
+        try:
+            return super().copy_expert(sql, file, size)
+        except psycopg2.Error:
+            thread_counters.errors += 1
+            raise
+
+
+class TrackedCursor(_TrackedCursorMixin, psycopg2.extensions.cursor):
+    """Курсор с кортежами (и именованный) с подсчетом команд"""
+
+
+class TrackedDictCursor(_TrackedCursorMixin, RealDictCursor):
+    """RealDictCursor с подсчетом команд"""
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул подключений к PostgreSQL
+    
+    В отличие от psycopg2.pool.ThreadedConnectionPool при исчерпании пула
+    не выбрасывает ошибку сразу, а ждет освобождения подключения до timeout
+    секунд. Возвращаемые подключения откатываются, если в них осталась
+    незавершенная транзакция.
+    """
+    
+    def __init__(self, params: Dict[str, Any], minconn: int = 1, maxconn: int = 10,
+                 timeout: float = 30.0):
+        """
+        Инициализация пула
+        
+        Args:
+            params: Параметры подключения psycopg2.connect
+            minconn: Количество подключений, открываемых сразу
+            maxconn: Максимальное количество подключений
+            timeout: Ожидание свободного подключения, секунды
+        """
+        self.params = params
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **params)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.acquired = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+    
+    def getconn(self) -> psycopg2.extensions.connection:
+        """Получение подключения (с ожиданием, если все заняты)"""
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise psycopg2.pool.PoolError(
+                f"Нет свободного подключения в пуле за {self.timeout} с"
+            )
+        try:
+            connection = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+            self.acquired += 1
+            self.wait_seconds += time.perf_counter() - started
+        return connection
+    
+    def putconn(self, connection: psycopg2.extensions.connection):
+        """Возврат подключения в пул"""
+        try:
+            if not connection.closed:
+                if connection.autocommit:
+                    connection.autocommit = False
+                if connection.status != psycopg2.extensions.STATUS_READY:
+                    connection.rollback()
+        except psycopg2.Error:
+            pass
+        finally:
+            try:
+                self._pool.putconn(connection, close=bool(connection.closed))
+            finally:
+                with self._lock:
+                    self.in_use -= 1
+                self._slots.release()
+    
+    def closeall(self):
+        """Закрытие всех подключений пула"""
+        self._pool.closeall()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Статистика пула"""
+        with self._lock:
+            return {
+                'maxconn': self.maxconn,
+                'in_use': self.in_use,
+                'acquired': self.acquired,
+                'avg_wait_ms': round(self.wait_seconds / self.acquired * 1000, 3)
+                               if self.acquired else 0.0,
+                'timeouts': self.timeouts
+            }
+
+
 class PostgreSQLDriver:
     """
     Драйвер для работы с PostgreSQL базой данных
     Поддерживает CRUD операции, транзакции и управление подключениями
+    
+    После enable_pool() все драйверы с теми же параметрами подключения
+    берут подключения из общего пула вместо открытия новых.
     """
     
+    _pool: Optional[ConnectionPool] = None
+    _stream_counter = 0
+    
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         """
         Инициализация драйвера
@@ -60,6 +484,7 @@ class PostgreSQLDriver:
         self.connection: Optional[psycopg2.extensions.connection] = None
         self.cursor: Optional[psycopg2.extensions.cursor] = None
         self._in_transaction = False
+        self._pooled = False
         
         self.logger.info(f"PostgreSQL Driver инициализирован для {config['host']}:{config['port']}")
     
@@ -71,16 +496,30 @@ class PostgreSQLDriver:
             bool: True если подключение успешно, False в противном случае
         """
         try:
+            pool = PostgreSQLDriver._pool
+            if pool is not None and pool.params == self.connection_params:
+                self.connection = pool.getconn()
+                self._pooled = True
+                self.connection.cursor_factory = TrackedCursor
+                self.cursor = self.connection.cursor(cursor_factory=TrackedDictCursor)
+                thread_counters.connections += 1
+                self.logger.debug("Подключение получено из пула")
+                return True
+            
             self.logger.info("Подключение к PostgreSQL...")
-            self.connection = psycopg2.connect(**self.connection_params)
-            self.cursor = self.connection.cursor(cursor_factory=RealDictCursor)
+            self.connection = psycopg2.connect(**self.connection_params,
+                                               cursor_factory=TrackedCursor)
+            self.cursor = self.connection.cursor(cursor_factory=TrackedDictCursor)
+            thread_counters.connections += 1
             self.logger.info("[OK] Подключение к PostgreSQL успешно!")
             return True
             
         except psycopg2.OperationalError as e:
+            thread_counters.errors += 1
             self.logger.error(f"[ERROR] Ошибка подключения к базе данных: {e}")
             return False
         except Exception as e:
+            thread_counters.errors += 1
             self.logger.error(f"[ERROR] Неожиданная ошибка при подключении: {e}")
             return False
     
@@ -89,12 +528,50 @@ class PostgreSQLDriver:
         try:
             if self.cursor:
                 self.cursor.close()
+            if self.connection and self._pooled:
+                connection, self.connection = self.connection, None
+                self._pooled = False
+                PostgreSQLDriver._pool.putconn(connection)
+                self.logger.debug("Подключение возвращено в пул")
+                return
             if self.connection:
                 self.connection.close()
             self.logger.info("[INFO] Подключение к базе данных закрыто")
         except Exception as e:
             self.logger.error(f"[WARNING] Ошибка при закрытии подключения: {e}")
     
+    @classmethod
+    def enable_pool(cls, minconn: int = 1, maxconn: int = 10, timeout: float = 30.0,
+                    config: Optional[Dict[str, Any]] = None) -> ConnectionPool:
+        """
+        Включение общего пула подключений для всех экземпляров драйвера
+        
+        Args:
+            minconn: Количество подключений, открываемых сразу
+            maxconn: Максимальное количество подключений
+            timeout: Ожидание свободного подключения, секунды
+            config: Параметры подключения (по умолчанию - из переменных окружения)
+            
+        Returns:
+            ConnectionPool: Созданный пул
+        """
+        cls.disable_pool()
+        params = cls(config).connection_params
+        cls._pool = ConnectionPool(params, minconn, maxconn, timeout)
+        return cls._pool
+    
+    @classmethod
+    def disable_pool(cls):
+        """Выключение пула и закрытие его подключений"""
+        pool, cls._pool = cls._pool, None
+        if pool is not None:
+            pool.closeall()
+    
+    @classmethod
+    def get_pool_stats(cls) -> Optional[Dict[str, Any]]:
+        """Статистика пула или None, если пул не включен"""
+        return cls._pool.stats() if cls._pool is not None else None
+    
     def is_connected(self) -> bool:
         """Проверка статуса подключения"""
         return self.connection is not None and not self.connection.closed
@@ -118,27 +595,66 @@ class PostgreSQLDriver:
         finally:
             self._in_transaction = False
     
-    def execute_query(self, query: str, params: Optional[Tuple] = None) -> List[Dict[str, Any]]:
+    def execute_query(self, query: str, params: Optional[Tuple] = None,
+                      as_tuples: bool = False) -> List[Union[Dict[str, Any], Tuple]]:
         """
         Выполнение SELECT запроса
         
         Args:
             query: SQL запрос
             params: Параметры для запроса
+            as_tuples: Возвращать строки кортежами (без построения словарей)
             
         Returns:
-            List[Dict[str, Any]]: Результат запроса
+            List[Union[Dict[str, Any], Tuple]]: Результат запроса
         """
         if not self.is_connected():
             raise Exception("Нет активного подключения к базе данных")
         
         try:
+            if as_tuples:
+                with self.connection.cursor() as cursor:
+                    cursor.execute(query, params)
+                    return cursor.fetchall()
             self.cursor.execute(query, params)
             return self.cursor.fetchall()
         except psycopg2.Error as e:
             self.logger.error(f"Ошибка выполнения запроса: {e}")
             raise
     
+    def iter_query(self, query: str, params: Optional[Union[Tuple, Dict[str, Any]]] = None,
+                   batch_size: int = 10000) -> Iterator[Tuple]:
+        """
+        Потоковое выполнение SELECT через серверный (именованный) курсор
+        
+        Строки приходят с сервера пачками по batch_size и отдаются кортежами,
+        поэтому большой результат не загружается в память целиком.
+        Курсор живет до конца транзакции - итерацию нужно завершить
+        до commit (выхода из with / transaction()).
+        
+        Args:
+            query: SQL запрос
+            params: Параметры для запроса
+            batch_size: Количество строк в одной пачке с сервера
+            
+        Yields:
+            Tuple: Строки результата
+        """
+        if not self.is_connected():
+            raise Exception("Нет активного подключения к базе данных")
+        
+        PostgreSQLDriver._stream_counter += 1
+        name = f"stream_{os.getpid()}_{PostgreSQLDriver._stream_counter}"
+        try:
+            with self.connection.cursor(name=name) as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query, params)
+                for row in cursor:
+                    yield row
+        except psycopg2.Error as e:
+            self.logger.error(f"Ошибка потокового запроса: {e}")
+            raise
+    
     def execute_command(self, command: str, params: Optional[Tuple] = None) -> int:
         """
         Выполнение команды (INSERT, UPDATE, DELETE)
@@ -163,14 +679,22 @@ class PostgreSQLDriver:
     # ==================== CRUD ОПЕРАЦИИ ====================
     
     def create_table(self, table_name_or_model, columns: Dict[str, str] = None, 
-                    constraints: Optional[List[str]] = None) -> bool:
+                    constraints: Optional[List[str]] = None,
+                    indexes: Optional[Dict[str, str]] = None,
+                    concurrent_indexes: bool = False,
+                    partition_by: Optional[str] = None) -> bool:
         """
         Создание таблицы
         
         Args:
             table_name_or_model: Имя таблицы (str) или модель (объект с атрибутами TABLE_NAME и COLUMNS)
             columns: Словарь {имя_колонки: тип_данных} (используется если передан table_name как строка)
-            constraints: Список дополнительных ограничений
+            constraints: Список дополнительных ограничений (для модели берется из CONSTRAINTS)
+            indexes: Словарь {имя_индекса: определение} (для модели берется из INDEXES)
+            concurrent_indexes: Создавать недостающие индексы через CREATE INDEX CONCURRENTLY
+                               (для существующих таблиц с данными)
+            partition_by: Ключ секционирования, например 'RANGE (booking_date)'.
+                          Секции создаются отдельно через create_partition()
             
         Returns:
             bool: True если таблица создана успешно
@@ -181,6 +705,10 @@ class PostgreSQLDriver:
                 # Передан объект модели
                 table_name = table_name_or_model.TABLE_NAME
                 columns = table_name_or_model.COLUMNS
+                if constraints is None:
+                    constraints = getattr(table_name_or_model, 'CONSTRAINTS', None)
+                if indexes is None:
+                    indexes = getattr(table_name_or_model, 'INDEXES', None)
                 self.logger.info(f"Создание таблицы '{table_name}' из модели")
             else:
                 # Передан обычный путь (имя таблицы как строка)
@@ -196,10 +724,11 @@ class PostgreSQLDriver:
             if constraints:
                 columns_sql.extend(constraints)
             
+            partition_clause = f" PARTITION BY {partition_by}" if partition_by else ""
             query = f"""
             CREATE TABLE IF NOT EXISTS {table_name} (
                 {', '.join(columns_sql)}
-            );
+            ){partition_clause};
             """
             
             self.execute_command(query)
@@ -207,12 +736,291 @@ class PostgreSQLDriver:
             if self.connection and not self._in_transaction:
                 self.connection.commit()
             self.logger.info(f"Таблица '{table_name}' создана успешно")
+            
+            # Таблица могла существовать со старой схемой - добавляем новые колонки
+            self.add_missing_columns(table_name, columns)
+            
+            if indexes:
+                self.create_indexes(table_name, indexes, concurrently=concurrent_indexes)
             return True
             
         except Exception as e:
             self.logger.error(f"Ошибка создания таблицы: {e}")
             return False
     
+    def add_missing_columns(self, table_name: str, columns: Dict[str, str]) -> List[str]:
+        """
+        Добавление в существующую таблицу колонок, которых в ней еще нет
+        
+        Args:
+            table_name: Имя таблицы
+            columns: Словарь {имя_колонки: тип_данных}
+            
+        Returns:
+            List[str]: Имена добавленных колонок
+        """
+        existing = {row['column_name'] for row in self.get_table_info(table_name)}
+        added = []
+        for col_name, col_type in columns.items():
+            if col_name in existing:
+                continue
+            self.execute_command(f"ALTER TABLE {table_name} ADD COLUMN {col_name} {col_type}")
+            added.append(col_name)
+        
+        if added:
+            if not self._in_transaction:
+                self.connection.commit()
+            self.logger.info(f"В таблицу '{table_name}' добавлены колонки: {', '.join(added)}")
+        return added
+    
+    def get_indexes(self, table_name: str) -> Dict[str, bool]:
+        """
+        Получение индексов таблицы
+        
+        Args:
+            table_name: Имя таблицы
+            
+        Returns:
+            Dict[str, bool]: {имя_индекса: индекс валиден}. Невалидные индексы
+                             остаются после прерванного CREATE INDEX CONCURRENTLY
+        """
+        try:
+            query = """
+            SELECT ic.relname AS index_name, i.indisvalid AS is_valid
+            FROM pg_index i
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            JOIN pg_class tc ON tc.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = tc.relnamespace
+            WHERE n.nspname = 'public' AND tc.relname = %s
+            """
+            
+            result = self.execute_query(query, (table_name,))
+            return {row['index_name']: row['is_valid'] for row in result}
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка получения индексов таблицы '{table_name}': {e}")
+            raise
+    
+    def create_indexes(self, table_name_or_model, indexes: Optional[Dict[str, str]] = None,
+                       concurrently: bool = False) -> int:
+        """
+        Создание недостающих индексов таблицы
+        
+        Существующие валидные индексы пропускаются, невалидные пересоздаются.
+        
+        Args:
+            table_name_or_model: Имя таблицы (str) или модель (с атрибутами TABLE_NAME и INDEXES)
+            indexes: Словарь {имя_индекса: определение после "ON <таблица>"},
+                     например {'idx_bookings_user_id': '(user_id)'}
+            concurrently: Использовать CREATE INDEX CONCURRENTLY (без блокировки записи).
+                          Выполняется вне транзакции, поэтому недоступно внутри transaction()
+            
+        Returns:
+            int: Количество созданных индексов
+        """
+        if hasattr(table_name_or_model, 'TABLE_NAME'):
+            table_name = table_name_or_model.TABLE_NAME
+            if indexes is None:
+                indexes = getattr(table_name_or_model, 'INDEXES', None)
+        else:
+            table_name = table_name_or_model
+        
+        if not indexes:
+            return 0
+        
+        if concurrently and self._in_transaction:
+            raise Exception("CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции")
+        
+        try:
+            existing = self.get_indexes(table_name)
+            mode = "CONCURRENTLY " if concurrently else ""
+            created = 0
+            
+            # CONCURRENTLY не поддерживается для секционированной таблицы целиком
+            if concurrently and self.is_partitioned(table_name):
+                for index_name, definition in indexes.items():
+                    if existing.get(index_name):
+                        continue
+                    self._create_partitioned_index_concurrently(table_name, index_name, definition)
+                    created += 1
+                return created
+            
+            for index_name, definition in indexes.items():
+                if existing.get(index_name):
+                    continue
+                
+                if index_name in existing:
+                    self.logger.warning(f"Индекс '{index_name}' невалиден, пересоздание")
+                    self._execute_ddl(f"DROP INDEX {mode}IF EXISTS {index_name}", concurrently)
+                
+                self.logger.info(f"Создание индекса '{index_name}' на '{table_name}'")
+                self._execute_ddl(
+                    f"CREATE INDEX {mode}IF NOT EXISTS {index_name} ON {table_name} {definition}",
+                    concurrently
+                )
+                created += 1
+            
+            return created
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка создания индексов таблицы '{table_name}': {e}")
+            raise
+    
+    def _create_partitioned_index_concurrently(self, table_name: str, index_name: str,
+                                               definition: str):
+        """
+        Создание индекса на секционированной таблице без блокировки записи
+        
+        Индекс создается на самой таблице (ON ONLY, мгновенно и невалидным),
+        затем CONCURRENTLY на каждой секции и присоединяется к родительскому.
+        После присоединения индексов всех секций родительский становится валидным.
+        Повторный запуск продолжает с места остановки.
+        """
+        self.logger.info(f"Создание индекса '{index_name}' на секционированной '{table_name}'")
+        self._execute_ddl(f"CREATE INDEX IF NOT EXISTS {index_name} ON ONLY {table_name} {definition}")
+        
+        for partition in self.get_partitions(table_name):
+            partition_name = partition['partition_name']
+            child_name = f"{partition_name}_{index_name}"[:63]
+            child_valid = self.get_indexes(partition_name).get(child_name)
+            
+            if child_valid is False:
+                self._execute_ddl(f"DROP INDEX CONCURRENTLY IF EXISTS {child_name}", True)
+            if not child_valid:
+                self._execute_ddl(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child_name} "
+                    f"ON {partition_name} {definition}",
+                    True
+                )
+            
+            attached = self.execute_query(
+                """
+                SELECT 1 FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE c.relname = %s AND p.relname = %s
+                """,
+                (child_name, index_name)
+            )
+            if not attached:
+                self._execute_ddl(f"ALTER INDEX {index_name} ATTACH PARTITION {child_name}")
+    
+    # ==================== СЕКЦИОНИРОВАНИЕ ====================
+    
+    def is_partitioned(self, table_name: str) -> bool:
+        """
+        Проверка, является ли таблица секционированной
+        
+        Args:
+            table_name: Имя таблицы
+            
+        Returns:
+            bool: True если таблица создана с PARTITION BY
+        """
+        try:
+            query = """
+            SELECT c.relkind = 'p' AS partitioned
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relname = %s
+            """
+            
+            result = self.execute_query(query, (table_name,))
+            return bool(result and result[0]['partitioned'])
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка проверки секционирования таблицы '{table_name}': {e}")
+            raise
+    
+    def get_partitions(self, table_name: str) -> List[Dict[str, Any]]:
+        """
+        Получение списка секций таблицы
+        
+        Args:
+            table_name: Имя секционированной таблицы
+            
+        Returns:
+            List[Dict[str, Any]]: Секции с полями partition_name и bound
+                                  (например "FOR VALUES FROM ('2025-01-01') TO ('2025-02-01')")
+        """
+        try:
+            query = """
+            SELECT c.relname AS partition_name,
+                   pg_get_expr(c.relpartbound, c.oid) AS bound
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            JOIN pg_namespace n ON n.oid = p.relnamespace
+            WHERE n.nspname = 'public' AND p.relname = %s
+            ORDER BY c.relname
+            """
+            
+            return self.execute_query(query, (table_name,))
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка получения секций таблицы '{table_name}': {e}")
+            raise
+    
+    def create_partition(self, table_name: str, partition_name: str,
+                         from_value: Any = None, to_value: Any = None,
+                         default: bool = False) -> bool:
+        """
+        Создание секции диапазона (или секции по умолчанию)
+        
+        Args:
+            table_name: Имя секционированной таблицы
+            partition_name: Имя секции
+            from_value: Нижняя граница (включительно)
+            to_value: Верхняя граница (не включительно)
+            default: Создать секцию по умолчанию для строк вне всех диапазонов
+            
+        Returns:
+            bool: True если секция создана (или уже существует)
+        """
+        try:
+            if default:
+                bound = "DEFAULT"
+                params = None
+            else:
+                bound = "FOR VALUES FROM (%s) TO (%s)"
+                params = (str(from_value), str(to_value))
+            
+            self.execute_command(
+                f"CREATE TABLE IF NOT EXISTS {partition_name} PARTITION OF {table_name} {bound}",
+                params
+            )
+            if self.connection and not self._in_transaction:
+                self.connection.commit()
+            self.logger.info(f"Секция '{partition_name}' таблицы '{table_name}' создана")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка создания секции '{partition_name}': {e}")
+            raise
+    
+    def _execute_ddl(self, command: str, autocommit: bool = False):
+        """
+        Выполнение DDL команды
+        
+        Args:
+            command: SQL команда
+            autocommit: Выполнить в режиме autocommit (для команд, которые
+                        не могут выполняться в блоке транзакции)
+        """
+        if not autocommit:
+            self.execute_command(command)
+            if self.connection and not self._in_transaction:
+                self.connection.commit()
+            return
+        
+        # Фиксируем начатую транзакцию перед переключением режима
+        self.connection.commit()
+        self.connection.autocommit = True
+        try:
+            self.execute_command(command)
+        finally:
+            self.connection.autocommit = False
+    
     def insert(self, table_name: str, data: Dict[str, Any], 
               return_id: bool = False) -> Optional[int]:
         """
@@ -249,20 +1057,22 @@ class PostgreSQLDriver:
             self.logger.error(f"Ошибка вставки в таблицу '{table_name}': {e}")
             raise
     
-    def insert_many(self, table_name: str, data_list: List[Dict[str, Any]]) -> int:
+    def insert_many(self, table_name: str, data_list: List[Dict[str, Any]],
+                    return_ids: bool = False) -> Union[int, List[int]]:
         """
         Массовая вставка записей
         
         Args:
             table_name: Имя таблицы
             data_list: Список словарей с данными
+            return_ids: Возвращать ID вставленных записей (в порядке data_list)
             
         Returns:
-            int: Количество вставленных записей
+            Union[int, List[int]]: Количество вставленных записей или список ID
         """
         try:
             if not data_list:
-                return 0
+                return [] if return_ids else 0
             
             columns = list(data_list[0].keys())
             values = [tuple(record[col] for col in columns) for record in data_list]
@@ -272,6 +1082,11 @@ class PostgreSQLDriver:
             VALUES %s
             """
             
+            if return_ids:
+                query += " RETURNING id"
+                rows = execute_values(self.cursor, query, values, page_size=len(values), fetch=True)
+                return [row['id'] for row in rows]
+            
             execute_values(self.cursor, query, values)
             return len(values)
             
@@ -279,11 +1094,89 @@ class PostgreSQLDriver:
             self.logger.error(f"Ошибка массовой вставки в таблицу '{table_name}': {e}")
             raise
     
+    @staticmethod
+    def _copy_value(value: Any) -> str:
+        """Значение в текстовом формате COPY (None -> \\N, экранирование спецсимволов)"""
+        if value is None:
+            return '\\N'
+        return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r'))
+    
+    def copy_from(self, table_name: str, columns: List[str], rows: Iterable[Sequence[Any]]) -> int:
+        """
+        Массовая загрузка строк через COPY ... FROM STDIN
+        
+        Строки сериализуются в текстовый формат COPY в памяти и передаются
+        одной командой, что значительно быстрее INSERT. Объем памяти
+        определяется размером rows, поэтому большие объемы следует
+        передавать пачками.
+        
+        Args:
+            table_name: Имя таблицы
+            columns: Колонки в порядке значений строки
+            rows: Строки-кортежи значений (None загружается как NULL)
+            
+        Returns:
+            int: Количество загруженных строк
+        """
+        buffer = io.StringIO()
+        count = 0
+        for row in rows:
+            buffer.write('\t'.join(map(self._copy_value, row)))
+            buffer.write('\n')
+            count += 1
+        if not count:
+            return 0
+        buffer.seek(0)
+        
+        try:
+            self.cursor.copy_expert(
+                f"COPY {table_name} ({', '.join(columns)}) FROM STDIN", buffer
+            )
+            return count
+        except Exception as e:
+            self.logger.error(f"Ошибка COPY в таблицу '{table_name}': {e}")
+            raise
+    
+    def copy_to(self, query: str, file, params: Optional[Union[Tuple, Dict[str, Any]]] = None,
+                header: bool = True) -> int:
+        """
+        Выгрузка результата запроса в CSV через COPY (...) TO STDOUT
+        
+        Строки передаются сервером потоком прямо в file и не накапливаются
+        в Python, поэтому объем выгрузки не ограничен памятью.
+        
+        Args:
+            query: SELECT запрос
+            file: Файловый объект с методом write (текстовый или бинарный,
+                  например gzip.open(path, 'wb'))
+            params: Параметры запроса (COPY не поддерживает параметры,
+                    поэтому они безопасно подставляются драйвером)
+            header: Первой строкой вывести названия колонок
+        
+        Returns:
+            int: Количество выгруженных строк
+        """
+        if not self.is_connected():
+            raise Exception("Нет активного подключения к базе данных")
+        
+        try:
+            if params is not None:
+                encoding = psycopg2.extensions.encodings[self.connection.encoding]
+                query = self.cursor.mogrify(query, params).decode(encoding)
+            options = 'FORMAT csv, HEADER' if header else 'FORMAT csv'
+            self.cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH ({options})", file)
+            return self.cursor.rowcount
+        except Exception as e:
+            self.logger.error(f"Ошибка выгрузки COPY: {e}")
+            raise
+    
     def select(self, table_name: str, columns: Optional[List[str]] = None,
               where: Optional[Dict[str, Any]] = None, 
               order_by: Optional[str] = None,
               limit: Optional[int] = None,
-              offset: Optional[int] = None) -> List[Dict[str, Any]]:
+              offset: Optional[int] = None,
+              as_tuples: bool = False) -> List[Union[Dict[str, Any], Tuple]]:
         """
         Выборка записей из таблицы
         
@@ -294,9 +1187,10 @@ class PostgreSQLDriver:
             order_by: Сортировка
             limit: Ограничение количества записей
             offset: Смещение
+            as_tuples: Возвращать строки кортежами в порядке columns
             
         Returns:
-            List[Dict[str, Any]]: Результат выборки
+            List[Union[Dict[str, Any], Tuple]]: Результат выборки
         """
         try:
             # Формирование SELECT части
@@ -312,6 +1206,10 @@ class PostgreSQLDriver:
             if where:
                 where_conditions = []
                 for col, val in where.items():
+                    # None в условии означает IS NULL
+                    if val is None:
+                        where_conditions.append(f"{col} IS NULL")
+                        continue
                     where_conditions.append(f"{col} = %s")
                     params.append(val)
                 query += f" WHERE {' AND '.join(where_conditions)}"
@@ -326,7 +1224,8 @@ class PostgreSQLDriver:
             if offset:
                 query += f" OFFSET {offset}"
             
-            return self.execute_query(query, tuple(params) if params else None)
+            return self.execute_query(query, tuple(params) if params else None,
+                                      as_tuples=as_tuples)
             
         except Exception as e:
             self.logger.error(f"Ошибка выборки из таблицы '{table_name}': {e}")
@@ -463,6 +1362,9 @@ class PostgreSQLDriver:
             if where:
                 where_clauses = []
                 for col, val in where.items():
+                    if val is None:
+                        where_clauses.append(f"{col} IS NULL")
+                        continue
                     where_clauses.append(f"{col} = %s")
                     params.append(val)
                 query += f" WHERE {' AND '.join(where_clauses)}"
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profiling Module
+Профилирование действий пользователя GUI и вызовов backend (по запросу)
+
+Режим включается переменной окружения BOOKING_PROFILE=1 или пунктом меню
+"Сервис" GUI. Каждое действие (загрузка вкладки, открытие диалога,
+сохранение, фильтр, вызов backend вне действия GUI) выполняется под cProfile
+и tracemalloc, а в каталог BOOKING_PROFILE_DIR (по умолчанию profiles)
+пишутся:
+    <время>_<действие>.prof   профиль cProfile (pstats, snakeviz)
+    <время>_<действие>.txt    функции по накопленному времени и места выделения памяти
+    index.jsonl               строка на действие: время, память, запросы к БД, файлы
+
+Профилируется только внешнее действие - вложенные действия и вызовы backend
+входят в его профиль. cProfile одновременно работает только для одного
+действия процесса: параллельные действия (потоки API-сервера) в это время
+выполняются без профиля. Ожидание ответа в окнах сообщений (paused) в
+длительность действия не входит. Файлы профиля не пишутся для действий
+быстрее BOOKING_PROFILE_MIN_MS (строка в index.jsonl пишется всегда),
+BOOKING_PROFILE_MEMORY=0 отключает tracemalloc. В выключенном режиме
+обертка стоит одной проверки флага.
+
+Независимо от профилирования каждое действие - область детектора N+1
+(postgresql_driver.repeated_queries): запрос одной формы, повторенный в
+действии больше порога, попадает в лог со стеком вызова.
+
+Запуск:
+    python profiling.py                  # самые медленные действия
+    python profiling.py --by-action      # сводка по видам действий
+    python profiling.py --show 1         # отчет самого медленного действия
+"""
+
+import argparse
+import cProfile
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from postgresql_driver import repeated_queries, thread_counters
+
+
+INDEX_FILE = 'index.jsonl'
+
+# Размер текстового отчета действия
+REPORT_FUNCTIONS = 30
+REPORT_ALLOCATIONS = 15
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    """Логическое значение переменной окружения"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ('0', 'false', 'no', 'off', '')
+
+
+class _Session:
+    """Состояние профилируемого действия"""
+
+    __slots__ = ('action', 'started_at', 'started', 'cpu_started', 'paused',
+                 'profile', 'snapshot', 'own_tracing', 'counters')
+
+
+class ActionProfiler:
+    """
+    Профилировщик действий
+
+    Действие оборачивается контекстным менеджером action() или декоратором
+    profiled(). Профиль и места выделения памяти пишутся после завершения
+    действия, в том числе завершившегося исключением.
+    """
+
+    def __init__(self, directory: Optional[str] = None, enabled: Optional[bool] = None,
+                 memory: Optional[bool] = None, min_ms: Optional[float] = None):
+        """
+        Args:
+            directory: Каталог профилей (по умолчанию BOOKING_PROFILE_DIR или 'profiles')
+            enabled: Включить профилирование (по умолчанию BOOKING_PROFILE)
+            memory: Отслеживать выделения памяти tracemalloc (по умолчанию BOOKING_PROFILE_MEMORY)
+            min_ms: Не писать файлы профиля для действий быстрее min_ms миллисекунд
+        """
+        self.directory = directory or os.getenv('BOOKING_PROFILE_DIR', 'profiles')
+        self.enabled = _env_flag('BOOKING_PROFILE', False) if enabled is None else enabled
+        self.memory = _env_flag('BOOKING_PROFILE_MEMORY', True) if memory is None else memory
+        self.min_ms = float(os.getenv('BOOKING_PROFILE_MIN_MS', '0')) if min_ms is None else min_ms
+        self._busy = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._local = threading.local()
+        self.profiled = 0
+        self.skipped = 0
+
+    def enable(self, directory: Optional[str] = None):
+        """Включение профилирования (и смена каталога профилей)"""
+        if directory:
+            self.directory = directory
+        self.enabled = True
+
+    def disable(self):
+        """Выключение профилирования (текущее действие дописывается)"""
+        self.enabled = False
+
+    def active(self) -> bool:
+        """Профилируется ли сейчас действие в текущем потоке"""
+        return getattr(self._local, 'session', None) is not None
+
+    @contextmanager
+    def action(self, name: str):
+        """Профилирование действия name (вложенное действие входит во внешнее)"""
+        session = self._start(name) if self.enabled and not self.active() else None
+        try:
+            yield
+        finally:
+            if session is not None:
+                self._finish(session)
+
+    @contextmanager
+    def paused(self):
+        """Исключение блока (ожидания пользователя) из профиля текущего действия"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            yield
+            return
+        session.profile.disable()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            session.paused += time.perf_counter() - started
+            session.profile.enable()
+
+    def _start(self, name: str) -> Optional[_Session]:
+        """Начало профилирования или None, если профилируется действие другого потока"""
+        if not self._busy.acquire(blocking=False):
+            self.skipped += 1
+            return None
+
+        session = _Session()
+        session.action = name
+        session.started_at = datetime.now()
+        session.paused = 0.0
+        session.snapshot = None
+        session.own_tracing = False
+        if self.memory:
+            session.own_tracing = not tracemalloc.is_tracing()
+            if session.own_tracing:
+                tracemalloc.start()
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            session.snapshot = tracemalloc.take_snapshot()
+        session.counters = thread_counters.snapshot()
+        session.profile = cProfile.Profile()
+        self._local.session = session
+        session.cpu_started = time.thread_time()
+        session.started = time.perf_counter()
+        session.profile.enable()
+        return session
+
+    def _finish(self, session: _Session):
+        """Остановка профилирования и запись результатов действия"""
+        try:
+            session.profile.disable()
+            wall = time.perf_counter() - session.started - session.paused
+            cpu = time.thread_time() - session.cpu_started
+            self._local.session = None
+            connections, queries, errors = (after - before for after, before in
+                                            zip(thread_counters.snapshot(), session.counters))
+
+            allocations = []
+            peak = allocated = 0
+            if session.snapshot is not None:
+                peak = tracemalloc.get_traced_memory()[1]
+                filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                           tracemalloc.Filter(False, __file__)]
+                snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+                if session.own_tracing:
+                    tracemalloc.stop()
+                differences = snapshot.compare_to(session.snapshot.filter_traces(filters), 'lineno')
+                allocated = max(0, sum(stat.size_diff for stat in differences))
+                allocations = sorted((stat for stat in differences if stat.size_diff > 0),
+                                     key=lambda stat: stat.size_diff,
+                                     reverse=True)[:REPORT_ALLOCATIONS]
+
+            entry = {
+                'action': session.action,
+                'started_at': session.started_at.isoformat(timespec='milliseconds'),
+                'wall_ms': round(wall * 1000, 2),
+                'cpu_ms': round(cpu * 1000, 2),
+                'paused_ms': round(session.paused * 1000, 2),
+                'peak_kb': round(peak / 1024, 1),
+                'allocated_kb': round(allocated / 1024, 1),
+                'connections': connections,
+                'queries': queries,
+                'db_errors': errors,
+                'thread': threading.current_thread().name,
+                'profile': None,
+                'report': None
+            }
+            os.makedirs(self.directory, exist_ok=True)
+            if entry['wall_ms'] >= self.min_ms:
+                base = (f"{session.started_at:%Y%m%d-%H%M%S-%f}_"
+                        f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', session.action)}")
+                entry['profile'] = base + '.prof'
+                entry['report'] = base + '.txt'
+                session.profile.dump_stats(os.path.join(self.directory, entry['profile']))
+                with open(os.path.join(self.directory, entry['report']), 'w',
+                          encoding='utf-8') as file:
+                    file.write(_format_report(entry, session.profile, allocations))
+
+            with self._index_lock:
+                with open(os.path.join(self.directory, INDEX_FILE), 'a', encoding='utf-8') as file:
+                    file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.profiled += 1
+        except Exception as e:
+            print(f"Ошибка записи профиля действия '{session.action}': {e}")
+        finally:
+            if session.own_tracing and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self._local.session = None
+            self._busy.release()
+
+
+def _format_report(entry: Dict[str, Any], profile: cProfile.Profile,
+                   allocations: list) -> str:
+    """Текстовый отчет действия: сводка, функции по накопленному времени, память"""
+    buffer = io.StringIO()
+    buffer.write(f"Действие: {entry['action']}\n")
+    buffer.write(f"Начало: {entry['started_at']}  поток: {entry['thread']}\n")
+    buffer.write(f"Время: {entry['wall_ms']} мс (CPU {entry['cpu_ms']} мс, "
+                 f"ожидание пользователя {entry['paused_ms']} мс)\n")
+    buffer.write(f"БД: подключений {entry['connections']}, запросов {entry['queries']}, "
+                 f"ошибок {entry['db_errors']}\n")
+    buffer.write(f"Память: пик {entry['peak_kb']} КБ, осталось выделенным "
+                 f"{entry['allocated_kb']} КБ\n\n")
+
+    if allocations:
+        buffer.write("Места выделения памяти (осталось после действия):\n")
+        for stat in allocations:
+            frame = stat.traceback[0]
+            buffer.write(f"  {stat.size_diff / 1024:>10.1f} КБ {stat.count_diff:>8} блоков  "
+                         f"{frame.filename}:{frame.lineno}\n")
+        buffer.write("\n")
+
+    stats = pstats.Stats(profile, stream=buffer)
+    stats.sort_stats('cumulative').print_stats(REPORT_FUNCTIONS)
+    return buffer.getvalue()
+
+
+profiler = ActionProfiler()
+
+
+def profiled(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    Декоратор: вызов функции - профилируемое действие и область детектора N+1
+
+    Args:
+        name: Имя действия (по умолчанию - __qualname__ функции)
+    """
+    def decorate(func: Callable) -> Callable:
+        action_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with repeated_queries.scope(action_name):
+                if not profiler.enabled:
+                    return func(*args, **kwargs)
+                with profiler.action(action_name):
+                    return func(*args, **kwargs)
+
+        wrapper.__profiled__ = True
+        return wrapper
+    return decorate
+
+
+def profile_module(namespace: Dict[str, Any], prefix: str = '') -> List[str]:
+    """
+    Обертка всех публичных функций модуля декоратором profiled
+
+    Вызывается в конце модуля: profile_module(globals(), 'backend.').
+    Функции-генераторы не оборачиваются: их работа идет после возврата.
+
+    Returns:
+        List[str]: Имена обернутых функций
+    """
+    module_name = namespace.get('__name__')
+    wrapped = []
+    for name, value in list(namespace.items()):
+        if (name.startswith('_') or not inspect.isfunction(value)
+                or value.__module__ != module_name
+                or inspect.isgeneratorfunction(inspect.unwrap(value))
+                or getattr(value, '__profiled__', False)):
+            continue
+        namespace[name] = profiled(prefix + name)(value)
+        wrapped.append(name)
+    return wrapped
+
+
+class ModalProxy:
+    """
+    Обертка модуля окон сообщений (tkinter.messagebox)
+
+    Пока открыто окно сообщения, профиль действия приостановлен: ожидание
+    ответа пользователя не попадает в длительность действия.
+    """
+
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, name: str):
+        value = getattr(self._module, name)
+        if not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def call(*args, **kwargs):
+            with profiler.paused():
+                return value(*args, **kwargs)
+        return call
+
+
+# ==================== ПРОСМОТР ПРОФИЛЕЙ ====================
+
+def load_index(directory: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Записи index.jsonl каталога профилей (пустой список, если профилей нет)"""
+    path = os.path.join(directory or profiler.directory, INDEX_FILE)
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+
+def slowest_actions(entries: List[Dict[str, Any]], top: int = 20,
+                    action: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Самые долгие действия (action - подстрока имени действия)"""
+    if action:
+        entries = [entry for entry in entries if action in entry['action']]
+    return sorted(entries, key=lambda entry: entry['wall_ms'], reverse=True)[:top]
+
+
+def format_slowest(entries: List[Dict[str, Any]], top: int = 20,
+                   action: Optional[str] = None) -> str:
+    """Таблица самых долгих действий"""
+    rows = slowest_actions(entries, top, action)
+    if not rows:
+        return "Профилей действий нет"
+    lines = [f"{'№':>3}  {'Начало':<23} {'Действие':<36}{'Время, мс':>11}{'CPU, мс':>10}"
+             f"{'Пик, КБ':>10}{'Запр.':>7}  Отчет"]
+    for number, entry in enumerate(rows, 1):
+        lines.append(f"{number:>3}  {entry['started_at']:<23} {entry['action'][:35]:<36}"
+                     f"{entry['wall_ms']:>11.1f}{entry['cpu_ms']:>10.1f}{entry['peak_kb']:>10.1f}"
+                     f"{entry['queries']:>7}  {entry['report'] or '-'}")
+    return '\n'.join(lines)
+
+
+def format_by_action(entries: List[Dict[str, Any]]) -> str:
+    """Сводка по видам действий: количество, среднее и максимальное время"""
+    groups: Dict[str, List[float]] = {}
+    queries: Dict[str, int] = {}
+    for entry in entries:
+        groups.setdefault(entry['action'], []).append(entry['wall_ms'])
+        queries[entry['action']] = queries.get(entry['action'], 0) + entry['queries']
+    if not groups:
+        return "Профилей действий нет"
+    lines = [f"{'Действие':<40}{'Раз':>6}{'Сред., мс':>11}{'Макс., мс':>11}{'Запр./раз':>11}"]
+    for name, times in sorted(groups.items(), key=lambda item: max(item[1]), reverse=True):
+        lines.append(f"{name[:39]:<40}{len(times):>6}{sum(times) / len(times):>11.1f}"
+                     f"{max(times):>11.1f}{queries[name] / len(times):>11.1f}")
+    return '\n'.join(lines)
+
+
+def main():
+    """Список самых долгих действий или отчет одного действия"""
+    parser = argparse.ArgumentParser(description="Профили действий системы бронирования")
+    parser.add_argument('directory', nargs='?', help="каталог профилей (BOOKING_PROFILE_DIR)")
+    parser.add_argument('--top', type=int, default=20, help="сколько действий показать")
+    parser.add_argument('--action', help="только действия, имя которых содержит строку")
+    parser.add_argument('--by-action', action='store_true', help="сводка по видам действий")
+    parser.add_argument('--show', type=int, metavar='N',
+                        help="вывести отчет N-го по длительности действия")
+    args = parser.parse_args()
+
+    directory = args.directory or profiler.directory
+    entries = load_index(directory)
+    if args.by_action:
+        print(format_by_action(entries))
+    elif args.show:
+        rows = slowest_actions(entries, args.show, args.action)
+        if len(rows) < args.show or not rows[-1]['report']:
+            print("Отчета для этого действия нет")
+            return
+        with open(os.path.join(directory, rows[-1]['report']), encoding='utf-8') as file:
+            print(file.read())
+    else:
+        print(format_slowest(entries, args.top, args.action))
+
+
+if __name__ == '__main__':
+    main()